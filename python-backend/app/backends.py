@@ -0,0 +1,87 @@
+"""
+Heavy third-party modules, imported on first use.
+
+Importing pdfplumber (with pdfminer), PIL, pytesseract and httpx costs a few
+hundred milliseconds. llama-cpp-python costs more. Modules refer to them
+through `lazy_module` proxies, so a process only pays for the backends it
+uses. Worker processes start faster too. Each import is timed, and
+`warm_up()` loads the backends a deployment needs before it reports ready.
+
+Backends:
+- `pdf` — pdfplumber / pdfminer (vector PDFs, routing, page fingerprints)
+- `ocr` — PIL and pytesseract (scans and images)
+- `http` — httpx (TGI / GenAI upstreams)
+- `llama` — llama-cpp-python (`mode=llama`)
+
+`PY_WARMUP_BACKENDS` lists the backends to pre-load (default `pdf,ocr`, plus
+`http` when an upstream endpoint is configured and `llama` when a model path is).
+"""
+import importlib
+import os
+import time
+from typing import Dict, List
+
+BACKENDS: Dict[str, tuple] = {
+    'pdf': ('pdfplumber',),
+    'ocr': ('PIL.Image', 'PIL.ImageOps', 'pytesseract'),
+    'http': ('httpx',),
+    'llama': ('llama_cpp',),
+}
+
+# module name -> milliseconds its first import took in this process
+import_ms: Dict[str, float] = {}
+
+
+def module(name: str):
+    """Import `name` (once), recording how long the first import took."""
+    started = time.perf_counter()
+    mod = importlib.import_module(name)
+    if name not in import_ms:
+        import_ms[name] = round((time.perf_counter() - started) * 1000, 1)
+    return mod
+
+
+class LazyModule:
+    """Stands in for a module until an attribute is first read."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr: str):
+        return getattr(module(self._name), attr)
+
+    def __repr__(self) -> str:
+        return f'<lazy module {self._name!r}>'
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def configured_backends() -> List[str]:
+    """Backends to pre-load: `PY_WARMUP_BACKENDS`, or what the configuration implies."""
+    names = os.getenv('PY_WARMUP_BACKENDS')
+    if names is not None:
+        return [n.strip() for n in names.split(',') if n.strip() in BACKENDS]
+    names = ['pdf', 'ocr']
+    if os.getenv('PY_TGI_ENDPOINT') or os.getenv('PY_GENAI_ENDPOINT'):
+        names.append('http')
+    if os.getenv('PY_LLAMA_MODEL_PATH'):
+        names.append('llama')
+    return names
+
+
+def load(names: List[str]) -> Dict[str, dict]:
+    """Import the given backends; per backend: ok, error and import time of its modules."""
+    report = {}
+    for name in names:
+        started = time.perf_counter()
+        try:
+            for mod in BACKENDS[name]:
+                module(mod)
+            report[name] = {'ok': True}
+        except Exception as e:
+            # an optional backend that is not installed is reported, not fatal
+            report[name] = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+        report[name]['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return report
@@ -0,0 +1,162 @@
+"""
+Columnar BOQ builder.
+
+Each table's header row is resolved to column roles (item code, description,
+quantity, unit, rate, amount) once, numeric columns are parsed a column at a
+time, and the items of a table are validated into a `BOQ` in a single call.
+
+Header synonyms cover the usual tender spellings ("Qty.", "U/Rate",
+"Total (OMR)", "Sl. No." ...). Extra synonyms can be supplied as a JSON file
+via `PY_BOQ_SYNONYMS`, e.g. `{"quantity": ["menge"], "rate": ["rate/unit"]}`.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .numbers import detect_decimal, parse_cell_column, parse_number_column
+from .schemas import BOQ
+
+ITEM_CODE, DESCRIPTION, QUANTITY, UNIT, RATE, AMOUNT = 'itemCode', 'description', 'quantity', 'unit', 'rate', 'amount'
+NUMERIC_ROLES = (QUANTITY, RATE, AMOUNT)
+# any of these makes a table a BOQ
+BOQ_ROLES = (DESCRIPTION, QUANTITY, RATE, AMOUNT)
+
+DEFAULT_SYNONYMS: Dict[str, List[str]] = {
+    ITEM_CODE: ['item', 'item no', 'item code', 'code', 'ref', 'ref no', 'boq ref', 's no', 'sl no', 'sr no', 's/n', 'no', '#', 'pos', 'position'],
+    DESCRIPTION: ['description', 'desc', 'item description', 'particulars', 'description of work', 'description of works', 'specification', 'details', 'works'],
+    QUANTITY: ['qty', 'quantity', 'quantities', 'qnty', 'quant', 'no of units'],
+    UNIT: ['unit', 'units', 'uom', 'u/m', 'unit of measure', 'unit of measurement'],
+    RATE: ['rate', 'unit rate', 'u/rate', 'u rate', 'price', 'unit price', 'unit cost'],
+    AMOUNT: ['amount', 'total', 'total amount', 'total price', 'total cost', 'line total', 'value', 'sum', 'extension'],
+}
+
+_BRACKETS_RE = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+_SEPARATORS_RE = re.compile(r'[.:_\-]+')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_header(header: str) -> str:
+    """'Total (OMR)' -> 'total', 'Sl. No.' -> 'sl no', 'U/Rate' -> 'u/rate'."""
+    h = _BRACKETS_RE.sub(' ', str(header or '').lower())
+    h = _SEPARATORS_RE.sub(' ', h)
+    return _SPACES_RE.sub(' ', h).strip()
+
+
+@lru_cache(maxsize=1)
+def synonym_table() -> Dict[str, str]:
+    """normalized header -> role, from the defaults plus `PY_BOQ_SYNONYMS`."""
+    synonyms = {role: list(words) for role, words in DEFAULT_SYNONYMS.items()}
+    path = os.getenv('PY_BOQ_SYNONYMS')
+    if path:
+        with open(path, encoding='utf-8') as fh:
+            for role, words in json.load(fh).items():
+                if role in synonyms:
+                    synonyms[role].extend(words)
+    return {normalize_header(w): role for role, words in synonyms.items() for w in words}
+
+
+def header_role(header: str) -> Optional[str]:
+    """Role of one header cell: exact synonym first, then keyword rules."""
+    h = normalize_header(header)
+    if not h:
+        return None
+    role = synonym_table().get(h)
+    if role is not None:
+        return role
+    # keyword fallback; order matters ('unit rate' is a rate, 'item description' a description)
+    if 'desc' in h or 'particular' in h:
+        return DESCRIPTION
+    if 'rate' in h or 'price' in h:
+        return RATE
+    if 'qty' in h or 'quantit' in h:
+        return QUANTITY
+    if 'amount' in h or 'total' in h:
+        return AMOUNT
+    if 'unit' in h or 'uom' in h:
+        return UNIT
+    if 'item' in h or 'code' in h:
+        return ITEM_CODE
+    return None
+
+
+def resolve_columns(headers: List[str]) -> Dict[str, int]:
+    """role -> column index; the first column wins when several map to the same role."""
+    roles: Dict[str, int] = {}
+    for i, h in enumerate(headers):
+        role = header_role(h)
+        if role is not None and role not in roles:
+            roles[role] = i
+    return roles
+
+
+def _column(rows: List[list], idx: Optional[int]) -> List[str]:
+    if idx is None:
+        return [''] * len(rows)
+    return [str(r[idx]).strip() if idx < len(r) and r[idx] is not None else '' for r in rows]
+
+
+def _description_column(rows: List[list], cols: List[int], width: int) -> List[str]:
+    """Description column joined with the unmapped columns and any cells beyond the headers."""
+    columns = [_column(rows, i) for i in cols]
+    overflow = [i for i, r in enumerate(rows) if len(r) > width]
+    desc = [' '.join(p for p in parts if p) for parts in zip(*columns)] if columns else [''] * len(rows)
+    for i in overflow:
+        extra = [str(c).strip() for c in rows[i][width:] if c is not None]
+        desc[i] = ' '.join(p for p in (desc[i], *extra) if p)
+    return desc
+
+
+def _confidence(qty: Optional[float], rate: Optional[float], amount: Optional[float]) -> Optional[float]:
+    parsed = (qty is not None) + (rate is not None) + (amount is not None)
+    return min(1.0, 0.3 * parsed) if parsed else None
+
+
+def build_boq(table: dict, decimal: Optional[str] = None) -> Optional[BOQ]:
+    """
+    BOQ for one table, or None when its headers don't look like a BOQ.
+    `decimal` is the document's decimal separator (see `numbers.detect_decimal`).
+    """
+    headers = table.get('headers') or []
+    roles = resolve_columns(headers)
+    if not any(r in roles for r in BOQ_ROLES):
+        return None
+    rows = table.get('rows') or []
+    codes = _column(rows, roles.get(ITEM_CODE))
+    units = _column(rows, roles.get(UNIT))
+    qtys, qty_units = parse_cell_column(_column(rows, roles.get(QUANTITY)), decimal)
+    rates, amounts = (parse_number_column(_column(rows, roles.get(role)), decimal) for role in (RATE, AMOUNT))
+    # "12.5 m2" in the quantity column stands in for an empty unit cell
+    units = [unit or qty_unit or '' for unit, qty_unit in zip(units, qty_units)]
+    # description = description column plus any column without a role, in column order
+    used = set(roles.values())
+    desc_cols = sorted(({roles[DESCRIPTION]} if DESCRIPTION in roles else set()) | {i for i in range(len(headers)) if i not in used})
+    descs = _description_column(rows, desc_cols, len(headers))
+
+    items = [
+        {
+            'itemCode': code or None,
+            'description': desc or '-',
+            'quantity': qty if qty is not None else 0.0,
+            'unit': unit or '-',
+            'rate': rate if rate is not None else 0.0,
+            'amount': amount if amount is not None else 0.0,
+            'confidence': _confidence(qty, rate, amount),
+        }
+        for code, desc, qty, unit, rate, amount in zip(codes, descs, qtys, units, rates, amounts)
+    ]
+    # one validation call for the whole table instead of one model per row
+    return BOQ.model_validate({'title': None, 'description': None, 'items': items})
+
+
+def build_mock_boq_from_tables(tables) -> list:
+    # Heuristic: a table whose headers resolve to description/quantity/rate/amount columns is a BOQ
+    tables = list(tables or [])
+    decimal = detect_decimal(str(c) for t in tables for r in (t.get('rows') or []) for c in r if c is not None)
+    boqs = []
+    for t in tables:
+        boq = build_boq(t, decimal)
+        if boq is not None:
+            boqs.append(boq)
+    return boqs
@@ -0,0 +1,163 @@
+"""
+Content-addressed cache for extraction results.
+
+Results are keyed on sha256(document bytes) + extraction mode + extractor
+version (+ the rate library in use, see `app.rates`) and stored as the serialized `ExtractedData` JSON, so a hit can be
+returned without touching pydantic at all.
+
+Two tiers:
+- an in-memory LRU bounded by `PY_CACHE_MAX_BYTES` (default 256 MB, `0` disables it)
+- an optional SQLite store at `PY_CACHE_PATH` that survives restarts, bounded
+  by `PY_CACHE_DISK_MAX_BYTES` (default 2 GB)
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .rates import library_tag
+
+# Bump whenever a change to the extraction code changes its output, so stale
+# cached results are not served after a deploy.
+EXTRACTOR_VERSION = '11'
+
+
+def digest_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_bytes: Optional[int] = None, path: Optional[str] = None, disk_max_bytes: Optional[int] = None):
+        if max_bytes is None:
+            max_bytes = int(os.getenv('PY_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+        if path is None:
+            path = os.getenv('PY_CACHE_PATH') or None
+        if disk_max_bytes is None:
+            disk_max_bytes = int(os.getenv('PY_CACHE_DISK_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+        self.max_bytes = max(0, max_bytes)
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self.path = path
+        self._mem: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(digest: str, mode: str) -> str:
+        return hashlib.sha256(f'{digest}:{mode}:{EXTRACTOR_VERSION}:{library_tag()}'.encode()).hexdigest()
+
+    def _conn(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                ' key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,'
+                ' created REAL NOT NULL, accessed REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)')
+        return self._db
+
+    def _mem_put(self, key: str, value: bytes):
+        if self.max_bytes == 0 or len(value) > self.max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = value
+        self._mem_bytes += len(value)
+        while self._mem_bytes > self.max_bytes and self._mem:
+            _, evicted = self._mem.popitem(last=False)
+            self._mem_bytes -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.hits += 1
+                return value
+            db = self._conn()
+            if db is not None:
+                row = db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    db.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+                    value = bytes(row[0])
+                    self._mem_put(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: bytes):
+        with self._lock:
+            self.puts += 1
+            self._mem_put(key, value)
+            db = self._conn()
+            if db is not None:
+                now = time.time()
+                db.execute(
+                    'INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                    (key, value, len(value), now, now),
+                )
+                self._trim_disk(db)
+
+    def _trim_disk(self, db: sqlite3.Connection):
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+        for key, size in db.execute('SELECT key, size FROM results ORDER BY accessed').fetchall():
+            db.execute('DELETE FROM results WHERE key = ?', (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.disk_max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            db = self._conn()
+            if db is not None:
+                db.execute('DELETE FROM results')
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        out = {
+            'extractorVersion': EXTRACTOR_VERSION,
+            'hits': self.hits,
+            'diskHits': self.disk_hits,
+            'misses': self.misses,
+            'hitRatio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'puts': self.puts,
+            'evictions': self.evictions,
+            'memoryEntries': len(self._mem),
+            'memoryBytes': self._mem_bytes,
+            'memoryMaxBytes': self.max_bytes,
+            'diskPath': self.path,
+        }
+        db = self._conn()
+        if db is not None:
+            with self._lock:
+                count, size = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+            out['diskEntries'] = count
+            out['diskBytes'] = size
+        return out
+
+
+result_cache = ResultCache()
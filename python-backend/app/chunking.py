@@ -0,0 +1,170 @@
+"""
+Chunked prompting for the LLM extraction modes (TGI, llama).
+
+Sending a whole tender as one prompt either overflows the model context or
+truncates the JSON answer. Instead the document text is split by page and
+then by blank-line separated regions into chunks that fit a token budget;
+chunks are sent concurrently, only failed chunks are retried, and the
+partial `ExtractedData` results are merged back in document order.
+
+Environment variables:
+- `PY_LLM_CHUNK_TOKENS` — approximate prompt budget per chunk (default 1500).
+- `PY_LLM_CONCURRENCY` — chunks in flight per request for TGI (default 4).
+- `PY_LLM_CHUNK_RETRIES` — retries per failed chunk (default 2).
+"""
+import asyncio
+import os
+import re
+import time
+from typing import Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from .pages import merge_page_tables
+from .schemas import ExtractedData
+
+# Rough chars-per-token ratio for English/Latin tender text; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+BLANK_LINES_RE = re.compile(r'\n\s*\n')
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def default_chunk_tokens() -> int:
+    return int(os.getenv('PY_LLM_CHUNK_TOKENS', '1500'))
+
+
+def _split_oversized(region: str, max_chars: int) -> List[str]:
+    """Split a region that is larger than a chunk on line boundaries (hard cut for huge lines)."""
+    parts, current = [], []
+    size = 0
+    for line in region.split('\n'):
+        while len(line) > max_chars:
+            if current:
+                parts.append('\n'.join(current))
+                current, size = [], 0
+            parts.append(line[:max_chars])
+            line = line[max_chars:]
+        if size + len(line) + 1 > max_chars and current:
+            parts.append('\n'.join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        parts.append('\n'.join(current))
+    return parts
+
+
+def split_text_chunks(text: str, max_tokens: Optional[int] = None) -> List[str]:
+    """
+    Split document text into chunks of at most `max_tokens` (estimated).
+    Page breaks (form feeds) and blank lines are preferred cut points, so a
+    table region is only split when it does not fit a chunk on its own.
+    """
+    max_chars = max(1, (max_tokens or default_chunk_tokens()) * CHARS_PER_TOKEN)
+    regions: List[str] = []
+    for page in (text or '').split('\f'):
+        for region in BLANK_LINES_RE.split(page):
+            region = region.strip()
+            if not region:
+                continue
+            if len(region) > max_chars:
+                regions.extend(_split_oversized(region, max_chars))
+            else:
+                regions.append(region)
+    chunks, current = [], []
+    size = 0
+    for region in regions:
+        if current and size + len(region) + 2 > max_chars:
+            chunks.append('\n\n'.join(current))
+            current, size = [], 0
+        current.append(region)
+        size += len(region) + 2
+    if current:
+        chunks.append('\n\n'.join(current))
+    return chunks
+
+
+def merge_extracted(results: Sequence[Optional[ExtractedData]]) -> ExtractedData:
+    """Concatenate per-chunk results in order; tables split across chunks with the same headers are joined."""
+    tables, lists, prices, boqs = [], [], [], []
+    for idx, r in enumerate(results):
+        if r is None:
+            continue
+        tables.append((idx, [t.model_dump() for t in (r.tables or [])]))
+        lists.extend(r.lists or [])
+        prices.extend(r.prices or [])
+        boqs.extend(r.boqs or [])
+    merged_tables = merge_page_tables(tables)
+    return ExtractedData(
+        tables=merged_tables or None,
+        lists=lists or None,
+        prices=prices or None,
+        boqs=boqs or None,
+    )
+
+
+class ChunkRun:
+    """Outcome of `run_chunks`: per-chunk results (None for chunks that kept failing) and timings."""
+
+    def __init__(self, count: int):
+        self.results: List[Optional[ExtractedData]] = [None] * count
+        self.errors: List[Optional[str]] = [None] * count
+        self.latencies: List[float] = [0.0] * count
+        self.retries = 0
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.results if r is None)
+
+    def merged(self) -> ExtractedData:
+        return merge_extracted(self.results)
+
+    def report(self) -> dict:
+        return {
+            'chunks': len(self.results),
+            'failed': self.failed,
+            'retries': self.retries,
+            'maxChunkMs': round(max(self.latencies, default=0.0) * 1000, 1),
+        }
+
+
+async def run_chunks(
+    chunks: Sequence[str],
+    call: Callable[[str], Awaitable[ExtractedData]],
+    concurrency: int = 4,
+    max_retries: Optional[int] = None,
+    backoff: float = 0.5,
+    give_up_on: Tuple[type, ...] = (),
+) -> ChunkRun:
+    """
+    Run `call` for every chunk with at most `concurrency` in flight. A failed
+    chunk is retried on its own (non-blocking backoff) up to `max_retries`
+    times; exceptions in `give_up_on` are not retried.
+    """
+    if max_retries is None:
+        max_retries = int(os.getenv('PY_LLM_CHUNK_RETRIES', '2'))
+    run = ChunkRun(len(chunks))
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def one(i: int):
+        for attempt in range(max_retries + 1):
+            if attempt:
+                run.retries += 1
+                await asyncio.sleep(backoff * attempt)
+            async with sem:
+                started = time.perf_counter()
+                try:
+                    run.results[i] = await call(chunks[i])
+                    run.errors[i] = None
+                    return
+                except give_up_on as e:
+                    run.errors[i] = str(e) or type(e).__name__
+                    return
+                except Exception as e:
+                    run.errors[i] = str(e) or type(e).__name__
+                finally:
+                    run.latencies[i] = max(run.latencies[i], time.perf_counter() - started)
+
+    await asyncio.gather(*(one(i) for i in range(len(chunks))))
+    return run
@@ -0,0 +1,236 @@
+"""
+Asynchronous extraction jobs backed by a local SQLite queue.
+
+Large BOQ packages can take longer than the proxy timeouts between the
+Next.js app and this service. `POST /jobs` stores the document and returns a
+job id immediately; job runners inside the service claim queued jobs, run
+the normal extraction pipeline (blocking work still goes through the worker
+pool) and record per-page progress and partial results as they go.
+
+Environment variables:
+- `PY_JOBS_DIR` — directory for the queue database and job inputs
+  (default: `<tmp>/estim-pro-jobs`). Jobs survive a restart; jobs that were
+  running are put back in the queue.
+- `PY_JOB_WORKERS` — number of jobs processed concurrently (default: 2).
+- `PY_JOB_TTL_SECONDS` — how long finished jobs and their results are kept
+  (default: 24 h).
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobQueue:
+    def __init__(self, directory: Optional[str] = None, ttl: Optional[float] = None):
+        self.directory = directory or os.getenv('PY_JOBS_DIR') or os.path.join(tempfile.gettempdir(), 'estim-pro-jobs')
+        self.ttl = ttl if ttl is not None else float(os.getenv('PY_JOB_TTL_SECONDS', str(24 * 3600)))
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.directory, 'jobs.sqlite3'), check_same_thread=False, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY, status TEXT NOT NULL, mode TEXT NOT NULL,'
+                ' digest TEXT NOT NULL, size INTEGER NOT NULL, filename TEXT,'
+                ' pages_done INTEGER NOT NULL DEFAULT 0, pages_total INTEGER,'
+                ' result BLOB, error TEXT,'
+                ' created REAL NOT NULL, started REAL, finished REAL, expires REAL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, created)')
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS job_pages ('
+                ' job_id TEXT NOT NULL, page INTEGER NOT NULL, tables TEXT NOT NULL, boqs TEXT NOT NULL,'
+                ' PRIMARY KEY (job_id, page))'
+            )
+        return self._db
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn().execute(sql, params)
+
+    def input_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f'{job_id}.input')
+
+    def submit(self, job_id: str, mode: str, digest: str, size: int, filename: Optional[str] = None):
+        """Queue a job; the document must already be stored at `input_path(job_id)`."""
+        self._execute(
+            'INSERT INTO jobs (id, status, mode, digest, size, filename, created) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, QUEUED, mode, digest, size, filename, time.time()),
+        )
+
+    def claim(self) -> Optional[dict]:
+        """Atomically move the oldest queued job to running and return it."""
+        with self._lock:
+            db = self._conn()
+            while True:
+                row = db.execute('SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1', (QUEUED,)).fetchone()
+                if row is None:
+                    return None
+                cur = db.execute(
+                    'UPDATE jobs SET status = ?, started = ? WHERE id = ? AND status = ?',
+                    (RUNNING, time.time(), row['id'], QUEUED),
+                )
+                if cur.rowcount == 1:
+                    return dict(db.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+
+    def set_total(self, job_id: str, pages_total: int):
+        self._execute('UPDATE jobs SET pages_total = ? WHERE id = ?', (pages_total, job_id))
+
+    def add_page(self, job_id: str, page: int, tables: list, boqs: list):
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                'INSERT OR REPLACE INTO job_pages (job_id, page, tables, boqs) VALUES (?, ?, ?, ?)',
+                (job_id, page, json.dumps(tables), json.dumps(boqs)),
+            )
+            db.execute('UPDATE jobs SET pages_done = pages_done + 1 WHERE id = ?', (job_id,))
+
+    def pages(self, job_id: str) -> List[tuple]:
+        rows = self._execute('SELECT page, tables, boqs FROM job_pages WHERE job_id = ? ORDER BY page', (job_id,)).fetchall()
+        return [(r['page'], json.loads(r['tables']), json.loads(r['boqs'])) for r in rows]
+
+    def _finish(self, job_id: str, status: str, result: Optional[bytes] = None, error: Optional[str] = None) -> bool:
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            cur = db.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, finished = ?, expires = ? WHERE id = ? AND status IN (?, ?)',
+                (status, result, error, now, now + self.ttl, job_id, QUEUED, RUNNING),
+            )
+            if cur.rowcount == 1:
+                # partial results are superseded by the final result
+                db.execute('DELETE FROM job_pages WHERE job_id = ?', (job_id,))
+        if cur.rowcount == 1:
+            self._remove_input(job_id)
+        return cur.rowcount == 1
+
+    def finish(self, job_id: str, result: bytes) -> bool:
+        return self._finish(job_id, DONE, result=result)
+
+    def fail(self, job_id: str, error: str) -> bool:
+        return self._finish(job_id, FAILED, error=error)
+
+    def cancel(self, job_id: str) -> bool:
+        return self._finish(job_id, CANCELLED)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job['expires'] is not None and job['expires'] < time.time():
+            return None
+        return job
+
+    def requeue_running(self) -> int:
+        """After a restart nobody is working on 'running' jobs; put them back in the queue."""
+        with self._lock:
+            db = self._conn()
+            ids = [r['id'] for r in db.execute('SELECT id FROM jobs WHERE status = ?', (RUNNING,)).fetchall()]
+            for job_id in ids:
+                db.execute('DELETE FROM job_pages WHERE job_id = ?', (job_id,))
+                db.execute('UPDATE jobs SET status = ?, started = NULL, pages_done = 0 WHERE id = ?', (QUEUED, job_id))
+        return len(ids)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            db = self._conn()
+            ids = [r['id'] for r in db.execute('SELECT id FROM jobs WHERE expires IS NOT NULL AND expires < ?', (time.time(),)).fetchall()]
+            for job_id in ids:
+                db.execute('DELETE FROM job_pages WHERE job_id = ?', (job_id,))
+                db.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+        for job_id in ids:
+            self._remove_input(job_id)
+        return len(ids)
+
+    def _remove_input(self, job_id: str):
+        try:
+            os.remove(self.input_path(job_id))
+        except OSError:
+            pass
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {r['status']: r['n'] for r in rows}
+
+
+JobHandler = Callable[[dict, JobQueue], Awaitable[bytes]]
+
+
+class JobRunners:
+    """A fixed number of asyncio tasks that claim queued jobs and run `handler` on them."""
+
+    def __init__(self, queue: JobQueue, handler: JobHandler, workers: Optional[int] = None, poll_interval: float = 1.0):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers if workers is not None else int(os.getenv('PY_JOB_WORKERS', '2'))
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self.queue.requeue_running()
+        self._tasks = [asyncio.create_task(self._loop()) for _ in range(max(1, self.workers))]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def cancel(self, job_id: str) -> bool:
+        cancelled = self.queue.cancel(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return cancelled
+
+    async def _loop(self):
+        while True:
+            job = self.queue.claim()
+            if job is None:
+                self.queue.purge_expired()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            task = asyncio.create_task(self.handler(job, self.queue))
+            self._running[job['id']] = task
+            try:
+                result = await task
+                self.queue.finish(job['id'], result)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    # the runner itself is being stopped; leave the job for requeue on restart
+                    task.cancel()
+                    raise
+            except Exception as e:
+                self.queue.fail(job['id'], str(e) or type(e).__name__)
+            finally:
+                self._running.pop(job['id'], None)
+
+    def stats(self) -> dict:
+        return {'workers': self.workers, 'running': len(self._running), 'jobs': self.queue.counts()}
@@ -0,0 +1,262 @@
+"""
+Incremental parser for the JSON an LLM streams back in the TGI and llama modes.
+
+`ExtractionStream.feed()` takes the generated text piece by piece and scans
+each character once. It skips any preamble or code fence before the first
+`{`, and returns every `Table`, `BOQItem` and `BOQ` as soon as its closing
+bracket arrives. Once the top-level object is complete `done` is set and
+the caller stops generation, so tokens the model would spend on trailing
+chatter are never generated.
+
+`result()` builds the `ExtractedData`. Entries that fail validation are
+dropped rather than failing the whole answer. When the answer was cut off
+(`max_new_tokens`, a dropped connection), the text is cut back to the last
+complete value and the open brackets are closed. Tables and items that were
+finished are kept.
+
+Environment variables:
+- `PY_LLM_STREAM` — `0` waits for the whole answer instead of streaming tokens (default 1).
+- `PY_TGI_STREAM_ENDPOINT` — TGI streaming endpoint (default: `PY_TGI_ENDPOINT`
+  with `/generate` replaced by `/generate_stream`; a 404 falls back to `PY_TGI_ENDPOINT`).
+"""
+import json
+import re
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from .schemas import BOQ, BOQItem, ExtractedData, ListSchema, Table
+
+# characters that matter outside / inside a string
+STRUCTURAL_RE = re.compile(r'[{}\[\]",:]')
+STRING_SPECIAL_RE = re.compile(r'["\\]')
+TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+
+CLOSERS = {'{': '}', '[': ']'}
+
+
+def _record(path: tuple) -> bool:
+    """A table or BOQ item: kept whole or not at all when the answer is cut off."""
+    return (len(path) == 2 and path[0] == 'tables') or (len(path) == 4 and path[0] == 'boqs' and path[2] == 'items')
+
+
+class _Frame:
+    __slots__ = ('kind', 'start', 'path', 'key', 'index', 'expect_key')
+
+    def __init__(self, kind: str, start: int, path: tuple):
+        self.kind, self.start, self.path = kind, start, path
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == '{'
+
+    def child(self):
+        return self.key if self.kind == '{' else self.index
+
+
+def _loads(raw: str):
+    try:
+        return json.loads(raw)
+    except ValueError:
+        # trailing commas are the most common slip in model output
+        return json.loads(TRAILING_COMMA_RE.sub(r'\1', raw))
+
+
+def _valid(model, value: dict, *optional: str):
+    """`value` as `model`, with missing optional keys filled in; None if it does not validate."""
+    if not isinstance(value, dict):
+        return None
+    try:
+        return model.model_validate(dict({k: None for k in optional}, **value))
+    except ValidationError:
+        return None
+
+
+def _boq(value) -> Optional[BOQ]:
+    """A BOQ with the items that validate; None if none do."""
+    if not isinstance(value, dict):
+        return None
+    items = [i for i in (_valid(BOQItem, i, 'itemCode') for i in value.get('items') or []) if i]
+    if not items:
+        return None
+    return BOQ(title=value.get('title'), description=value.get('description'), items=items)
+
+
+def assemble(obj) -> ExtractedData:
+    """`ExtractedData` from a parsed answer, keeping the entries that validate."""
+    if not isinstance(obj, dict):
+        raise ValueError('Answer is not a JSON object')
+    tables = [t for t in (_valid(Table, t, 'description') for t in obj.get('tables') or []) if t]
+    lists = [item for item in (_valid(ListSchema, item, 'title') for item in obj.get('lists') or []) if item]
+    prices = [str(p) for p in obj.get('prices') or [] if isinstance(p, (str, int, float))]
+    boqs = [b for b in map(_boq, obj.get('boqs') or []) if b]
+    if not (tables or lists or prices or boqs) and any(obj.get(k) for k in ('tables', 'lists', 'prices', 'boqs')):
+        raise ValueError('No valid tables or BOQ items in the answer')
+    return ExtractedData(tables=tables or None, lists=lists or None, prices=prices or None, boqs=boqs or None)
+
+
+class ExtractionStream:
+    def __init__(self):
+        # the text so far as the pieces it arrived in; `starts` holds their offsets
+        self.parts: List[str] = []
+        self.starts: List[int] = []
+        self.length = 0
+        self.frames: List[_Frame] = []
+        self.in_string = False
+        self.escaped = False
+        self.string_start = 0
+        self.root: Optional[int] = None
+        self.end: Optional[int] = None
+        # (offset, closers): the text up to offset plus closers is valid JSON
+        self.safe: Tuple[int, str] = (0, '')
+        self.open_records = 0
+        self.events = 0
+        self.invalid = 0
+
+    @property
+    def done(self) -> bool:
+        return self.end is not None
+
+    def _slice(self, start: int, end: int) -> str:
+        first = bisect_right(self.starts, start) - 1
+        last = bisect_right(self.starts, end - 1)
+        base = self.starts[first]
+        return ''.join(self.parts[first:last])[start - base:end - base]
+
+    def _mark_safe(self, offset: int):
+        if self.open_records:
+            return
+        self.safe = (offset, ''.join(CLOSERS[f.kind] for f in reversed(self.frames)))
+
+    def feed(self, piece: str) -> List[tuple]:
+        """Add generated text; returns the objects completed by it as ('table'|'item'|'boq', boq index or None, model)."""
+        if self.done or not piece:
+            return []
+        base = self.length
+        self.parts.append(piece)
+        self.starts.append(base)
+        self.length += len(piece)
+        # only the new piece is scanned; positions are relative to `base`
+        text, pos, events = piece, 0, []
+        while pos < len(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped, pos = False, pos + 1
+                    continue
+                m = STRING_SPECIAL_RE.search(text, pos)
+                if m is None:
+                    break
+                pos = m.end()
+                if m.group() == '\\':
+                    self.escaped = True
+                    continue
+                self.in_string = False
+                top = self.frames[-1]
+                if top.kind == '{' and top.expect_key:
+                    top.key = json.loads(self._slice(self.string_start, base + pos))
+                continue
+            if not self.frames:
+                start = text.find('{', pos)
+                if start < 0:
+                    break
+                self.root = base + start
+                self.frames.append(_Frame('{', base + start, ()))
+                pos = start + 1
+                self._mark_safe(base + pos)
+                continue
+            m = STRUCTURAL_RE.search(text, pos)
+            if m is None:
+                break
+            ch, pos = m.group(), m.end()
+            top = self.frames[-1]
+            if ch == '"':
+                self.in_string, self.string_start = True, base + m.start()
+            elif ch == ':':
+                top.expect_key = False
+            elif ch == ',':
+                self._mark_safe(base + m.start())
+                if top.kind == '[':
+                    top.index += 1
+                else:
+                    top.expect_key = True
+            elif ch in '{[':
+                path = top.path + (top.child(),)
+                if ch == '{' and _record(path):
+                    self._mark_safe(base + m.start())
+                    self.open_records += 1
+                self.frames.append(_Frame(ch, base + m.start(), path))
+                self._mark_safe(base + pos)
+            else:
+                frame = self.frames.pop()
+                if frame.kind == '{' and _record(frame.path):
+                    self.open_records -= 1
+                if not self.frames:
+                    if self._is_json(self._slice(frame.start, base + pos)):
+                        self.end = base + pos
+                        break
+                    # '{' in the preamble, not the answer: rescan from the next character
+                    base = frame.start + 1
+                    text, pos = self._slice(base, self.length), 0
+                    continue
+                event = self._completed(frame, self._slice(frame.start, base + pos))
+                if event:
+                    events.append(event)
+                self._mark_safe(base + pos)
+        self.events += len(events)
+        return events
+
+    @staticmethod
+    def _is_json(raw: str) -> bool:
+        try:
+            _loads(raw)
+            return True
+        except ValueError:
+            return False
+
+    def _completed(self, frame: _Frame, raw: str) -> Optional[tuple]:
+        path = frame.path
+        if frame.kind != '{' or not path:
+            return None
+        if path[0] == 'tables' and _record(path):
+            kind, model, optional, boq = 'table', Table, ('description',), None
+        elif _record(path):
+            kind, model, optional, boq = 'item', BOQItem, ('itemCode',), path[1]
+        elif len(path) == 2 and path[0] == 'boqs':
+            kind, model, optional, boq = 'boq', None, (), path[1]
+        else:
+            return None
+        try:
+            parsed = _loads(raw)
+            value = _boq(parsed) if model is None else _valid(model, parsed, *optional)
+        except ValueError:
+            value = None
+        if value is None:
+            self.invalid += 1
+            return None
+        return kind, boq, value
+
+    def value(self):
+        """The top-level object parsed so far, with a truncated tail repaired."""
+        if self.root is None:
+            raise ValueError('No JSON object found in text')
+        if self.done:
+            return _loads(self._slice(self.root, self.end))
+        offset, closers = self.safe
+        return _loads(self._slice(self.root, offset) + closers)
+
+    def result(self) -> ExtractedData:
+        data = assemble(self.value())
+        if not self.done and not (data.tables or data.lists or data.prices or data.boqs):
+            raise ValueError('Answer cut off before anything was complete')
+        return data
+
+
+def parse_extracted(text: str) -> ExtractedData:
+    """`ExtractedData` from a complete (or truncated) answer."""
+    try:
+        return assemble(json.loads(text))  # the model answered with bare JSON
+    except ValueError:
+        pass
+    stream = ExtractionStream()
+    stream.feed(text)
+    return stream.result()
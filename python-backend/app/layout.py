@@ -0,0 +1,186 @@
+"""
+Rebuild table rows and columns from positioned words.
+
+Input is a list of word boxes — dicts with `text`, `x0`, `x1`, `top` and
+`bottom`, the same keys pdfplumber uses — from OCR (`pytesseract.image_to_data`)
+or a PDF text layer; single characters (`page.chars`) are merged into words
+first by `chars_to_lines`. Words are clustered into lines by their vertical centre,
+and column boundaries are taken from the x-ranges that (almost) no line
+covers, over the whole page rather than per line. That keeps a column
+whose cells are sometimes empty aligned with its header.
+"""
+import bisect
+import math
+from statistics import median
+from typing import List, Optional
+
+Word = dict
+
+
+def _height(w: Word) -> float:
+    return max(0.0, w['bottom'] - w['top'])
+
+
+def group_lines(words: List[Word], tolerance: Optional[float] = None) -> List[List[Word]]:
+    """
+    Cluster words into lines, top to bottom, each line sorted by x. Words whose
+    vertical centres are within `tolerance` of a line's running centre belong
+    to it (default: half the median word height).
+    """
+    words = [w for w in words if str(w.get('text', '')).strip()]
+    if not words:
+        return []
+    if tolerance is None:
+        tolerance = 0.5 * (median(_height(w) for w in words) or 1.0)
+    ordered = sorted(words, key=lambda w: (w['top'] + w['bottom']) / 2)
+    lines: List[List[Word]] = []
+    centre = None
+    for w in ordered:
+        c = (w['top'] + w['bottom']) / 2
+        if lines and abs(c - centre) <= tolerance:
+            line = lines[-1]
+            line.append(w)
+            centre += (c - centre) / len(line)
+        else:
+            lines.append([w])
+            centre = c
+    for line in lines:
+        line.sort(key=lambda w: w['x0'])
+    return lines
+
+
+def chars_to_lines(chars: List[Word], tolerance: Optional[float] = None, gap_ratio: float = 0.15) -> List[List[Word]]:
+    """
+    Lines of words from character boxes (pdfplumber `page.chars`). Characters
+    are clustered into lines like words in `group_lines`, then joined into a
+    word while the gap to the previous one is at most `gap_ratio` of the font
+    size. Gaps are measured, so PDFs without space characters still split.
+    """
+    lines = []
+    for line in group_lines(chars, tolerance):
+        words: List[Word] = []
+        current = None
+        for ch in line:
+            size = ch.get('size') or _height(ch) or 1.0
+            if current is not None and ch['x0'] - current['x1'] <= gap_ratio * size:
+                current['text'] += ch['text']
+                current['x1'] = max(current['x1'], ch['x1'])
+                current['top'] = min(current['top'], ch['top'])
+                current['bottom'] = max(current['bottom'], ch['bottom'])
+            else:
+                current = {'text': ch['text'], 'x0': ch['x0'], 'x1': ch['x1'], 'top': ch['top'], 'bottom': ch['bottom']}
+                words.append(current)
+        lines.append(words)
+    return lines
+
+
+def column_boundaries(lines: List[List[Word]], min_gap: Optional[float] = None, max_share: float = 0.1) -> List[float]:
+    """
+    x positions that separate columns: centres of vertical gutters at least
+    `min_gap` wide that at most `max_share` of the lines cross (so a title or
+    a long wrapped description does not merge every column).
+    """
+    words = [w for line in lines for w in line]
+    if not words:
+        return []
+    if min_gap is None:
+        min_gap = median(_height(w) for w in words) or 1.0
+    left = math.floor(min(w['x0'] for w in words))
+    right = math.ceil(max(w['x1'] for w in words))
+    # coverage[x] = number of lines with ink at x, via a difference array (linear in words + width)
+    diff = [0] * (right - left + 2)
+    for line in lines:
+        spans = sorted((math.floor(w['x0']) - left, math.ceil(w['x1']) - left) for w in line)
+        # merge overlapping words of one line so it counts once per x
+        merged = []
+        for a, b in spans:
+            if merged and a <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        for a, b in merged:
+            diff[a] += 1
+            diff[b] -= 1
+    # on short pages a single title line would otherwise close every gutter
+    threshold = max(1 if len(lines) >= 5 else 0, int(max_share * len(lines)))
+    boundaries = []
+    covered = 0
+    gap_start = None
+    for x in range(right - left + 1):
+        covered += diff[x]
+        if covered <= threshold:
+            if gap_start is None:
+                gap_start = x
+        else:
+            if gap_start is not None and gap_start > 0 and x - gap_start >= min_gap:
+                boundaries.append(left + (gap_start + x) / 2)
+            gap_start = None
+    return boundaries
+
+
+def lines_to_rows(lines: List[List[Word]], boundaries: List[float]) -> List[List[str]]:
+    """Place each word in the column its centre falls into; drop columns that are empty everywhere."""
+    width = len(boundaries) + 1
+    rows = []
+    for line in lines:
+        cells: List[List[str]] = [[] for _ in range(width)]
+        for w in line:
+            cells[bisect.bisect_left(boundaries, (w['x0'] + w['x1']) / 2)].append(str(w['text']).strip())
+        rows.append([' '.join(c) for c in cells])
+    used = [i for i in range(width) if any(r[i] for r in rows)]
+    return [[r[i] for i in used] for r in rows]
+
+
+def header_index(rows: List[List[str]]) -> int:
+    """First row that fills at least half the columns (title lines above it are skipped)."""
+    if not rows:
+        return 0
+    width = len(rows[0])
+    for i, row in enumerate(rows):
+        if sum(1 for c in row if c) >= max(2, (width + 1) // 2):
+            return i
+    return 0
+
+
+def words_to_table(words: List[Word], description: Optional[str] = None) -> Optional[dict]:
+    """A `Table` dict built from word boxes, or None when the words don't form at least two columns."""
+    return lines_to_table(group_lines(words), description)
+
+
+def lines_to_table(lines: List[List[Word]], description: Optional[str] = None,
+                   boundaries: Optional[List[float]] = None) -> Optional[dict]:
+    """`words_to_table` for words already grouped into lines."""
+    if not lines:
+        return None
+    if boundaries is None:
+        boundaries = column_boundaries(lines)
+    rows = lines_to_rows(lines, boundaries)
+    if not rows or len(rows[0]) < 2:
+        return None
+    start = header_index(rows)
+    title = ' '.join(' '.join(c for c in r if c) for r in rows[:start]).strip()
+    return {
+        'headers': rows[start],
+        'rows': rows[start + 1:],
+        'description': ' - '.join(p for p in (description, title) if p) or None,
+    }
+
+
+def lines_to_text(lines: List[List[Word]], boundaries: Optional[List[float]] = None) -> str:
+    """
+    Plain text with one line per row. Words in different columns are separated
+    by two spaces so `text_to_rows` can split them again.
+    """
+    if boundaries is None:
+        boundaries = column_boundaries(lines)
+    out = []
+    for line in lines:
+        parts, last_col = [], None
+        for w in line:
+            col = bisect.bisect_left(boundaries, (w['x0'] + w['x1']) / 2)
+            if parts:
+                parts.append('  ' if col != last_col else ' ')
+            parts.append(str(w['text']).strip())
+            last_col = col
+        out.append(''.join(parts))
+    return '\n'.join(out)
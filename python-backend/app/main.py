@@ -1,20 +1,56 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
-from .schemas import ExtractDataInput, ExtractedData, BOQ, BOQItem
-from typing import Any, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from .schemas import ExtractDataInput, ExtractedData
+from .workers import pool
+from .cache import result_cache, digest_bytes
+from .pages import split_page_ranges, merge_page_tables
+from .uploads import spooled_upload, spooled_uploads
+from .batch import BatchFile, estimate_cost, expand_uploads, remove_tree, run_batch
+from .jobs import JobQueue, JobRunners
+from .models import ModelLoadError, model_registry
+from .upstream import CircuitOpenError, genai_upstream, tgi_upstream
+from .chunking import run_chunks, split_text_chunks
+from .jsonstream import ExtractionStream, parse_extracted
+from .export import CSV_MEDIA_TYPE, XLSX_MEDIA_TYPE, iter_csv, iter_xlsx, sheets_for
+from .boq import build_mock_boq_from_tables
+from .rates import fill_rates, rate_index
+from .ocr import ocr_tables, ocr_text, open_image, pdf_page_image
+from .layout import chars_to_lines, column_boundaries, lines_to_table, lines_to_text
+from .router import IMAGE_OCR, RASTER_OCR, TEXT_GRID, VECTOR_TABLES, empty_plan, plan_document
+from .responses import COLUMNAR, dumps, json_response, loads, to_columnar
+from .revisions import (baseline_fingerprints, cached_pages, keep_fingerprints, page_cache_enabled, page_runs,
+                        pdf_page_fingerprints, store_fingerprints, store_pages, stored_fingerprints, with_diff)
+from .metrics import MetricsMiddleware, count_extraction, metrics, produced, record_stage, request_timings, set_mode, stage
+from .backends import configured_backends, import_ms, lazy_module, load, module
+from .warmup import tiny_pdf, warm_state, warmup_enabled
+from contextlib import AsyncExitStack
+from io import StringIO
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, Optional, Tuple, Union
+import asyncio
+import csv
+import json
 import os
-import httpx
+import re
+import shutil
+import tempfile
+import time
+import uuid
 import io
-from PIL import Image
-import pdfplumber
-import pytesseract
 import base64
-try:
-    from llama_cpp import Llama
-except Exception:
-    Llama = None
+
+# imported on first use (see app.backends)
+pdfplumber = lazy_module('pdfplumber')
+
+CELL_SPLIT_RE = re.compile(r',|\s{2,}|\t')
 
 app = FastAPI(title="Estim Pro - Extraction API")
+app.add_middleware(MetricsMiddleware)
+
+# Documents are passed around either as bytes (JSON /extract) or as the path
+# of a spooled upload (/extract/upload); see `open_source`.
+Source = Union[bytes, str]
 
 
 async def call_external_genai(file_data_uri: str) -> ExtractedData:
@@ -30,54 +66,39 @@ async def call_external_genai(file_data_uri: str) -> ExtractedData:
     if not endpoint or not api_key:
         raise RuntimeError('PY_GENAI_ENDPOINT or PY_GENAI_KEY not configured')
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        # Example: send a JSON payload to your GenAI service. Adjust as needed.
-        payload = {"fileDataUri": file_data_uri}
-        headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
-        resp = await client.post(endpoint, json=payload, headers=headers)
-        if resp.status_code != 200:
-            raise RuntimeError(f'GenAI call failed: {resp.status_code} {resp.text}')
-        data = resp.json()
+    # Example: send a JSON payload to your GenAI service. Adjust as needed.
+    payload = {"fileDataUri": file_data_uri}
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    resp = await genai_upstream.post(endpoint, json=payload, headers=headers)
+    if resp.status_code != 200:
+        raise RuntimeError(f'GenAI call failed: {resp.status_code} {resp.text}')
+    data = resp.json()
 
     # NOTE: We assume the external service returns the same ExtractedData shape.
     return ExtractedData.model_validate(data)
 
 
-def try_parse_json_from_text(text: str):
-    """Attempt to extract JSON object from free text by searching for the first/last braces and parsing."""
-    import json
-    if not text or not isinstance(text, str):
-        raise ValueError('No text to parse')
-    # Direct parse first
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
+def llm_stream_enabled() -> bool:
+    return os.getenv('PY_LLM_STREAM', '1') != '0'
 
-    # Find first JSON object boundaries
-    first = text.find('{')
-    last = text.rfind('}')
-    if first != -1 and last != -1 and last > first:
-        candidate = text[first:last+1]
-        try:
-            return json.loads(candidate)
-        except Exception:
-            pass
 
-    # As a last resort, try to find a JSON array or object inside
-    import re
-    matches = re.findall(r'(\{.*?\})', text, flags=re.DOTALL)
-    for m in matches:
-        try:
-            return json.loads(m)
-        except Exception:
-            continue
-    raise ValueError('No JSON object found in text')
+def llama_text(resp: Any) -> str:
+    # llama-cpp-python answers {'id':..., 'object':..., 'usage':..., 'choices': [{'text': '...'}]}, per piece when streaming
+    if isinstance(resp, dict):
+        if 'choices' in resp and resp['choices']:
+            return resp['choices'][0].get('text', '')
+        return str(resp)
+    return str(resp)
+
+
+def feed_answer(parser: ExtractionStream, piece: str, started: float):
+    """Feed one streamed piece; the wait for the first complete table or item is recorded as the `llm_first_object` stage."""
+    seen = parser.events
+    if parser.feed(piece) and not seen:
+        record_stage('llm_first_object', time.perf_counter() - started)
 
 
 def llama_json_extract(llm: Any, prompt_text: str, max_retries: int = 3):
-    import time
-    from pydantic import ValidationError
     attempt = 0
     # Strong instruction for JSON-only output
     json_instruction = (
@@ -88,25 +109,22 @@ def llama_json_extract(llm: Any, prompt_text: str, max_retries: int = 3):
         attempt += 1
         prompt = json_instruction + "\nText:\n" + prompt_text + "\n\nReturn only the JSON object."
         try:
-            resp = llm(prompt)
-            # extract text depending on response shape
-            out_text = ''
-            if isinstance(resp, dict):
-                # llama-cpp-python may return {'id':..., 'object':..., 'usage':..., 'choices': [{'text': '...'}]}
-                if 'choices' in resp and resp['choices']:
-                    out_text = resp['choices'][0].get('text', '')
-                else:
-                    out_text = str(resp)
-            else:
-                out_text = str(resp)
-
-            parsed = try_parse_json_from_text(out_text)
-            # validate
-            extracted = ExtractedData.model_validate(parsed)
-            return extracted
+            if llm_stream_enabled():
+                parser, pieces, started = ExtractionStream(), llm(prompt, stream=True), time.perf_counter()
+                try:
+                    for piece in pieces:
+                        feed_answer(parser, llama_text(piece), started)
+                        if parser.done:
+                            break  # the answer is complete: stop generating
+                finally:
+                    close = getattr(pieces, 'close', None)
+                    if close is not None:
+                        close()
+                return parser.result()
+            return parse_extracted(llama_text(llm(prompt)))
         except (ValueError, ValidationError) as e:
-            # try again
-            time.sleep(0.7 * attempt)
+            # try again right away; callers that want backoff (see `run_chunks`)
+            # retry asynchronously so the model instance is not held while waiting
             continue
         except Exception as e:
             # non-parse error
@@ -122,360 +140,1113 @@ def decode_data_uri(data_uri: str) -> bytes:
     return base64.b64decode(b64)
 
 
-def extract_tables_from_pdf_bytes(pdf_bytes: bytes):
+def data_uri_mime(data_uri: str) -> Optional[str]:
+    """The MIME type declared in a data URI, if any."""
+    header = data_uri.split(',', 1)[0]
+    if not header.startswith('data:'):
+        return None
+    return header[5:].split(';', 1)[0].strip() or None
+
+
+def text_to_rows(text: str) -> list:
+    """Split CSV-like or column-spaced text into rows of cells."""
+    rows = []
+    # First, try CSV reader if commas present
+    if ',' in text:
+        reader = csv.reader(StringIO(text))
+        rows = [[cell.strip() for cell in row] for row in reader if any(cell.strip() for cell in row)]
+    else:
+        # Try splitting lines and then splitting by multiple spaces or tabs
+        lines = [ln for ln in text.splitlines() if ln.strip()]
+        for ln in lines:
+            parts = [p.strip() for p in CELL_SPLIT_RE.split(ln) if p.strip()]
+            if parts:
+                rows.append(parts)
+    return rows
+
+
+def page_text_table(chars: list, description: str = 'Parsed CSV-like text from PDF') -> Optional[dict]:
+    """
+    Table from the text layer of a page without ruled tables. Characters are
+    clustered into lines and words (`app.layout`); columns come from the x-gaps
+    shared by the whole page, and comma-separated lines are split as CSV.
+    """
+    lines = chars_to_lines(chars)
+    if not lines:
+        return None
+    boundaries = column_boundaries(lines)
+    table = lines_to_table(lines, description, boundaries) if boundaries else None
+    if table is not None:
+        return table
+    rows = text_to_rows(lines_to_text(lines, boundaries))
+    if not rows:
+        return None
+    return {'headers': rows[0], 'rows': rows[1:], 'description': description}
+
+
+def extract_tables_from_page(page) -> list:
+    """Tables from one pdfplumber page: ruled tables, then the text layer laid out in columns."""
     tables = []
-    try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for page in pdf.pages:
-                # Extract tables on the page
-                page_tables = page.extract_tables()
-                for t in page_tables:
-                    # Normalize rows to strings
-                    headers = [str(cell).strip() if cell is not None else '' for cell in t[0]] if t and len(t) > 0 else []
-                    rows = []
-                    for r in t[1:]:
-                        rows.append([str(cell).strip() if cell is not None else '' for cell in r])
-                    tables.append({
-                        'headers': headers,
-                        'rows': rows,
-                        'description': None,
-                    })
-                # If no explicit tables found, try to parse comma-separated or spaced text blocks as simple tables
-                if not page_tables:
-                    try:
-                        page_text = page.extract_text()
-                        # If pdfplumber couldn't extract text, try to reconstruct from character objects
-                        if not page_text:
-                            try:
-                                chars = page.chars
-                                if chars:
-                                    # group by approximate top coordinate
-                                    from collections import defaultdict
-                                    lines_map = defaultdict(list)
-                                    for ch in chars:
-                                        top = int(round(ch.get('top', 0)))
-                                        lines_map[top].append(ch)
-                                    lines = []
-                                    for top in sorted(lines_map.keys(), reverse=True):
-                                        row_chars = sorted(lines_map[top], key=lambda x: x.get('x0', 0))
-                                        line = ''.join([c.get('text', '') for c in row_chars])
-                                        lines.append(line)
-                                    page_text = '\n'.join(lines)
-                            except Exception:
-                                page_text = None
-                        if page_text:
-                            import csv
-                            from io import StringIO
-                            import re
-
-                            rows = []
-                            # First, try CSV reader if commas present
-                            if ',' in page_text:
-                                reader = csv.reader(StringIO(page_text))
-                                rows = [[cell.strip() for cell in row] for row in reader if any(cell.strip() for cell in row)]
-                            else:
-                                # Try splitting lines and then splitting by multiple spaces or tabs
-                                lines = [ln for ln in page_text.splitlines() if ln.strip()]
-                                for ln in lines:
-                                    parts = [p.strip() for p in re.split(r',|\s{2,}|\t', ln) if p.strip()]
-                                    if parts:
-                                        rows.append(parts)
-
-                            if rows:
-                                headers = rows[0] if len(rows) > 0 else []
-                                data_rows = rows[1:] if len(rows) > 1 else []
-                                tables.append({
-                                    'headers': headers,
-                                    'rows': data_rows,
-                                    'description': 'Parsed CSV-like text from PDF'
-                                })
-                    except Exception:
-                        pass
-    except Exception:
-        pass
-    # If no tables were found by pdfplumber, try a full-text extraction fallback using pdfminer
-    if not tables:
+    # Extract tables on the page
+    with stage('pdf_tables'):
+        page_tables = page.extract_tables()
+    for t in page_tables:
+        # Normalize rows to strings
+        headers = [str(cell).strip() if cell is not None else '' for cell in t[0]] if t and len(t) > 0 else []
+        rows = []
+        for r in t[1:]:
+            rows.append([str(cell).strip() if cell is not None else '' for cell in r])
+        tables.append({
+            'headers': headers,
+            'rows': rows,
+            'description': None,
+        })
+    # If no explicit tables found, rebuild rows and columns from the positioned characters
+    if not page_tables:
         try:
-            try:
-                from pdfminer.high_level import extract_text
-            except Exception:
-                extract_text = None
-            if extract_text is not None:
-                full_text = extract_text(io.BytesIO(pdf_bytes))
-                if full_text:
-                    import csv
-                    from io import StringIO
-                    import re
-                    rows = []
-                    if ',' in full_text:
-                        reader = csv.reader(StringIO(full_text))
-                        rows = [[cell.strip() for cell in row] for row in reader if any(cell.strip() for cell in row)]
-                    else:
-                        lines = [ln for ln in full_text.splitlines() if ln.strip()]
-                        for ln in lines:
-                            parts = [p.strip() for p in re.split(r',|\s{2,}|\t', ln) if p.strip()]
-                            if parts:
-                                rows.append(parts)
-
-                    if rows:
-                        headers = rows[0] if len(rows) > 0 else []
-                        data_rows = rows[1:] if len(rows) > 1 else []
-                        tables.append({
-                            'headers': headers,
-                            'rows': data_rows,
-                            'description': 'Parsed text (pdfminer)'
-                        })
+            with stage('text_fallback'):
+                table = page_text_table(page.chars)
+            if table is not None:
+                produced('text')
+                tables.append(table)
         except Exception:
             pass
     return tables
 
 
-def extract_text_from_image_bytes(img_bytes: bytes) -> str:
-    im = Image.open(io.BytesIO(img_bytes))
-    # convert to RGB for tesseract
-    if im.mode != 'RGB':
-        im = im.convert('RGB')
-    text = pytesseract.image_to_string(im)
-    return text
+def open_source(source: Source):
+    """pdfplumber, pdfminer and PIL accept either a path or a binary stream."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
 
 
-def parse_number(s: str) -> Optional[float]:
-    if s is None:
-        return None
-    s = str(s).strip()
-    if s == '':
+def pdf_page_count(source: Source) -> int:
+    """Number of pages, or 0 when the input is not a readable PDF."""
+    try:
+        with pdfplumber.open(open_source(source)) as pdf:
+            return len(pdf.pages)
+    except Exception:
+        return 0
+
+
+def extract_tables_from_pdf_pages(source: Source, start: int = 0, end: Optional[int] = None) -> list:
+    """Per-page tables for pages [start, end) as a list of (page_index, tables); tables is None where the page failed."""
+    results = []
+    try:
+        with pdfplumber.open(open_source(source)) as pdf:
+            pages = pdf.pages[start:end]
+            for offset, page in enumerate(pages):
+                try:
+                    page_tables = extract_tables_from_page(page)
+                except Exception:
+                    page_tables = None  # failed, unlike a page without tables: never stored for reuse
+                results.append((start + offset, page_tables))
+                # release the page's parsed layout; long ranges otherwise keep every page in memory
+                page.flush_cache()
+    except Exception:
+        pass
+    return results
+
+
+def ocr_pdf_pages(source: Source, start: int = 0, end: Optional[int] = None) -> list:
+    """Per-page tables of a scanned PDF for pages [start, end): each page's image is OCRed."""
+    results = []
+    try:
+        with pdfplumber.open(open_source(source)) as pdf:
+            pages = pdf.pages[start:end]
+            for offset, page in enumerate(pages):
+                try:
+                    im = pdf_page_image(page)
+                    page_tables = ocr_tables(im, 'OCR table') if im is not None else []
+                except Exception:
+                    page_tables = None
+                results.append((start + offset, page_tables))
+                page.flush_cache()
+    except Exception:
+        pass
+    return results
+
+
+def read_source(source: Source) -> bytes:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    with open(source, 'rb') as fh:
+        return fh.read()
+
+
+def text_grid_tables(source: Source) -> list:
+    """A plain-text/CSV document as one table (first row as headers)."""
+    rows = text_to_rows(read_source(source).decode('utf-8', errors='replace'))
+    if not rows:
+        return []
+    return [{'headers': rows[0], 'rows': rows[1:], 'description': 'Parsed text'}]
+
+
+def extract_tables_from_pdf_bytes(pdf_bytes: Source):
+    # pages without ruled tables already fall back to a text grid on the same parse
+    return merge_page_tables(extract_tables_from_pdf_pages(pdf_bytes))
+
+
+PAGE_EXTRACTORS = {VECTOR_TABLES: extract_tables_from_pdf_pages, RASTER_OCR: ocr_pdf_pages}
+
+
+async def page_fingerprints(source: Source, page_count: int) -> Optional[list]:
+    """
+    Every page's fingerprint (see `app.revisions`), computed in parallel, or
+    None when page reuse is off or the pages cannot be read.
+    """
+    if not page_count or not page_cache_enabled():
         return None
-    # Remove common currency symbols and spaces
-    s = s.replace('\u00A0', '').replace('\u202F', '').strip()
-    s = s.replace('$', '').replace('€', '').replace('£', '').replace('AED', '').replace('OMR', '')
-    # Handle parentheses as negative
-    negative = False
-    if s.startswith('(') and s.endswith(')'):
-        negative = True
-        s = s[1:-1]
-    # Remove thousands separators and non-numeric chars except dot, comma, and percent
-    s = s.replace(',', '')
-    # Handle percent
-    is_percent = False
-    if s.endswith('%'):
-        is_percent = True
-        s = s[:-1]
     try:
-        val = float(s)
-        if is_percent:
-            val = val / 100.0
-        if negative:
-            val = -val
-        return val
+        with stage('fingerprint'):
+            parts = await asyncio.gather(*(pool.run(pdf_page_fingerprints, source, start, end)
+                                           for start, end in split_page_ranges(page_count, pool.workers)))
     except Exception:
         return None
+    fingerprints = [fp for part in parts for fp in part]
+    return fingerprints if len(fingerprints) == page_count else None
+
+
+def missing_page_ranges(missing: list, plan_name: str) -> list:
+    """[start, end) ranges covering the pages still to extract, split for the worker pool."""
+    # OCR costs seconds per page, so every page gets its own task
+    chunks = split_page_ranges(len(missing), pool.workers, min_pages=1 if plan_name == RASTER_OCR else None)
+    return [run for start, end in chunks for run in page_runs(missing[start:end])]
+
+
+async def extract_pages_parallel(source: Source, plan_name: str, page_count: int, plan: Optional[dict] = None) -> list:
+    """
+    Page ranges extracted concurrently in the worker pool, with pdfplumber
+    (`vector_tables`) or OCR (`raster_ocr`), and merged in document order.
+    When `plan` carries `pageFingerprints`, pages extracted before (in this or
+    an earlier revision of the document) are taken from the page cache and
+    recorded in `plan['reusedPages']`; the new pages are stored.
+    """
+    if not page_count:
+        return []
+    fingerprints = (plan or {}).get('pageFingerprints')
+    cached = cached_pages(fingerprints, plan_name) if fingerprints else {}
+    missing = [page_no for page_no in range(page_count) if page_no not in cached]
+    extractor = PAGE_EXTRACTORS[plan_name]
+    parts = await asyncio.gather(*(pool.run(extractor, source, start, end)
+                                   for start, end in missing_page_ranges(missing, plan_name)))
+    fresh = [page for part in parts for page in part]
+    failed = [page_no for page_no, tables in fresh if tables is None]
+    if failed and plan is not None:
+        plan['degraded'] = f'pages: extraction failed on pages {failed}'
+    if fingerprints:
+        store_pages(fresh, fingerprints, plan_name)
+        plan['reusedPages'] = sorted(cached)
+    return merge_page_tables(list(cached.items()) + fresh)
+
+
+async def extract_tables_parallel(source: Source) -> list:
+    """Page-parallel version of `extract_tables_from_pdf_bytes`."""
+    page_count = await pool.run(pdf_page_count, source)
+    return await extract_pages_parallel(source, VECTOR_TABLES, page_count)
 
 
-def build_mock_boq_from_tables(tables) -> list:
-    # Heuristic: if a table has headers like 'Item' 'Description' 'Quantity' include as a BOQ
-    boqs = []
-    for t in tables:
-        headers = [h.lower() for h in t.get('headers', [])]
-        if any(x in ' '.join(headers) for x in ['description', 'qty', 'quantity', 'rate', 'amount']):
-            # Convert rows into BOQ items with best-effort parsing
-            items = []
-            for r in t.get('rows', []):
-                # Map columns heuristically
-                desc = ''
-                qty = 0.0
-                unit = ''
-                rate = 0.0
-                amount = 0.0
-                itemCode = ''
-                confidence = 0.0
-                for i, cell in enumerate(r):
-                    h = headers[i] if i < len(headers) else ''
-                    cell_str = str(cell).strip()
-                    if 'item' in h or 'code' in h:
-                        itemCode = cell_str
-                    elif 'desc' in h:
-                        desc = cell_str
-                    elif 'qty' in h or 'quantity' in h:
-                        parsed = parse_number(cell_str)
-                        if parsed is not None:
-                            qty = parsed
-                            confidence += 0.3
-                        else:
-                            qty = 0.0
-                    elif 'unit' in h:
-                        unit = cell_str
-                    elif 'rate' in h:
-                        parsed = parse_number(cell_str)
-                        if parsed is not None:
-                            rate = parsed
-                            confidence += 0.3
-                        else:
-                            rate = 0.0
-                    elif 'amount' in h or 'total' in h:
-                        parsed = parse_number(cell_str)
-                        if parsed is not None:
-                            amount = parsed
-                            confidence += 0.3
-                        else:
-                            amount = 0.0
-                    else:
-                        # fallback: append to description
-                        desc = (desc + ' ' + cell_str).strip()
-
-                # normalize confidence to 0..1
-                conf = min(1.0, confidence) if confidence > 0 else None
-                items.append(BOQItem(itemCode=itemCode or None, description=desc or '-', quantity=qty, unit=unit or '-', rate=rate, amount=amount, confidence=conf))
-
-            boqs.append(BOQ(title=None, description=None, items=items))
-    return boqs
+def extract_text_from_image_bytes(img_bytes: Source) -> str:
+    # preprocessed, tiled OCR; column gaps survive as double spaces for text_to_rows
+    return ocr_text(open_image(img_bytes))
+
+
+def pdf_pages_text(source: Source, ocr: bool) -> list:
+    """Text of every PDF page, from the text layer or by OCR of the page image."""
+    texts = []
+    with pdfplumber.open(open_source(source)) as pdf:
+        for page in pdf.pages:
+            if ocr:
+                im = pdf_page_image(page)
+                texts.append(ocr_text(im) if im is not None else '')
+            else:
+                with stage('pdf_text'):
+                    texts.append(page.extract_text() or '')
+            page.flush_cache()
+    return texts
+
+
+def document_text(source: Source, plan: Optional[dict] = None) -> str:
+    """
+    Plain text for LLM prompts following the document's plan: the PDF text
+    layer with pages separated by form feeds, OCR of scanned pages or images,
+    or the text itself.
+    """
+    plan = plan or plan_document(source)
+    name = plan.get('source', plan['plan'])
+    if name == TEXT_GRID:
+        return read_source(source).decode('utf-8', errors='replace')
+    if name == IMAGE_OCR:
+        return extract_text_from_image_bytes(source)
+    if name not in (VECTOR_TABLES, RASTER_OCR):
+        return ''
+    pages = pdf_pages_text(source, ocr=name == RASTER_OCR)
+    if name == VECTOR_TABLES and plan.get('images') and not any(p.strip() for p in pages):
+        pages = pdf_pages_text(source, ocr=True)
+    return '\f'.join(pages)
+
+
+def ocr_lines_table(source: Source, description: str = 'OCR text lines') -> list:
+    """OCR an image into a table rebuilt from word positions (single text column when nothing lines up)."""
+    return ocr_tables(open_image(source), description)
+
+
+def price_boqs(boqs: list):
+    """Suggested rates for unpriced items (`app.rates`); a broken rate library never fails the extraction."""
+    try:
+        with stage('rates'):
+            fill_rates(boqs)
+    except Exception:
+        pass
+
+
+def build_extracted_data(tables: list) -> dict:
+    """Build BOQs heuristically from tables and return an ExtractedData dict."""
+    try:
+        with stage('boq'):
+            boqs = build_mock_boq_from_tables(tables)
+    except Exception:
+        boqs = []
+    price_boqs(boqs)
+    with stage('serialize'):
+        # the tables are built here from strings; only the BOQs went through validation
+        return {
+            'tables': tables or None,
+            'lists': None,
+            'prices': None,
+            'boqs': [b.model_dump() for b in boqs] or None,
+            'metadata': None,
+        }
+
+
+def with_boqs(pages: list) -> list:
+    """
+    (page, tables) -> (page, cleaned tables, BOQ dicts, tables); tables are
+    cleaned like `merge_page_tables` does, and also returned as extracted for the page cache.
+    """
+    results = []
+    for page_no, raw in pages:
+        tables = merge_page_tables([(page_no, raw)])
+        try:
+            with stage('boq'):
+                boqs = build_mock_boq_from_tables(tables)
+        except Exception:
+            boqs = []
+        price_boqs(boqs)
+        boqs = [b.model_dump() for b in boqs]
+        results.append((page_no, tables, boqs, raw))
+    return results
+
+
+def extract_page_results(source: Source, start: int, end: int) -> list:
+    """Tables and BOQ dicts for each page in [start, end), for progressive streaming."""
+    return with_boqs(extract_tables_from_pdf_pages(source, start, end))
+
+
+def ocr_page_results(source: Source, start: int, end: int) -> list:
+    """`extract_page_results` for scanned PDFs."""
+    return with_boqs(ocr_pdf_pages(source, start, end))
+
+
+async def plan_for(source: Source, content_type: Optional[str] = None, mode: str = 'mock') -> dict:
+    """`plan_document` in the worker pool (it opens the PDF)."""
+    try:
+        return await pool.run(plan_document, source, content_type, mode)
+    except Exception:
+        return empty_plan(mime=content_type)
+
+
+def mark_degraded(plan: dict, step: str, e: Exception):
+    """Record a step that failed and was skipped: the result is still returned, but not cached."""
+    plan['degraded'] = f'{step}: {type(e).__name__}: {e}'
+
+
+async def fallback_tables(source: Source, plan: dict, ocr_description: str = 'OCR text lines') -> list:
+    """Tables for documents without page tables: OCR of the page images, an image, or plain text."""
+    name = plan.get('source', plan['plan'])
+    try:
+        if name == VECTOR_TABLES and plan.get('images'):
+            # a text layer (e.g. a stamped header) over scanned pages
+            plan['fallback'] = RASTER_OCR
+            return await extract_pages_parallel(source, RASTER_OCR, plan['pages'], plan)
+        if name == IMAGE_OCR:
+            return await pool.run(ocr_lines_table, source, ocr_description)
+        if name == TEXT_GRID:
+            return await pool.run(text_grid_tables, source)
+    except Exception as e:
+        mark_degraded(plan, 'fallback', e)
+    return []
+
+
+async def run_local_extraction(source: Source, ocr_description: str = 'OCR text lines', plan: Optional[dict] = None) -> dict:
+    """
+    Open-source extraction (pdfplumber + pytesseract + BOQ heuristics) following
+    the document's plan, so each document is parsed by one extractor only.
+    Every blocking step runs in the worker pool; PDF pages are extracted in
+    parallel, and only pages not seen before (see `app.revisions`). The plan
+    is returned as `metadata`, with `degraded` set when a step failed and was
+    skipped.
+    """
+    plan = dict(plan) if plan else await plan_for(source)
+    name = plan.get('source', plan['plan'])
+    tables = []
+    if name in PAGE_EXTRACTORS:
+        try:
+            fingerprints = await page_fingerprints(source, plan['pages'])
+            if fingerprints:
+                plan['pageFingerprints'] = fingerprints
+            tables = await extract_pages_parallel(source, name, plan['pages'], plan)
+        except Exception as e:
+            # e.g. a worker killed by the OOM killer: try the fallback, but don't cache what it gives
+            mark_degraded(plan, 'pages', e)
+            tables = []
+    if not tables:
+        tables = await fallback_tables(source, plan, ocr_description)
+
+    result = await pool.run(build_extracted_data, tables)
+    result['metadata'] = plan
+    return result
+
+
+async def read_document_text(source: Source, plan: Optional[dict] = None) -> str:
+    """`document_text` in the worker pool; returns '' when nothing could be read."""
+    try:
+        return await pool.run(document_text, source, plan)
+    except Exception:
+        return ''
+
+
+@app.on_event('shutdown')
+def shutdown_pool():
+    pool.shutdown()
+
+
+async def extract_document(source: Source, mode: str, content_type: Optional[str] = None,
+                           plan: Optional[dict] = None) -> Tuple[dict, bool]:
+    """
+    Run the blocking/LLM extraction for `mode` on document bytes or a spooled file path.
+    Returns (ExtractedData dict, cacheable); fallback and degraded results are not cacheable.
+    `content_type` is only a hint: the document type is sniffed from its bytes.
+    """
+    plan = plan or await plan_for(source, content_type, mode)
+    if mode == 'tgi':
+        return await extract_with_tgi(source, plan)
+    if mode == 'llama':
+        return await extract_with_llama(source, plan)
+    # Default/mock mode: attempt open-source extraction (pdfplumber + pytesseract)
+    result = await run_local_extraction(source, plan=plan)
+    return result, not result['metadata'].get('degraded')
+
+
+async def cached_extraction_response(request: Request, source: Source, mode: str, digest: Optional[str] = None,
+                                     use_cache: bool = True, content_type: Optional[str] = None,
+                                     fmt: Optional[str] = None, baseline: Optional[str] = None) -> Response:
+    """
+    Serve a stored result for (document, mode) or extract and store it. Paths need `digest`.
+    The response is encoded per `fmt` and the request's Accept-Encoding (see `app.responses`).
+    `baseline` is the result id of an earlier revision; its page diff is added to `metadata`.
+    """
+    mode = mode if mode in ('tgi', 'llama') else 'mock'
+    set_mode(mode)
+    key = result_cache.key(digest or digest_bytes(source), mode)
+    previous = baseline_fingerprints(baseline) if baseline else None
+    headers = {'X-Cache': 'hit', 'X-Result-Id': key}
+    if use_cache:
+        body = result_cache.get(key)
+        if body is not None:
+            if previous is not None:
+                return json_response(request, with_diff(loads(body), previous, stored_fingerprints(key)), headers=headers, fmt=fmt)
+            return json_response(request, body=body, headers=headers, fmt=fmt)
+    async with pool.admit():
+        content, cacheable = await extract_document(source, mode, content_type)
+    count_extraction(mode)
+    headers['X-Cache'] = 'miss'
+    fingerprints = keep_fingerprints(key, content)
+    with stage('serialize'):
+        if previous is not None:
+            # the stored result stays free of the diff, which depends on the baseline
+            if cacheable:
+                result_cache.put(key, dumps(content))
+            return json_response(request, with_diff(content, previous, fingerprints), headers=headers, fmt=fmt)
+        return json_response(request, content, headers=headers, fmt=fmt,
+                             on_body=(lambda body: result_cache.put(key, body)) if cacheable else None)
 
 
 @app.post('/extract', response_model=ExtractedData)
-async def extract(data: ExtractDataInput, mode: Optional[str] = Query('mock')):
+async def extract(data: ExtractDataInput, request: Request, mode: Optional[str] = Query('mock'), cache: bool = Query(True),
+                  fmt: Optional[str] = Query(None, alias='format'), baseline: Optional[str] = Query(None)):
     """
     mode: 'mock' (default) — return mocked data
           'genai' — attempt to call external GenAI endpoint configured with env vars
+    cache: set to false to bypass the result cache and force a fresh extraction
+    format: 'columnar' returns BOQ items as column + row arrays
+    baseline: X-Result-Id of an earlier revision of the document; adds a page diff to `metadata`
     """
+    set_mode(mode if mode in ('genai', 'tgi', 'llama') else 'mock')
     try:
         if mode == 'genai':
             try:
                 result = await call_external_genai(data.fileDataUri)
-                return JSONResponse(content=result.model_dump())
             except Exception as e:
+                count_extraction('genai', path='error')
                 # Surface helpful message so frontend can show reason
                 raise HTTPException(status_code=502, detail=f'GenAI error: {str(e)}')
+            count_extraction('genai', path='genai')
+            return json_response(request, body=result.model_dump_json().encode('utf-8'), fmt=fmt)
 
-        if mode == 'tgi':
-            # Call a local Text-Generation-Inference (TGI) server via HTTP
-            tgi_endpoint = os.getenv('PY_TGI_ENDPOINT', 'http://127.0.0.1:8080/v1/models/default/generate')
-            # Build a short prompt from OCR/text
-            try:
-                raw_bytes = decode_data_uri(data.fileDataUri)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f'Invalid data URI: {e}')
-            text = ''
-            try:
-                text = extract_text_from_image_bytes(raw_bytes)
-            except Exception:
-                text = ''
-
-            prompt = (
-                "Extract tables and bill of quantities (BOQ) from the following text. "
-                "Return JSON only with keys: tables (headers+rows) and boqs (items with description, quantity, unit, rate, amount).\n\n" + text
-            )
-            try:
-                async with httpx.AsyncClient(timeout=15.0) as client:
-                    payload = {"inputs": prompt, "parameters": {"max_new_tokens": 512, "temperature": 0.0}}
-                    headers = {"Content-Type": "application/json"}
-                    hf_token = os.getenv('PY_GENAI_KEY')
-                    if hf_token:
-                        headers['Authorization'] = f'Bearer {hf_token}'
-                    resp = await client.post(tgi_endpoint, json=payload, headers=headers)
-                    resp.raise_for_status()
-                    data = resp.json()
-                    text_out = ''
-                    if isinstance(data, dict):
-                        text_out = data.get('generated_text') or (data.get('results')[0].get('text') if data.get('results') else None) or str(data)
-                    else:
-                        text_out = str(data)
-                parsed = try_parse_json_from_text(text_out)
-                extracted = ExtractedData.model_validate(parsed)
-                return JSONResponse(content=extracted.model_dump())
-            except Exception as e:
-                # If TGI isn't available or parsing failed, fallback to local open-source extraction (mock path)
-                try:
-                    raw_bytes = decode_data_uri(data.fileDataUri)
-                except Exception:
-                    raise HTTPException(status_code=502, detail=f'TGI error and invalid data URI: {e}')
-                # Attempt pdfplumber/pytesseract pipeline as fallback
-                try:
-                    tables = extract_tables_from_pdf_bytes(raw_bytes)
-                except Exception:
-                    tables = []
-                if not tables:
-                    try:
-                        text = extract_text_from_image_bytes(raw_bytes)
-                        lines = [l.strip() for l in text.splitlines() if l.strip()]
-                        if lines:
-                            rows = [[ln] for ln in lines]
-                            tables = [{ 'headers': ['text'], 'rows': rows, 'description': 'OCR text lines (TGI fallback)' }]
-                    except Exception:
-                        tables = []
-                boqs = []
-                try:
-                    boqs = build_mock_boq_from_tables(tables)
-                except Exception:
-                    boqs = []
-                extracted = ExtractedData(tables=tables or None, lists=None, prices=None, boqs=boqs or None)
-                return JSONResponse(content=extracted.model_dump())
-
-        if mode == 'llama':
-            # Call a local Llama model via llama-cpp-python using the robust JSON wrapper
-            if Llama is None:
-                raise HTTPException(status_code=500, detail='llama-cpp-python is not installed')
-            model_path = os.getenv('PY_LLAMA_MODEL_PATH')
-            if not model_path:
-                raise HTTPException(status_code=400, detail='PY_LLAMA_MODEL_PATH not set')
-            try:
+        try:
+            with stage('decode'):
                 raw_bytes = decode_data_uri(data.fileDataUri)
-            except Exception as e:
-                raise HTTPException(status_code=400, detail=f'Invalid data URI: {e}')
-            text = ''
-            try:
-                text = extract_text_from_image_bytes(raw_bytes)
-            except Exception:
-                text = ''
-            try:
-                llm = Llama(model_path=model_path)
-                extracted = llama_json_extract(llm, text)
-                return JSONResponse(content=extracted.model_dump())
-            except HTTPException:
-                raise
-            except Exception as e:
-                raise HTTPException(status_code=502, detail=f'Llama extraction error: {str(e)}')
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f'Invalid data URI: {e}')
+        return await cached_extraction_response(request, raw_bytes, mode, use_cache=cache,
+                                                content_type=data_uri_mime(data.fileDataUri), fmt=fmt, baseline=baseline)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Default/mock mode: attempt open-source extraction (pdfplumber + pytesseract)
-        try:
+
+@app.post('/extract/upload', response_model=ExtractedData)
+async def extract_upload(request: Request, mode: Optional[str] = Query('mock'), cache: bool = Query(True),
+                         fmt: Optional[str] = Query(None, alias='format'), baseline: Optional[str] = Query(None)):
+    """
+    Same as /extract, but the document is sent as a raw body (application/pdf,
+    image/*, application/octet-stream) or multipart/form-data `file` field
+    instead of a base64 data URI. The body is spooled to disk and hashed while
+    it is read, so large drawings do not have to fit in memory.
+    """
+    if mode == 'genai':
+        raise HTTPException(status_code=400, detail='mode=genai requires the JSON /extract endpoint')
+    try:
+        async with spooled_upload(request) as upload:
+            return await cached_extraction_response(request, upload.path, mode, digest=upload.digest, use_cache=cache,
+                                                    content_type=upload.content_type, fmt=fmt, baseline=baseline)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post('/extract/batch')
+async def extract_batch(request: Request, mode: Optional[str] = Query('mock'), cache: bool = Query(True),
+                        fmt: Optional[str] = Query(None, alias='format')):
+    """
+    Extract a whole tender package in one call: a ZIP archive as the raw body,
+    or any number of files (ZIPs included) as multipart/form-data parts.
+    Files run in parallel, largest first (see `app.batch`). Returns a manifest
+    with per-file status, timings and ExtractedData `result`, plus a summary.
+    """
+    if mode == 'genai':
+        raise HTTPException(status_code=400, detail='mode=genai requires the JSON /extract endpoint')
+    mode = mode if mode in ('tgi', 'llama') else 'mock'
+    set_mode(mode)
+    directory = tempfile.mkdtemp(prefix='estim-batch-', dir=os.getenv('PY_UPLOAD_DIR') or None)
+    try:
+        async with spooled_uploads(request) as uploads:
+            files = await asyncio.to_thread(expand_uploads, uploads, directory)
+            plans = await asyncio.gather(*(plan_for(f.path, f.content_type, mode) for f in files))
+            for f, plan in zip(files, plans):
+                f.plan, f.cost = plan, estimate_cost(plan, f.size)
+
+            async def extract_file(f: BatchFile) -> dict:
+                key = result_cache.key(f.digest, mode)
+                f.entry.update(name=f.name, size=f.size, resultId=key, plan=f.plan['plan'])
+                if f.plan['plan'] == 'none':
+                    f.entry['status'] = 'skipped'
+                    return f.entry
+                body = result_cache.get(key) if cache else None
+                if body is not None:
+                    content, f.entry['cache'] = loads(body), 'hit'
+                else:
+                    content, cacheable = await extract_document(f.path, mode, f.content_type, f.plan)
+                    count_extraction(mode)
+                    keep_fingerprints(key, content)
+                    f.entry['cache'] = 'miss'
+                    if cacheable:
+                        result_cache.put(key, dumps(content))
+                f.entry.update(status='done', result=to_columnar(content) if fmt == COLUMNAR else content)
+                return f.entry
+
+            default = max(2, pool.workers)
+            async with pool.admit():
+                summary = await run_batch(files, extract_file, int(os.getenv('PY_BATCH_CONCURRENCY', str(default))))
+            # entries keep the package order; names/sizes are filled in for files that never started
+            manifest = [dict({'name': f.name, 'size': f.size}, **f.entry) for f in files]
+        with stage('serialize'):
+            return json_response(request, {'files': manifest, 'summary': summary})
+    finally:
+        await asyncio.to_thread(remove_tree, directory)
+
+
+def format_event(event: dict, sse: bool = False) -> bytes:
+    """One NDJSON line, or one Server-Sent Event when the client asked for text/event-stream."""
+    data = json.dumps(event, separators=(',', ':'))
+    if sse:
+        return f"event: {event['event']}\ndata: {data}\n\n".encode('utf-8')
+    return (data + '\n').encode('utf-8')
+
+
+PAGE_RESULTS = {VECTOR_TABLES: extract_page_results, RASTER_OCR: ocr_page_results}
+
+
+async def iter_local_extraction(source: Source, plan: Optional[dict] = None) -> AsyncIterator[dict]:
+    """
+    Page-by-page version of `run_local_extraction`. Yields a `start` event with
+    the page count and plan, one `page` event (tables, BOQs, progress) per PDF
+    page as soon as that page is done (completion order), and a `fallback`
+    event with the OCR/text result for images, text and PDFs where no page
+    produced a table. Continuation tables are not stitched; see `merge_page_tables`.
+    Pages found in the page cache (`app.revisions`) come first, marked `reused`;
+    the page fingerprints are in the `start` event, for the caller to keep.
+    """
+    started = time.perf_counter()
+    elapsed_ms = lambda: round((time.perf_counter() - started) * 1000, 1)
+    pending = []
+    found_tables = False
+    try:
+        plan = dict(plan) if plan else await plan_for(source)
+        page_results = PAGE_RESULTS.get(plan['plan'])
+        page_count = (plan['pages'] or 0) if page_results else 0
+        fingerprints = await page_fingerprints(source, page_count)
+        cached = {}
+        if fingerprints:
+            cached = cached_pages(fingerprints, plan['plan'])
+            plan['reusedPages'] = sorted(cached)
+        yield {'event': 'start', 'pages': page_count, 'plan': plan, 'fingerprints': fingerprints}
+        if page_count:
+            size = max(1, int(os.getenv('PY_STREAM_PAGES_PER_TASK', '1')))
+            if cached:
+                pending.append(asyncio.ensure_future(pool.run(with_boqs, sorted(cached.items()))))
+            missing = [page_no for page_no in range(page_count) if page_no not in cached]
+            pending += [
+                asyncio.ensure_future(pool.run(page_results, source, start, min(start + size, run_end)))
+                for run_start, run_end in page_runs(missing)
+                for start in range(run_start, run_end, size)
+            ]
+            done = 0
+            for fut in asyncio.as_completed(pending):
+                results = await fut
+                if fingerprints:
+                    store_pages([(page[0], page[3]) for page in results if page[0] not in cached], fingerprints, plan['plan'])
+                for page_no, tables, boqs, _ in results:
+                    done += 1
+                    found_tables = found_tables or bool(tables)
+                    yield {'event': 'page', 'page': page_no, 'tables': tables, 'boqs': boqs, 'reused': page_no in cached,
+                           'done': done, 'pages': page_count, 'elapsedMs': elapsed_ms()}
+
+        if not found_tables:
+            # same fallbacks as the buffered pipeline
+            tables = await fallback_tables(source, plan)
+            if tables:
+                result = await pool.run(build_extracted_data, tables)
+                result['metadata'] = plan
+                yield {'event': 'fallback', 'result': result}
+    finally:
+        # client went away or we failed: drop pages nobody will read
+        for fut in pending:
+            fut.cancel()
+
+
+async def stream_local_extraction(source: Source, sse: bool = False) -> AsyncIterator[bytes]:
+    """
+    Progressive version of `run_local_extraction` for /extract/stream: each
+    page's tables and BOQs are emitted as soon as that page is done (tagged
+    with the 0-based page index), interleaved with progress events and
+    followed by a summary.
+    """
+    started = time.perf_counter()
+    counts = {'tables': 0, 'boqs': 0, 'items': 0}
+    page_count = 0
+    plan = None
+    try:
+        async for event in iter_local_extraction(source):
+            if event['event'] == 'start':
+                page_count, plan = event['pages'], event['plan']
+                yield format_event({'event': 'start', 'pages': page_count, 'plan': plan}, sse)
+                continue
+            if event['event'] == 'page':
+                page_no, tables, boqs = event['page'], event['tables'], event['boqs']
+            else:
+                page_no, tables, boqs = None, event['result'].get('tables') or [], event['result'].get('boqs') or []
+            for table in tables:
+                counts['tables'] += 1
+                yield format_event({'event': 'table', 'page': page_no, 'table': table}, sse)
+            for boq in boqs:
+                counts['boqs'] += 1
+                counts['items'] += len(boq['items'])
+                yield format_event({'event': 'boq', 'page': page_no, 'boq': boq}, sse)
+            if event['event'] == 'page':
+                yield format_event({'event': 'progress', 'page': page_no, 'done': event['done'], 'pages': page_count, 'elapsedMs': event['elapsedMs']}, sse)
+        count_extraction('mock')
+        yield format_event({'event': 'summary', 'pages': page_count, **counts, 'plan': plan and plan['plan'], 'elapsedMs': round((time.perf_counter() - started) * 1000, 1)}, sse)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        yield format_event({'event': 'error', 'detail': str(e), 'elapsedMs': round((time.perf_counter() - started) * 1000, 1)}, sse)
+
+
+async def streaming_extraction_response(request: Request, source: Source, cleanup: AsyncExitStack) -> StreamingResponse:
+    """Admit the request and stream it; `cleanup` is closed once the response is finished or aborted."""
+    sse = 'text/event-stream' in request.headers.get('accept', '')
+    set_mode('mock')
+    await cleanup.enter_async_context(pool.admit())
+    return StreamingResponse(
+        stream_local_extraction(source, sse),
+        media_type='text/event-stream' if sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        background=BackgroundTask(cleanup.aclose),
+    )
+
+
+@app.post('/extract/stream')
+async def extract_stream(data: ExtractDataInput, request: Request):
+    """
+    Open-source extraction streamed as NDJSON (or SSE with `Accept: text/event-stream`).
+    Events: start, table, boq, progress (page i of N, elapsed ms), summary, error.
+    """
+    try:
+        with stage('decode'):
             raw_bytes = decode_data_uri(data.fileDataUri)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f'Invalid data URI: {e}')
+    return await streaming_extraction_response(request, raw_bytes, AsyncExitStack())
+
+
+@app.post('/extract/upload/stream')
+async def extract_upload_stream(request: Request):
+    """Streaming variant of /extract/upload; same events as /extract/stream."""
+    cleanup = AsyncExitStack()
+    try:
+        upload = await cleanup.enter_async_context(spooled_upload(request))
+        return await streaming_extraction_response(request, upload.path, cleanup)
+    except BaseException:
+        await cleanup.aclose()
+        raise
+
+
+async def run_job(job: dict, queue: JobQueue) -> bytes:
+    """Job handler: extract the stored input, recording per-page progress and partial results."""
+    with request_timings(job['mode']):
+        return await run_job_extraction(job, queue)
+
+
+async def run_job_extraction(job: dict, queue: JobQueue) -> bytes:
+    source = queue.input_path(job['id'])
+    mode = job['mode']
+    key = result_cache.key(job['digest'], mode)
+    body = result_cache.get(key)
+    if body is not None:
+        return body
+    if mode in ('tgi', 'llama'):
+        content, cacheable = await extract_document(source, mode)
+    else:
+        content, cacheable, pages, plan = None, True, [], None
+        async for event in iter_local_extraction(source):
+            if event['event'] == 'start':
+                plan = event['plan']
+                store_fingerprints(key, event['fingerprints'])
+                queue.set_total(job['id'], event['pages'])
+            elif event['event'] == 'page':
+                queue.add_page(job['id'], event['page'], event['tables'], event['boqs'])
+                pages.append((event['page'], event['tables']))
+            elif event['event'] == 'fallback':
+                content = event['result']
+        if content is None:
+            # same result as /extract: stitch continuation tables, then build BOQs
+            content = await pool.run(build_extracted_data, merge_page_tables(pages))
+            content['metadata'] = plan
+    count_extraction(mode)
+    keep_fingerprints(key, content)
+    with stage('serialize'):
+        body = dumps(content)
+    if cacheable:
+        result_cache.put(key, body)
+    return body
+
+
+job_queue = JobQueue()
+job_runners = JobRunners(job_queue, run_job)
+
+
+@app.on_event('startup')
+async def start_job_runners():
+    job_runners.start()
+
+
+@app.on_event('shutdown')
+async def stop_job_runners():
+    await job_runners.stop()
+
+
+def job_summary(job: dict) -> dict:
+    def ts(value):
+        return round(value, 3) if value is not None else None
+
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'mode': job['mode'],
+        'filename': job['filename'],
+        'size': job['size'],
+        'progress': {'pagesDone': job['pages_done'], 'pagesTotal': job['pages_total']},
+        'createdAt': ts(job['created']),
+        'startedAt': ts(job['started']),
+        'finishedAt': ts(job['finished']),
+        'expiresAt': ts(job['expires']),
+        'error': job['error'],
+    }
+
+
+@app.post('/jobs', status_code=202)
+async def create_job(request: Request, mode: Optional[str] = Query('mock')):
+    """
+    Queue an extraction and return its id right away. Accepts the /extract JSON
+    body ({ fileDataUri }) or a raw/multipart body like /extract/upload.
+    """
+    mode = mode if mode in ('tgi', 'llama') else 'mock'
+    set_mode(mode)
+    job_id = uuid.uuid4().hex
+    dest = job_queue.input_path(job_id)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if request.headers.get('content-type', '').startswith('application/json'):
+        try:
+            data = ExtractDataInput.model_validate(await request.json())
+            with stage('decode'):
+                raw_bytes = decode_data_uri(data.fileDataUri)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f'Invalid data URI: {e}')
+        with open(dest, 'wb') as fh:
+            fh.write(raw_bytes)
+        digest, size, filename = digest_bytes(raw_bytes), len(raw_bytes), None
+    else:
+        async with spooled_upload(request) as upload:
+            shutil.move(upload.path, dest)
+            digest, size, filename = upload.digest, upload.size, upload.filename
+    job_queue.submit(job_id, mode, digest, size, filename)
+    job_runners.notify()
+    return {'id': job_id, 'status': 'queued'}
 
-        tables = []
-        boqs = []
 
-        # Try PDF extraction first
+@app.get('/jobs/{job_id}')
+async def get_job(job_id: str, request: Request, fmt: Optional[str] = Query(None, alias='format')):
+    """
+    Job status and progress; partial tables/BOQs while running, the ExtractedData
+    `result` once done (`format=columnar` as for /extract).
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found or expired')
+    summary = job_summary(job)
+    if job['status'] == 'done' and job['result'] is not None:
+        # splice the stored JSON in as-is instead of re-parsing it
+        result = bytes(job['result'])
+        if fmt == COLUMNAR:
+            result = dumps(to_columnar(loads(result)))
+        head = dumps(summary)[:-1]
+        return json_response(request, body=head + b',"result":' + result + b'}')
+    if job['status'] == 'running':
+        pages = job_queue.pages(job_id)
+        summary['partial'] = {
+            'tables': [t for _, tables, _ in pages for t in tables],
+            'boqs': [b for _, _, boqs in pages for b in boqs],
+        }
+    return summary
+
+
+@app.delete('/jobs/{job_id}')
+async def cancel_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Job not found or expired')
+    if not job_runners.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job_queue.get(job_id)['status']}")
+    return {'id': job_id, 'status': 'cancelled'}
+
+
+def stored_result(result_id: str) -> dict:
+    """A cached result by its X-Result-Id, or the result of a finished job by its id."""
+    body = result_cache.get(result_id)
+    if body is None:
+        job = job_queue.get(result_id)
+        if job is not None and job['status'] == 'done' and job['result'] is not None:
+            body = bytes(job['result'])
+    if body is None:
+        raise HTTPException(status_code=404, detail=f'Result {result_id} not found (it may have expired from the cache)')
+    return loads(body)
+
+
+def export_response(content: dict, fmt: str, sheet: Optional[int], filename: str) -> StreamingResponse:
+    """Stream `content` as an XLSX workbook or CSV, one sheet per table and BOQ."""
+    if fmt not in ('xlsx', 'csv'):
+        raise HTTPException(status_code=400, detail=f'Unsupported export format {fmt!r}; use xlsx or csv')
+    sheets = sheets_for(content)
+    if sheet is not None:
+        if not 1 <= sheet <= len(sheets):
+            raise HTTPException(status_code=400, detail=f'sheet must be between 1 and {len(sheets)}')
+        sheets = [sheets[sheet - 1]]
+    # a sync iterator: Starlette runs it in a thread, so building rows does not block the event loop
+    body = iter_xlsx(sheets) if fmt == 'xlsx' else iter_csv(sheets)
+    return StreamingResponse(body, media_type=XLSX_MEDIA_TYPE if fmt == 'xlsx' else CSV_MEDIA_TYPE,
+                             headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'})
+
+
+@app.get('/export/{result_id}')
+async def export_result(result_id: str, fmt: str = Query('xlsx', alias='format'), sheet: Optional[int] = Query(None)):
+    """
+    Download a stored result (X-Result-Id of /extract, or a finished job id) as a spreadsheet.
+    format: 'xlsx' (default) or 'csv'; sheet: export only the n-th sheet (1-based)
+    """
+    return export_response(stored_result(result_id), fmt, sheet, f'boq-{result_id[:12]}')
+
+
+@app.post('/export')
+async def export_body(request: Request, fmt: str = Query('xlsx', alias='format'), sheet: Optional[int] = Query(None)):
+    """Same as GET /export/{id} for an ExtractedData JSON body."""
+    try:
+        content = loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f'Invalid JSON body: {e}')
+    if not isinstance(content, dict):
+        raise HTTPException(status_code=400, detail='Expected an ExtractedData object')
+    return export_response(content, fmt, sheet, 'boq')
+
+
+TGI_PROMPT = (
+    "Extract tables and bill of quantities (BOQ) from the following text. "
+    "Return JSON only with keys: tables (headers+rows) and boqs (items with description, quantity, unit, rate, amount).\n\n"
+)
+
+
+def tgi_generated_text(body: Any) -> str:
+    """The generated text of a non-streamed TGI answer."""
+    if isinstance(body, dict):
+        return body.get('generated_text') or (body.get('results')[0].get('text') if body.get('results') else None) or str(body)
+    if isinstance(body, list) and body and isinstance(body[0], dict):
+        return body[0].get('generated_text') or str(body)
+    return str(body)
+
+
+def tgi_stream_endpoint(endpoint: str) -> Optional[str]:
+    """`PY_TGI_STREAM_ENDPOINT`, or `.../generate_stream` next to a `.../generate` endpoint."""
+    if not llm_stream_enabled():
+        return None
+    configured = os.getenv('PY_TGI_STREAM_ENDPOINT')
+    if configured:
+        return configured
+    return endpoint + '_stream' if endpoint.rstrip('/').endswith('/generate') else None
+
+
+def tgi_token(line: str) -> Optional[str]:
+    """Text of one `data:` line of TGI's server-sent events, None for other lines and special tokens."""
+    if not line.startswith('data:'):
+        return None
+    event = json.loads(line[5:])
+    if event.get('error'):
+        raise RuntimeError(f"TGI error: {event['error']}")
+    token = event.get('token') or {}
+    return None if token.get('special') else token.get('text')
+
+
+async def tgi_extract_chunk(chunk: str) -> ExtractedData:
+    """
+    Send one chunk to TGI and parse its JSON answer. Tokens are streamed
+    into `ExtractionStream` and the stream is closed as soon as the answer is
+    complete; servers without a streaming endpoint get a plain request.
+    """
+    tgi_endpoint = os.getenv('PY_TGI_ENDPOINT', 'http://127.0.0.1:8080/v1/models/default/generate')
+    max_new_tokens = int(os.getenv('PY_TGI_MAX_NEW_TOKENS', '1024'))
+    payload = {"inputs": TGI_PROMPT + chunk, "parameters": {"max_new_tokens": max_new_tokens, "temperature": 0.0}}
+    headers = {"Content-Type": "application/json"}
+    hf_token = os.getenv('PY_GENAI_KEY')
+    if hf_token:
+        headers['Authorization'] = f'Bearer {hf_token}'
+    stream_endpoint = tgi_stream_endpoint(tgi_endpoint)
+    with stage('tgi'):
+        if stream_endpoint:
+            started = time.perf_counter()
+            async with tgi_upstream.stream(stream_endpoint, json=payload, headers=headers) as resp:
+                if resp.status_code not in (404, 405):
+                    resp.raise_for_status()
+                    if 'text/event-stream' not in resp.headers.get('content-type', ''):
+                        return parse_extracted(tgi_generated_text(json.loads(await resp.aread())))
+                    parser = ExtractionStream()
+                    async for line in resp.aiter_lines():
+                        feed_answer(parser, tgi_token(line) or '', started)
+                        if parser.done:
+                            break  # closing the connection stops generation
+                    return parser.result()
+        resp = await tgi_upstream.post(tgi_endpoint, json=payload, headers=headers)
+    resp.raise_for_status()
+    return parse_extracted(tgi_generated_text(resp.json()))
+
+
+async def extract_with_tgi(source: Source, plan: Optional[dict] = None) -> Tuple[dict, bool]:
+    # Call a local Text-Generation-Inference (TGI) server via HTTP, one request per text chunk
+    plan = plan or await plan_for(source, mode='tgi')
+    if not tgi_upstream.available():
+        # breaker is open: don't spend OCR time on a prompt we won't send
+        return await run_local_extraction(source, 'OCR text lines (TGI fallback)', dict(plan, fallback='local')), False
+    chunks = split_text_chunks(await read_document_text(source, plan))
+    if chunks:
+        concurrency = int(os.getenv('PY_LLM_CONCURRENCY', '4'))
+        run = await run_chunks(chunks, tgi_extract_chunk, concurrency=concurrency, give_up_on=(CircuitOpenError,))
+        if run.failed < len(chunks):
+            # partial results are returned but not cached, so a retry can fill the gaps
+            return dict(run.merged().model_dump(), metadata=plan), run.failed == 0
+    # If TGI isn't available or parsing failed, fallback to local open-source extraction (mock path)
+    return await run_local_extraction(source, 'OCR text lines (TGI fallback)', dict(plan, fallback='local')), False
+
+
+@app.on_event('shutdown')
+async def close_upstreams():
+    await tgi_upstream.aclose()
+    await genai_upstream.aclose()
+
+
+async def extract_with_llama(source: Source, plan: Optional[dict] = None) -> Tuple[dict, bool]:
+    # Call a local Llama model via llama-cpp-python using the robust JSON wrapper.
+    # The model stays resident in `model_registry`; each chunk borrows an instance.
+    model_path = os.getenv('PY_LLAMA_MODEL_PATH')
+    if not model_path:
+        raise HTTPException(status_code=400, detail='PY_LLAMA_MODEL_PATH not set')
+    try:
+        await model_registry.preload(model_path)
+    except ModelLoadError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f'Llama extraction error: {str(e)}')
+
+    async def extract_chunk(chunk: str) -> ExtractedData:
+        async with model_registry.acquire(model_path) as llm:
+            with stage('llama'):
+                return await asyncio.to_thread(llama_json_extract, llm, chunk, 1)
+
+    plan = plan or await plan_for(source, mode='llama')
+    chunks = split_text_chunks(await read_document_text(source, plan)) or ['']
+    run = await run_chunks(chunks, extract_chunk, concurrency=model_registry.instances)
+    if run.failed == len(chunks):
+        raise HTTPException(status_code=502, detail=f'Llama extraction error: {run.errors[0]}')
+    return dict(run.merged().model_dump(), metadata=plan), run.failed == 0
+
+
+@app.on_event('startup')
+async def start_model_registry():
+    model_registry.start()
+    model_path = os.getenv('PY_LLAMA_MODEL_PATH')
+    # with the warm-up enabled the model is loaded there, without holding up startup
+    if model_path and os.getenv('PY_LLAMA_PRELOAD') == '1' and not warmup_enabled():
         try:
-            tables = extract_tables_from_pdf_bytes(raw_bytes)
+            await model_registry.preload(model_path)
         except Exception:
-            tables = []
+            pass  # recorded as `preloadError` in /stats; requests load the model lazily
 
-        # If no tables from PDF, try OCR as image
-        if not tables:
-            try:
-                text = extract_text_from_image_bytes(raw_bytes)
-                # Very basic: split into lines and make one table-like structure
-                lines = [l.strip() for l in text.splitlines() if l.strip()]
-                if lines:
-                    # Make a single-column table
-                    rows = [[ln] for ln in lines]
-                    tables = [{ 'headers': ['text'], 'rows': rows, 'description': 'OCR text lines' }]
-            except Exception:
-                tables = []
-
-        # Build BOQs heuristically from tables
+
+@app.on_event('shutdown')
+async def stop_model_registry():
+    await model_registry.stop()
+
+
+def warm_worker(names: list) -> dict:
+    """Runs in a worker process: import the backends, load the rate index and extract the tiny PDF."""
+    backends = load(names)
+    extract_tables_from_pdf_pages(tiny_pdf())
+    rate_index()
+    if backends.get('ocr', {}).get('ok'):
         try:
-            boqs = build_mock_boq_from_tables(tables)
-        except Exception:
-            boqs = []
+            backends['ocr']['tesseract'] = str(module('pytesseract').get_tesseract_version())
+        except Exception as e:
+            backends['ocr']['tesseract'] = None
+            backends['ocr']['error'] = f'{type(e).__name__}: {e}'
+    return {'pid': os.getpid(), 'backends': backends, 'importMs': dict(import_ms)}
 
-        extracted = ExtractedData(tables=tables or None, lists=None, prices=None, boqs=boqs or None)
-        return JSONResponse(content=extracted.model_dump())
-    except HTTPException:
+
+async def warm_up():
+    """Pre-load backends in this process and every worker, then run one tiny extraction end to end."""
+    names = configured_backends()
+    warm_state.start()
+    error = None
+    try:
+        warm_state.backends = await asyncio.to_thread(load, names)
+        # one call per worker, submitted together so the pool starts all of its processes
+        reports = await asyncio.gather(*(pool.run(warm_worker, names) for _ in range(max(1, pool.workers))),
+                                       return_exceptions=True)
+        warm_state.workers = [r if isinstance(r, dict) else {'error': f'{type(r).__name__}: {r}'} for r in reports]
+        started = time.perf_counter()
+        result = await run_local_extraction(tiny_pdf())
+        warm_state.extraction = {
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            'items': sum(len(b['items']) for b in result.get('boqs') or []),
+        }
+        model_path = os.getenv('PY_LLAMA_MODEL_PATH')
+        if model_path and os.getenv('PY_LLAMA_PRELOAD') == '1':
+            await model_registry.preload(model_path)
+    except asyncio.CancelledError:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        error = f'{type(e).__name__}: {e}'
+    warm_state.finish(error)
+
+
+warm_up_task: Optional[asyncio.Task] = None
+
+
+@app.on_event('startup')
+async def start_warm_up():
+    global warm_up_task
+    if warmup_enabled():
+        warm_up_task = asyncio.create_task(warm_up())
+    else:
+        warm_state.finish()
+
+
+@app.on_event('shutdown')
+async def stop_warm_up():
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
 
 
 @app.get('/health')
 async def health():
     return {"status": "ok"}
+
+
+@app.get('/ready')
+async def ready():
+    """Readiness: 200 once the warm-up has finished, 503 while it runs."""
+    return Response(content=dumps(warm_state.to_dict()), status_code=200 if warm_state.ready else 503,
+                    media_type='application/json')
+
+
+@app.get('/metrics')
+async def prometheus_metrics():
+    """Prometheus text exposition: stage/request histograms, extraction paths, pool, cache and job gauges."""
+    p, c = pool.stats(), result_cache.stats()
+    jobs = job_queue.counts()
+    samples = [
+        ('estim_pool_in_flight', 'gauge', 'Calls running or queued in the worker pool.', p['inFlight']),
+        ('estim_pool_queue_depth', 'gauge', 'Calls waiting for a free worker.', p['queueDepth']),
+        ('estim_pool_admitted', 'gauge', 'Requests currently admitted.', p['admitted']),
+        ('estim_pool_rejected_total', 'counter', 'Requests rejected with 503.', p['rejected']),
+        ('estim_pool_completed_total', 'counter', 'Worker pool calls completed.', p['completed']),
+        ('estim_pool_failed_total', 'counter', 'Worker pool calls that raised.', p['failed']),
+        ('estim_cache_hits_total', 'counter', 'Result cache hits.', c['hits']),
+        ('estim_cache_misses_total', 'counter', 'Result cache misses.', c['misses']),
+        ('estim_cache_memory_bytes', 'gauge', 'Bytes held by the in-memory result cache.', c['memoryBytes']),
+        ('estim_jobs_queued', 'gauge', 'Background jobs waiting to run.', jobs.get('queued', 0)),
+        ('estim_jobs_running', 'gauge', 'Background jobs running.', jobs.get('running', 0)),
+    ]
+    return Response(content=metrics.render(samples), media_type='text/plain; version=0.0.4')
+
+
+@app.get('/stats')
+async def stats():
+    """Worker pool, result cache, jobs, resident models and upstream (TGI/GenAI) client stats."""
+    return {
+        "pool": pool.stats(),
+        "cache": result_cache.stats(),
+        "jobs": job_runners.stats(),
+        "models": model_registry.stats(),
+        "upstreams": {"tgi": tgi_upstream.stats(), "genai": genai_upstream.stats()},
+    }
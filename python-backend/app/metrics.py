@@ -0,0 +1,335 @@
+"""
+Per-stage timings, Prometheus metrics and an opt-in sampling profiler.
+
+Pipeline code wraps each stage in `with stage('pdf_tables'):`. Inside the
+worker pool the timings are collected per call and shipped back with the
+result (see `workers._timed_call`), so stages that ran in a child process are
+recorded in the parent like any other. Every stage is observed in the
+`estim_stage_seconds{stage, mode}` histogram and added to the current
+request's timings, which can be returned as a `Server-Timing` header.
+
+Environment variables:
+- `PY_SERVER_TIMING=1` — add a `Server-Timing` header with per-stage durations.
+- `PY_PROFILE_THRESHOLD_MS` — when set, sample the stacks of all threads while
+  a request runs and write them (folded format, for flamegraph.pl/speedscope)
+  for requests slower than this. Work in process-pool workers is not sampled;
+  use `PY_EXTRACT_WORKERS=0` to profile the pipeline itself.
+- `PY_PROFILE_DIR` — where profiles go (default: `<tmp>/estim-pro-profiles`).
+- `PY_PROFILE_INTERVAL_MS` — sampling interval (default: 5).
+"""
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+SLUG_RE = re.compile(r'[^A-Za-z0-9]+')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class Metrics:
+    """Minimal counter/histogram registry rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+
+    def describe(self, name: str, kind: str, text: str):
+        self._help[name] = (kind, text)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[name]
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    def render(self, samples: Iterable[Tuple[str, str, str, float]] = ()) -> str:
+        """Text exposition; `samples` are (name, type, help, value) read at scrape time."""
+        lines: List[str] = []
+
+        def header(name: str, kind: str):
+            lines.append(f'# HELP {name} {self._help.get(name, (kind, name))[1]}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                header(name, 'counter')
+                for labels, value in sorted(series.items()):
+                    lines.append(f'{name}{_format_labels(labels)} {value:g}')
+            for name, series in sorted(self._histograms.items()):
+                header(name, 'histogram')
+                for labels, hist in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{_format_labels(labels, ("le", f"{bound:g}"))} {cumulative}')
+                    lines.append(f'{name}_bucket{_format_labels(labels, ("le", "+Inf"))} {hist.count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {hist.sum:.6f}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {hist.count}')
+        for name, kind, text, value in samples:
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('estim_stage_seconds', 'histogram', 'Time spent per pipeline stage.')
+metrics.describe('estim_extractions_total', 'counter', 'Extractions by mode and the path that produced the result.')
+metrics.describe('estim_request_seconds', 'histogram', 'HTTP request latency by handler.')
+metrics.describe('estim_profiles_total', 'counter', 'Slow-request profiles written.')
+
+
+class RequestTimings:
+    def __init__(self, mode: str = '-'):
+        self.mode = mode
+        self.stages: List[Tuple[str, float]] = []
+        self.produced = set()  # fallback paths that contributed tables, see `produced()`
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """`Server-Timing` value: one entry per stage name with the summed duration."""
+        summed: Dict[str, float] = {}
+        for name, seconds in self.stages:
+            summed[name] = summed.get(name, 0.0) + seconds
+        parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in summed.items()]
+        if total is not None:
+            parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar('estim_request_timings', default=None)
+# stages recorded inside a worker call are buffered here and returned with the result
+_collector = threading.local()
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _timings.get()
+
+
+@contextmanager
+def request_timings(mode: str = '-'):
+    """Start a timing scope (per HTTP request, or per background job)."""
+    timings = RequestTimings(mode)
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def set_mode(mode: str):
+    timings = _timings.get()
+    if timings is not None:
+        timings.mode = mode
+
+
+def record_stage(name: str, seconds: float):
+    buffer = getattr(_collector, 'stages', None)
+    if buffer is not None:
+        buffer.append((name, seconds))
+        return
+    timings = _timings.get()
+    if name.startswith(_PRODUCED):
+        if timings is not None:
+            timings.produced.add(name[len(_PRODUCED):])
+        return
+    metrics.observe('estim_stage_seconds', seconds, stage=name, mode=timings.mode if timings else '-')
+    if timings is not None:
+        timings.stages.append((name, seconds))
+
+
+def record_stages(stages: Iterable[Tuple[str, float]]):
+    for name, seconds in stages:
+        record_stage(name, seconds)
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_stages():
+    """Buffer the stages recorded by this thread; used around worker pool calls."""
+    previous = getattr(_collector, 'stages', None)
+    _collector.stages = buffer = []
+    try:
+        yield buffer
+    finally:
+        _collector.stages = previous
+
+
+# result paths, most specific last
+FALLBACK_PATHS = ('tables', 'text', 'ocr')
+_PRODUCED = 'produced:'
+
+
+def produced(path: str):
+    """
+    Note that the `path` fallback produced tables for the current request. It
+    travels with the stage timings, so it also works inside worker processes.
+    """
+    record_stage(_PRODUCED + path, 0.0)
+
+
+def count_extraction(mode: str, timings: Optional[RequestTimings] = None, path: Optional[str] = None):
+    """
+    Count one extraction under the deepest fallback that produced part of its
+    result, or under `path` for extractors without fallbacks (the GenAI endpoint).
+    """
+    if path is None:
+        timings = timings or _timings.get()
+        found = timings.produced if timings else set()
+        path = 'tables'
+        for label in FALLBACK_PATHS:
+            if label in found:
+                path = label
+    metrics.inc('estim_extractions_total', mode=mode, path=path)
+
+
+class StackSampler:
+    """Samples every thread's stack on an interval and counts folded stacks."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='estim-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+
+def profile_threshold() -> Optional[float]:
+    value = os.getenv('PY_PROFILE_THRESHOLD_MS')
+    return float(value) / 1000 if value else None
+
+
+def write_profile(sampler: StackSampler, label: str, seconds: float) -> str:
+    directory = os.getenv('PY_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'estim-pro-profiles')
+    os.makedirs(directory, exist_ok=True)
+    slug = SLUG_RE.sub('-', label).strip('-') or 'request'
+    path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{slug}-{int(seconds * 1000)}ms.folded')
+    with open(path, 'w') as fh:
+        fh.write(sampler.folded())
+    metrics.inc('estim_profiles_total')
+    return path
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: opens a timing scope per HTTP request, records the request
+    latency, adds `Server-Timing` when enabled and runs the slow-request profiler.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        server_timing = os.getenv('PY_SERVER_TIMING') == '1'
+        threshold = profile_threshold()
+        sampler = None
+        if threshold is not None:
+            sampler = StackSampler(float(os.getenv('PY_PROFILE_INTERVAL_MS', '5')) / 1000)
+            sampler.start()
+        started = time.perf_counter()
+        status = {'code': 500}
+
+        with request_timings() as timings:
+            async def send_wrapper(message):
+                if message['type'] == 'http.response.start':
+                    status['code'] = message['status']
+                    if server_timing:
+                        headers = list(message.get('headers', []))
+                        value = timings.server_timing(time.perf_counter() - started)
+                        headers.append((b'server-timing', value.encode('latin-1')))
+                        message = dict(message, headers=headers)
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - started
+                # the router stores the matched endpoint in the shared scope
+                handler = getattr(scope.get('endpoint'), '__name__', 'unmatched')
+                metrics.observe('estim_request_seconds', elapsed, handler=handler, method=scope['method'], status=str(status['code']))
+                if sampler is not None:
+                    sampler.stop()
+                    if elapsed >= threshold and sampler.samples:
+                        write_profile(sampler, f'{scope["method"]} {scope["path"]}', elapsed)
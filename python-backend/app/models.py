@@ -0,0 +1,196 @@
+"""
+Resident model registry for the local LLM modes.
+
+Loading a GGUF model takes seconds and gigabytes of RAM, so models are loaded
+once (lazily, or at startup with `PY_LLAMA_PRELOAD=1`) and kept resident.
+Each model path gets a small pool of instances; a request borrows one
+instance exclusively for the duration of its inference call, and models that
+have not been used for a while are unloaded.
+
+Environment variables:
+- `PY_LLAMA_INSTANCES` — instances per model (default 1). Each instance is a
+  full copy of the weights, so only raise this when RAM allows.
+- `PY_MODEL_IDLE_SECONDS` — unload models idle for this long (default 900,
+  `0` keeps them forever).
+- `PY_LLAMA_N_CTX` — optional context size passed to `Llama(...)`.
+"""
+import asyncio
+import gc
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+from .backends import module
+
+
+class ModelLoadError(RuntimeError):
+    pass
+
+
+def load_llama(model_path: str) -> Any:
+    """Default loader: a llama-cpp-python model."""
+    try:
+        Llama = module('llama_cpp').Llama
+    except Exception:
+        raise ModelLoadError('llama-cpp-python is not installed')
+    if not os.path.exists(model_path):
+        raise ModelLoadError(f'Model file not found: {model_path}')
+    kwargs = {}
+    if os.getenv('PY_LLAMA_N_CTX'):
+        kwargs['n_ctx'] = int(os.getenv('PY_LLAMA_N_CTX'))
+    return Llama(model_path=model_path, **kwargs)
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (0 when unknown)."""
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return 0
+
+
+class _ModelSlot:
+    def __init__(self, path: str):
+        self.path = path
+        self.instances: List[Any] = []
+        self.idle: asyncio.Queue = asyncio.Queue()
+        self.load_lock = asyncio.Lock()
+        self.load_seconds: List[float] = []
+        self.rss_bytes = 0
+        self.in_use = 0
+        self.uses = 0
+        self.last_used = time.time()
+
+    @property
+    def busy(self) -> bool:
+        return self.in_use > 0
+
+
+class ModelRegistry:
+    def __init__(self, loader: Callable[[str], Any] = load_llama, instances: Optional[int] = None, idle_timeout: Optional[float] = None):
+        self.loader = loader
+        self.instances = max(1, instances if instances is not None else int(os.getenv('PY_LLAMA_INSTANCES', '1')))
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.getenv('PY_MODEL_IDLE_SECONDS', '900'))
+        self._slots: Dict[str, _ModelSlot] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self.unloads = 0
+        self.preload_error: Optional[str] = None
+
+    def _slot(self, path: str) -> _ModelSlot:
+        slot = self._slots.get(path)
+        if slot is None:
+            slot = self._slots[path] = _ModelSlot(path)
+        return slot
+
+    async def _load_instance(self, slot: _ModelSlot):
+        before = current_rss()
+        started = time.perf_counter()
+        instance = await asyncio.to_thread(self.loader, slot.path)
+        slot.load_seconds.append(time.perf_counter() - started)
+        slot.rss_bytes += max(0, current_rss() - before)
+        slot.instances.append(instance)
+        return instance
+
+    async def preload(self, path: str):
+        """Load the first instance of `path` now instead of on the first request."""
+        slot = self._slot(path)
+        async with slot.load_lock:
+            if not slot.instances:
+                try:
+                    slot.idle.put_nowait(await self._load_instance(slot))
+                except Exception as e:
+                    self.preload_error = f'{type(e).__name__}: {e}'  # shown in /stats
+                    raise
+        self.preload_error = None
+
+    @asynccontextmanager
+    async def acquire(self, path: str):
+        """Borrow one resident instance of the model at `path` exclusively."""
+        slot = self._slot(path)
+        if slot.idle.empty() and len(slot.instances) < self.instances:
+            async with slot.load_lock:
+                if slot.idle.empty() and len(slot.instances) < self.instances:
+                    slot.idle.put_nowait(await self._load_instance(slot))
+        instance = await slot.idle.get()
+        slot.in_use += 1
+        try:
+            yield instance
+        finally:
+            slot.in_use -= 1
+            slot.uses += 1
+            slot.last_used = time.time()
+            if self._slots.get(path) is slot:
+                slot.idle.put_nowait(instance)
+
+    def unload(self, path: str) -> bool:
+        slot = self._slots.get(path)
+        if slot is None or slot.busy:
+            return False
+        del self._slots[path]
+        for instance in slot.instances:
+            close = getattr(instance, 'close', None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+        slot.instances.clear()
+        self.unloads += 1
+        gc.collect()
+        return True
+
+    def unload_idle(self) -> List[str]:
+        if self.idle_timeout <= 0:
+            return []
+        cutoff = time.time() - self.idle_timeout
+        idle = [p for p, s in self._slots.items() if not s.busy and s.last_used < cutoff]
+        return [p for p in idle if self.unload(p)]
+
+    def start(self):
+        if self._reaper is None and self.idle_timeout > 0:
+            self._reaper = asyncio.create_task(self._reap())
+
+    async def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+
+    async def _reap(self):
+        interval = max(1.0, min(60.0, self.idle_timeout / 2))
+        while True:
+            await asyncio.sleep(interval)
+            self.unload_idle()
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            'instancesPerModel': self.instances,
+            'idleTimeoutSeconds': self.idle_timeout,
+            'unloads': self.unloads,
+            'preloadError': self.preload_error,
+            'loaded': [
+                {
+                    'path': s.path,
+                    'instances': len(s.instances),
+                    'inUse': s.in_use,
+                    'uses': s.uses,
+                    'loadSeconds': [round(t, 3) for t in s.load_seconds],
+                    'rssBytes': s.rss_bytes,
+                    'idleSeconds': round(now - s.last_used, 1),
+                }
+                for s in self._slots.values()
+            ],
+        }
+
+
+model_registry = ModelRegistry()
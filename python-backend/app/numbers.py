@@ -0,0 +1,190 @@
+"""
+Numeric cell parsing for BOQ quantities, rates and amounts.
+
+Cells are matched against one compiled pattern that allows, in order: an
+opening parenthesis or sign, a currency code or symbol, the number, a trailing
+currency, a percent sign, a unit ("12.5 m2", "4 nos") and a closing
+parenthesis. The number may use '.' or ',' as the decimal separator. When a
+cell can be read either way ("1,250" or "1.250"), the document's separator
+decides; `detect_decimal` infers it from cells that are unambiguous.
+
+Environment variables:
+- `PY_NUMBER_DECIMAL` — decimal separator when a document gives no evidence (`.` or `,`; default `.`).
+- `PY_NUMBER_CURRENCIES` — extra currency codes/symbols, comma-separated.
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+CURRENCIES = (
+    'AED', 'OMR', 'SAR', 'QAR', 'KWD', 'BHD', 'USD', 'EUR', 'GBP', 'INR',
+    'Dhs', 'Dh', 'RO', 'R.O.', 'SR', 'QR', 'KD', 'BD',
+    '$', '€', '£', '₹', 'د.إ', 'ر.ع.', 'ر.س', 'ر.ق', 'د.ك', 'د.ب',
+)
+UNITS = (
+    'm', 'm2', 'm²', 'm3', 'm³', 'sqm', 'sq.m', 'sqft', 'sft', 'cum', 'cu.m', 'lm', 'rm', 'mm', 'cm', 'km',
+    'kg', 'kgs', 'ton', 'tons', 'tonne', 't', 'l', 'ltr', 'litre', 'liter',
+    'no', 'nos', 'nr', 'pcs', 'pc', 'each', 'ea', 'set', 'sets', 'item', 'ls', 'lot', 'sum',
+    'day', 'days', 'hr', 'hrs', 'week', 'month',
+)
+MINUS = '-−–'
+# characters used to group thousands besides '.' and ','
+GROUPING = " '\u00a0\u202f\u2009"
+_DROP_GROUPING = str.maketrans('', '', GROUPING)
+# the usual spellings per decimal separator ("1,250.500" / "1.250,500", "12."), read without the full pattern
+_PLAIN_RE = {
+    '.': re.compile(r'\s*(?:[1-9]\d{0,2}(?:,\d{3})+|\d+)(?:\.\d*)?\s*$'),
+    ',': re.compile(r'\s*(?:[1-9]\d{0,2}(?:\.\d{3})+|\d+)(?:,\d*)?\s*$'),
+}
+_TO_FLOAT = {'.': str.maketrans('', '', ','), ',': str.maketrans(',', '.', '.')}
+
+
+@lru_cache(maxsize=None)
+def _number_re() -> 're.Pattern':
+    extra = [c.strip() for c in os.getenv('PY_NUMBER_CURRENCIES', '').split(',') if c.strip()]
+
+    def alternation(words):
+        return '|'.join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+
+    cur = alternation(list(CURRENCIES) + extra)
+    units = alternation(UNITS)
+    return re.compile(
+        rf"""^\s*(?P<lead>(?:{cur})\s*)?(?P<open>\()?\s*(?P<sign>[{MINUS}+])?\s*(?:(?:{cur})\s*)?(?P<sign2>[{MINUS}+])?\s*
+        (?P<num>(?:\d[\d.,{GROUPING}]*\d|\d)[.,]?|[.,]\d+)
+        \s*(?:{cur})?\s*(?P<pct>%)?\s*(?P<unit>(?:{units})\.?(?![\w²³]))?\s*(?P<close>\))?\s*$""",
+        re.IGNORECASE | re.VERBOSE,
+    )
+
+
+def _groups_ok(groups: List[str]) -> bool:
+    """Thousands groups: 3 digits each (or 2 before the last, Indian style)."""
+    if not groups[0] or len(groups[-1]) != 3:
+        return False
+    middle = groups[1:-1]
+    return all(len(g) == 3 for g in middle) or all(len(g) == 2 for g in middle)
+
+
+def _digits(num: str, decimal: str) -> Optional[str]:
+    """The number in `float` syntax, or None when its separators don't add up."""
+    num = num.translate(_DROP_GROUPING)
+    has_point, has_comma = '.' in num, ',' in num
+    if has_point and has_comma:
+        # both present: whichever comes last is the decimal separator
+        decimal = '.' if num.rfind('.') > num.rfind(',') else ','
+    elif has_point or has_comma:
+        sep = '.' if has_point else ','
+        parts = num.split(sep)
+        if len(parts) > 2:
+            decimal = ',' if sep == '.' else '.'
+        elif len(parts[1]) != 3 or not parts[0] or parts[0] == '0':
+            # "12,5", ".75", "0.250": only a decimal separator reads that way
+            decimal = sep
+    else:
+        return num
+    thousands = ',' if decimal == '.' else '.'
+    whole, _, frac = num.rpartition(decimal) if decimal in num else (num, '', '')
+    if decimal in whole:
+        return None
+    if thousands in whole and not _groups_ok(whole.split(thousands)):
+        return None
+    if thousands in frac:
+        return None
+    whole = whole.replace(thousands, '')
+    return f'{whole}.{frac}' if frac or decimal in num else whole
+
+
+def parse_cell(s: str, decimal: Optional[str] = None) -> Tuple[Optional[float], Optional[str]]:
+    """(value, unit) of one cell; the unit is the suffix as written ("m2", "Nos"), or None."""
+    if s is None:
+        return None, None
+    decimal = decimal or default_decimal()
+    s = str(s)
+    if _PLAIN_RE[decimal].match(s):
+        # bare number, the common case
+        return float(s.translate(_TO_FLOAT[decimal])), None
+    m = _number_re().match(s)
+    if m is None:
+        return None, None
+    _, opened, sign, sign2, num, pct, unit, closed = m.groups()
+    if bool(opened) != bool(closed):
+        return None, None
+    digits = _digits(num, decimal)
+    if digits is None:
+        return None, None
+    val = float(digits) / 100.0 if pct else float(digits)
+    negative = bool(opened) != ((sign or sign2 or '+') in MINUS)
+    return (-val if negative else val), unit
+
+
+def parse_number(s: str, decimal: Optional[str] = None) -> Optional[float]:
+    return parse_cell(s, decimal)[0]
+
+
+def default_decimal() -> str:
+    return ',' if os.getenv('PY_NUMBER_DECIMAL', '.') == ',' else '.'
+
+
+_EVIDENCE_RE = re.compile(r'\d[.,]\d')
+
+
+def detect_decimal(values: Iterable[str], limit: int = 2000) -> str:
+    """
+    The decimal separator of a document from up to `limit` numeric-looking
+    cells. Only cells that read one way count ("1.234,56", "12,5", "1,234,567");
+    the default separator wins ties.
+    """
+    votes = {'.': 0, ',': 0}
+    seen = 0
+    for v in values:
+        if not isinstance(v, str) or not _EVIDENCE_RE.search(v):
+            continue
+        seen += 1
+        if seen > limit:
+            break
+        # with one separator type and a 3-digit tail the cell reads both ways
+        m = _number_re().match(v)
+        if m is None:
+            continue
+        num = m.group('num')
+        point, comma = num.rfind('.'), num.rfind(',')
+        if point >= 0 and comma >= 0:
+            votes['.' if point > comma else ','] += 1
+            continue
+        sep = '.' if point >= 0 else ','
+        parts = num.split(sep)
+        if len(parts) > 2:
+            votes[',' if sep == '.' else '.'] += 1
+        elif len(parts[1]) != 3 or parts[0] in ('', '0'):
+            votes[sep] += 1
+    default = default_decimal()
+    other = ',' if default == '.' else '.'
+    return other if votes[other] > votes[default] else default
+
+
+_MISSING = object()
+
+
+def parse_cell_column(values: Iterable[str], decimal: Optional[str] = None) -> Tuple[List[Optional[float]], List[Optional[str]]]:
+    """
+    (values, units) for a whole column. BOQ columns repeat the same strings a
+    lot (units, rates, round quantities), so each distinct cell is parsed once.
+    """
+    decimal = decimal or default_decimal()
+    plain, to_float = _PLAIN_RE[decimal].match, _TO_FLOAT[decimal]
+    seen: Dict[str, Tuple[Optional[float], Optional[str]]] = {}
+    numbers, units = [], []
+    for v in values:
+        parsed = seen.get(v, _MISSING)
+        if parsed is _MISSING:
+            if isinstance(v, str) and plain(v):
+                parsed = seen[v] = (float(v.translate(to_float)), None)
+            else:
+                parsed = seen[v] = parse_cell(v, decimal)
+        numbers.append(parsed[0])
+        units.append(parsed[1])
+    return numbers, units
+
+
+def parse_number_column(values: Iterable[str], decimal: Optional[str] = None) -> List[Optional[float]]:
+    return parse_cell_column(values, decimal)[0]
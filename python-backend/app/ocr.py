@@ -0,0 +1,230 @@
+"""
+OCR for scanned BOQs and drawings.
+
+Images are normalised before tesseract sees them. They are converted to
+grayscale, downscaled to `PY_OCR_TARGET_DPI` (scans often come in at 600 dpi
+or as 10k px drawing sheets) and binarised with an Otsu threshold. Large pages
+are cut into overlapping tiles that are OCRed in parallel (tesseract runs as
+a subprocess, so threads are enough). Word boxes from `image_to_data` are
+mapped back to page coordinates and handed to `app.layout` to rebuild rows and
+columns.
+
+Environment variables:
+- `PY_OCR_TARGET_DPI` — resolution tesseract works at (default 300).
+- `PY_OCR_MAX_SIDE` — longest side in pixels when the image has no dpi info (default 4000).
+- `PY_OCR_BINARIZE` — `0` keeps grayscale instead of thresholding (default 1).
+- `PY_OCR_TILE_PX` — pages larger than this in either direction are tiled (default 2000).
+- `PY_OCR_THREADS` — tiles OCRed concurrently (default: min(4, CPU count)).
+- `PY_OCR_LANG` / `PY_OCR_CONFIG` — passed to tesseract (defaults: `eng`, `--psm 6`).
+"""
+from __future__ import annotations
+
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+from .backends import lazy_module
+from .layout import Word, column_boundaries, group_lines, lines_to_text, words_to_table
+from .metrics import produced, stage
+
+Image = lazy_module('PIL.Image')
+ImageOps = lazy_module('PIL.ImageOps')
+pytesseract = lazy_module('pytesseract')
+
+Box = Tuple[int, int, int, int]
+
+
+def open_image(source: Union[bytes, str]) -> Image.Image:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    im = Image.open(source)
+    im.load()
+    return im
+
+
+def _decode_pdf_image(stream) -> Optional[Image.Image]:
+    """PIL image from a PDF image XObject stream (JPEG/JPEG 2000 as-is, raw samples otherwise)."""
+    filters = [getattr(f, 'name', f) for f, _ in stream.get_filters()]
+    if filters and filters[-1] in ('DCTDecode', 'JPXDecode'):
+        return Image.open(io.BytesIO(stream.get_rawdata() if len(filters) == 1 else stream.get_data()))
+    width, height = stream.get('Width'), stream.get('Height')
+    bits = stream.get('BitsPerComponent', 8)
+    space = stream.get('ColorSpace')
+    space = getattr(space, 'name', space)
+    mode = {'DeviceGray': 'L', 'CalGray': 'L', 'DeviceRGB': 'RGB', 'CalRGB': 'RGB', 'DeviceCMYK': 'CMYK'}.get(space)
+    if stream.get('ImageMask') or bits == 1:
+        mode = '1'
+    if not (width and height and mode) or (bits not in (1, 8)):
+        return None
+    return Image.frombytes(mode, (int(width), int(height)), stream.get_data())
+
+
+def pdf_page_image(page, dpi: Optional[int] = None) -> Optional[Image.Image]:
+    """
+    The scan behind a pdfplumber page: its largest embedded image, or the page
+    rendered through pdfplumber/Wand when the image can't be decoded directly.
+    """
+    images = sorted(page.images, key=lambda i: (i['x1'] - i['x0']) * (i['bottom'] - i['top']), reverse=True)
+    for info in images[:1]:
+        try:
+            im = _decode_pdf_image(info['stream'])
+        except Exception:
+            im = None
+        if im is not None:
+            # record the effective resolution so prepare_image can scale to the target dpi
+            width_in = max(1e-6, (info['x1'] - info['x0']) / 72.0)
+            im.info['dpi'] = (im.width / width_in, im.width / width_in)
+            return im
+    try:
+        return page.to_image(resolution=dpi or int(os.getenv('PY_OCR_TARGET_DPI', '300'))).original
+    except Exception:
+        return None
+
+
+def otsu_threshold(im: Image.Image) -> int:
+    """Threshold that best separates ink from paper, from the grayscale histogram."""
+    hist = im.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = weight_bg = 0
+    best, best_var = 127, -1.0
+    for t in range(256):
+        weight_bg += hist[t]
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += t * hist[t]
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        var = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if var > best_var:
+            best, best_var = t, var
+    return best
+
+
+def prepare_image(im: Image.Image, target_dpi: Optional[int] = None, max_side: Optional[int] = None,
+                  binarize: Optional[bool] = None) -> Tuple[Image.Image, float]:
+    """
+    Grayscale, scale to the target dpi (or cap the longest side) and binarise.
+    Returns the prepared image and the scale applied, to map boxes back.
+    """
+    target_dpi = target_dpi or int(os.getenv('PY_OCR_TARGET_DPI', '300'))
+    max_side = max_side or int(os.getenv('PY_OCR_MAX_SIDE', '4000'))
+    if binarize is None:
+        binarize = os.getenv('PY_OCR_BINARIZE', '1') != '0'
+    if getattr(im, 'n_frames', 1) > 1:
+        im.seek(0)
+    if im.mode in ('RGBA', 'LA', 'P'):
+        # transparent areas become paper, not ink
+        im = im.convert('RGBA')
+        background = Image.new('RGBA', im.size, (255, 255, 255, 255))
+        im = Image.alpha_composite(background, im)
+    im = im.convert('L')
+    dpi = im.info.get('dpi', (0, 0))[0] if isinstance(im.info.get('dpi'), tuple) else 0
+    scale = 1.0
+    if dpi and dpi > target_dpi:
+        scale = target_dpi / float(dpi)
+    elif max(im.size) > max_side:
+        scale = max_side / float(max(im.size))
+    if scale < 1.0:
+        im = im.resize((max(1, int(im.width * scale)), max(1, int(im.height * scale))), Image.LANCZOS)
+    im = ImageOps.autocontrast(im)
+    if binarize:
+        t = otsu_threshold(im)
+        im = im.point(lambda p: 255 if p > t else 0)
+    return im, scale
+
+
+def tile_boxes(width: int, height: int, tile: Optional[int] = None, overlap: int = 64) -> List[Tuple[Box, Box]]:
+    """
+    (tile, core) boxes covering the page. Tiles overlap so words on a seam are
+    seen whole by one of them; a word belongs to the tile whose core holds its centre.
+    """
+    tile = tile or int(os.getenv('PY_OCR_TILE_PX', '2000'))
+    if width <= tile and height <= tile:
+        return [((0, 0, width, height), (0, 0, width, height))]
+
+    def spans(size: int) -> List[Tuple[int, int, int, int]]:
+        count = max(1, -(-size // tile))
+        step = -(-size // count)
+        out = []
+        for i in range(count):
+            core_a, core_b = i * step, min(size, (i + 1) * step)
+            out.append((max(0, core_a - overlap), min(size, core_b + overlap), core_a, core_b))
+        return out
+
+    boxes = []
+    for y0, y1, cy0, cy1 in spans(height):
+        for x0, x1, cx0, cx1 in spans(width):
+            boxes.append(((x0, y0, x1, y1), (cx0, cy0, cx1, cy1)))
+    return boxes
+
+
+def _ocr_tile(im: Image.Image, box: Box, core: Box, lang: str, config: str) -> List[Word]:
+    data = pytesseract.image_to_data(im.crop(box), lang=lang, config=config, output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data['text']):
+        text = (text or '').strip()
+        try:
+            conf = float(data['conf'][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        if not text or conf < 0:
+            continue
+        x0 = box[0] + data['left'][i]
+        top = box[1] + data['top'][i]
+        x1, bottom = x0 + data['width'][i], top + data['height'][i]
+        cx, cy = (x0 + x1) / 2, (top + bottom) / 2
+        if not (core[0] <= cx < core[2] and core[1] <= cy < core[3]):
+            continue
+        words.append({'text': text, 'x0': x0, 'x1': x1, 'top': top, 'bottom': bottom, 'conf': conf})
+    return words
+
+
+def ocr_words(im: Image.Image, threads: Optional[int] = None) -> List[Word]:
+    """Word boxes of a prepared image, tiles OCRed concurrently."""
+    lang = os.getenv('PY_OCR_LANG', 'eng')
+    config = os.getenv('PY_OCR_CONFIG', '--psm 6')
+    boxes = tile_boxes(im.width, im.height)
+    if len(boxes) == 1:
+        return _ocr_tile(im, boxes[0][0], boxes[0][1], lang, config)
+    threads = threads or int(os.getenv('PY_OCR_THREADS', str(min(4, os.cpu_count() or 1))))
+    with ThreadPoolExecutor(max_workers=max(1, threads)) as ex:
+        parts = list(ex.map(lambda b: _ocr_tile(im, b[0], b[1], lang, config), boxes))
+    return [w for part in parts for w in part]
+
+
+def image_words(im: Image.Image) -> List[Word]:
+    """Preprocess and OCR one page image; boxes are in the prepared image's pixels."""
+    with stage('ocr_prepare'):
+        prepared, _ = prepare_image(im)
+    with stage('ocr'):
+        return ocr_words(prepared)
+
+
+def ocr_tables(im: Image.Image, description: str = 'OCR text lines') -> List[dict]:
+    """
+    Tables from one page image: rows and columns rebuilt from the word boxes,
+    or a single `text` column of lines when the words don't line up in columns.
+    """
+    words = image_words(im)
+    with stage('ocr_layout'):
+        table = words_to_table(words, description)
+        lines = [] if table is not None else [' '.join(w['text'] for w in line) for line in group_lines(words)]
+    if table is None and not lines:
+        return []
+    produced('ocr')
+    if table is not None:
+        return [table]
+    return [{'headers': ['text'], 'rows': [[ln] for ln in lines], 'description': description}]
+
+
+def ocr_text(im: Image.Image) -> str:
+    """Page text for prompts; column gaps are kept as double spaces."""
+    words = image_words(im)
+    with stage('ocr_layout'):
+        lines = group_lines(words)
+        return lines_to_text(lines, column_boundaries(lines))
@@ -0,0 +1,114 @@
+"""
+Page-range splitting and per-page result merging for parallel PDF extraction.
+
+A document is cut into contiguous page ranges, each range is extracted by a
+separate worker, and the per-page tables are merged back in document order.
+Tables that continue across a page break (the next page repeats the same
+header row, or has no header row at all) are stitched into a single table,
+without the repeated headers and carried/brought-forward lines.
+"""
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .boq import header_role, normalize_header
+from .numbers import parse_number
+
+PageTables = Tuple[int, list]  # (0-based page index, tables found on that page)
+
+
+def split_page_ranges(page_count: int, workers: int, min_pages: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Split `page_count` pages into contiguous [start, end) ranges.
+
+    Aims for about two ranges per worker so a slow page does not leave the
+    other workers idle, but never goes below `min_pages` per range because
+    every range re-opens the PDF.
+    """
+    if page_count <= 0:
+        return []
+    if min_pages is None:
+        min_pages = int(os.getenv('PY_PDF_PAGES_PER_TASK', '8'))
+    min_pages = max(1, min_pages)
+    target = max(1, workers) * 2
+    size = max(min_pages, math.ceil(page_count / target))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+# "Carried forward", "B/F", "c/fwd", "Carried to collection" ...
+FORWARD_RE = re.compile(
+    r'\b(?:carried|brought|carry|bring)\s*(?:forward|fwd|fw|over|down)\b'
+    r'|(?<![\w/])[cb]\s*/\s*(?:f|fwd|fw|o)(?![\w/])'
+    r'|\bcarried\s+to\s+(?:collection|summary)\b',
+    re.IGNORECASE,
+)
+
+
+def header_fingerprint(headers: list) -> Optional[tuple]:
+    """Header row normalised for comparison ('Qty.' == 'QTY'), or None for an empty row."""
+    key = tuple(normalize_header(h) for h in headers)
+    return key if any(key) else None
+
+
+def is_forward_row(row: list) -> bool:
+    """A carried/brought-forward subtotal line rather than an item."""
+    return any(isinstance(c, str) and len(c) < 60 and FORWARD_RE.search(c) for c in row)
+
+
+def looks_like_data(row: list) -> bool:
+    """A "header" row that is really the first item of a headerless continuation page."""
+    cells = [str(c) for c in row if c not in (None, '')]
+    return bool(cells) and not any(header_role(c) for c in cells) and any(parse_number(c) is not None for c in cells)
+
+
+def _clean_rows(rows: list, fingerprint: Optional[tuple]) -> list:
+    """Rows without repeated header rows and carried/brought-forward lines."""
+    return [
+        r for r in rows
+        if not (fingerprint is not None and len(r) == len(fingerprint) and header_fingerprint(r) == fingerprint)
+        and not is_forward_row(r)
+    ]
+
+
+def merge_page_tables(pages: Iterable[PageTables]) -> list:
+    """
+    Flatten per-page tables in page order, stitching continuation tables.
+
+    The first table on a page is appended to the last table of the previous
+    page when both have the same header row (compared by fingerprint), or when
+    its header row is really data with the same number of columns. Repeated
+    header rows and carried/brought-forward lines are dropped, and a table
+    identical to one kept from the same or the previous page (a page range
+    extracted twice) is kept once; identical tables further apart, such as a
+    standard schedule repeated in several bills, are all kept.
+    Header fingerprints and row hashes are looked up in dicts, so the work is
+    linear in the number of rows.
+    """
+    merged: list = []
+    fingerprints: List[Optional[tuple]] = []
+    seen: Dict[int, int] = {}  # table digest -> page it was last kept from
+    last_page = None
+    for page_no, tables in sorted(pages, key=lambda p: p[0]):
+        tables = tables or []  # None: the page failed
+        for idx, table in enumerate(tables):
+            headers = table.get('headers') or []
+            rows = list(table.get('rows') or [])
+            fingerprint = header_fingerprint(headers)
+            prev = merged[-1] if merged else None
+            first_after_prev = idx == 0 and prev is not None and last_page == page_no - 1
+            if first_after_prev and fingerprint is not None and fingerprint == fingerprints[-1]:
+                prev['rows'].extend(_clean_rows(rows, fingerprint))
+                continue
+            if first_after_prev and len(headers) == len(prev.get('headers') or []) and looks_like_data(headers):
+                prev['rows'].extend(_clean_rows([list(headers)] + rows, fingerprints[-1]))
+                continue
+            digest = hash((fingerprint, tuple(tuple(map(str, r)) for r in rows)))
+            if page_no - seen.get(digest, page_no - 2) <= 1:
+                continue
+            seen[digest] = page_no
+            merged.append(dict(table, rows=_clean_rows(rows, fingerprint)))
+            fingerprints.append(fingerprint)
+        if tables:
+            last_page = page_no
+    return merged
@@ -0,0 +1,322 @@
+"""
+Rate library lookup: suggested rates for BOQ items the document leaves unpriced.
+
+The library is a CSV (headers resolved like BOQ headers: description, unit,
+rate, optional item code) or a SQLite file with a `rates(code, description,
+unit, rate)` table. Descriptions are tokenised (lower case, plural 's' and
+stop words dropped, "200 mm", "200mm" and "1:4:8" kept whole), and the tokens and
+adjacent token pairs go into a TF-IDF inverted index. A lookup reads the
+postings of the item's rarest features first, up to `PY_RATE_LOOKUP_BUDGET`
+postings in all, so its cost is bounded however large the library is. The
+best candidates are then scored exactly: cosine similarity, lowered for a
+unit that does not match the item's.
+
+The index is stored as JSON next to the library (or at `PY_RATE_INDEX`),
+with the arrays as base64 of their raw bytes, and rebuilt only when the
+library file changes. Nothing in it is executed on load, unlike a pickle.
+
+`fill_rates` prices every item whose rate is 0 in one pass over the
+document's BOQs: `rate` becomes the best suggestion's rate, `amount` is
+filled from the quantity when it was empty and `suggestions` lists the
+top-k library entries with their similarity `score`. The item's extraction
+`confidence` is left as it is. Identical (description, unit) pairs are
+looked up once.
+
+Environment variables:
+- `PY_RATE_LIBRARY` — path of the CSV/SQLite library; no rates are suggested without it.
+- `PY_RATE_INDEX` — where the index is stored (default: `<library>.idx`).
+- `PY_RATE_TOP_K` — suggestions per item (default 3).
+- `PY_RATE_MIN_SCORE` — lowest similarity used to fill a rate (default 0.35).
+- `PY_RATE_LOOKUP_BUDGET` — postings read per lookup (default 1200).
+"""
+import csv
+import heapq
+import base64
+import json
+import math
+import os
+import re
+import sqlite3
+import statistics
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from .boq import DESCRIPTION, ITEM_CODE, RATE, UNIT, resolve_columns
+from .numbers import parse_number
+from .schemas import RateSuggestion
+
+# bump when the index layout or tokenizer changes
+INDEX_VERSION = 2
+SQLITE_MAGIC = b'SQLite format 3\x00'
+# similarity multiplier when both units are known and differ
+UNIT_MISMATCH = 0.8
+# candidates whose similarity is computed exactly
+RESCORE = 16
+
+TOKEN_RE = re.compile(r'[a-z0-9]+(?:[.:/x][a-z0-9]+)*')
+# "200 mm" -> "200mm", so sizes match however they are spaced
+NUMBER_UNIT_RE = re.compile(r'(\d)\s+(mm|cm|m|m2|m3|kg|kn|kw|kva|mpa|dia)\b')
+STOP_WORDS = frozenset(
+    'a an and as at by for from in including incl into of on or per the to with all complete '
+    'supply supplying providing provide install installing installation'.split()
+)
+# spellings of the same unit
+UNIT_ALIASES = {
+    'm²': 'm2', 'sqm': 'm2', 'sq.m': 'm2', 'sq m': 'm2', 'm³': 'm3', 'cum': 'm3', 'cu.m': 'm3', 'cu m': 'm3',
+    'm': 'lm', 'rm': 'lm', 'no': 'nr', 'nos': 'nr', 'no.': 'nr', 'pcs': 'nr', 'pc': 'nr', 'each': 'nr', 'ea': 'nr',
+    'kgs': 'kg', 'ton': 't', 'tons': 't', 'tonne': 't', 'ltr': 'l', 'litre': 'l', 'liter': 'l',
+    'sets': 'set', 'ls': 'sum', 'l.s': 'sum', 'l.s.': 'sum', 'lump sum': 'sum', 'lot': 'sum',
+    'hrs': 'hr', 'days': 'day',
+}
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(NUMBER_UNIT_RE.sub(r'\1\2', str(text or '').lower())):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss') and token.isalpha():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    u = ' '.join(str(unit or '').lower().split()).rstrip('.') if unit not in (None, '-') else ''
+    return UNIT_ALIASES.get(u, u)
+
+
+def features(tokens: List[str]) -> List[str]:
+    """Tokens plus adjacent pairs; the pairs tell "concrete block" from "block ... concrete"."""
+    return tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+
+
+def _weights(feats: List[str], idf: Dict[str, float]) -> Dict[str, float]:
+    """Unit-length (1 + log tf) * idf vector; unknown features are dropped."""
+    weights = {f: (1.0 + math.log(n)) * idf[f] for f, n in Counter(feats).items() if f in idf}
+    norm = math.sqrt(sum(w * w for w in weights.values()))
+    return {f: w / norm for f, w in weights.items()} if norm else {}
+
+
+def _b64(values: array) -> str:
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+
+def _array(typecode: str, text: str) -> array:
+    values = array(typecode)
+    values.frombytes(base64.b64decode(text))
+    return values
+
+
+class RateIndex:
+    """
+    Entries with the same description and unit form one document, priced at
+    the median of their rates. Postings are (document ids, weights) arrays in
+    document order.
+    """
+
+    def __init__(self, codes: List[Optional[str]], descriptions: List[str], units: List[str], rates: List[float]):
+        self.codes = codes
+        self.descriptions = descriptions
+        self.units = units
+        groups: Dict[Tuple[tuple, str], List[int]] = {}
+        for entry, (description, unit) in enumerate(zip(descriptions, units)):
+            groups.setdefault((tuple(tokenize(description)), normalize_unit(unit)), []).append(entry)
+        self.doc_entry = array('I')
+        self.doc_rate = array('d')
+        self.doc_unit: List[str] = []
+        docs = []
+        for (tokens, unit_key), entries in groups.items():
+            self.doc_entry.append(entries[0])
+            self.doc_rate.append(statistics.median(rates[e] for e in entries))
+            self.doc_unit.append(unit_key)
+            docs.append(features(list(tokens)))
+        df = Counter(f for feats in docs for f in set(feats))
+        n = len(docs)
+        self.idf = {f: math.log((1 + n) / (1 + c)) + 1.0 for f, c in df.items()}
+        self.postings: Dict[str, Tuple[array, array]] = {f: (array('I'), array('f')) for f in df}
+        for doc, feats in enumerate(docs):
+            for f, w in _weights(feats, self.idf).items():
+                ids, weights = self.postings[f]
+                ids.append(doc)
+                weights.append(w)
+
+    def __len__(self) -> int:
+        return len(self.descriptions)
+
+    def to_json(self) -> dict:
+        return {
+            'codes': self.codes, 'descriptions': self.descriptions, 'units': self.units,
+            'docEntry': _b64(self.doc_entry), 'docRate': _b64(self.doc_rate), 'docUnit': self.doc_unit,
+            'idf': self.idf, 'postings': {f: [_b64(ids), _b64(weights)] for f, (ids, weights) in self.postings.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> 'RateIndex':
+        index = cls.__new__(cls)
+        index.codes, index.descriptions, index.units = data['codes'], data['descriptions'], data['units']
+        index.doc_entry, index.doc_rate = _array('I', data['docEntry']), _array('d', data['docRate'])
+        index.doc_unit, index.idf = data['docUnit'], data['idf']
+        index.postings = {f: (_array('I', ids), _array('f', weights)) for f, (ids, weights) in data['postings'].items()}
+        return index
+
+    def search(self, description: str, unit: Optional[str] = None, k: int = 3) -> List[Tuple[int, float]]:
+        """Top-k (document, similarity) for an item, best first."""
+        query = _weights(features(tokenize(description)), self.idf)
+        if not query:
+            return []
+        budget = int(os.getenv('PY_RATE_LOOKUP_BUDGET', '1200'))
+        # rarest features first: they carry most of the weight and have the shortest postings
+        order = sorted(query, key=lambda f: len(self.postings[f][0]))
+        ids, weights = self.postings[order[0]]
+        if len(ids) > budget:
+            ids, weights = ids[:budget], weights[:budget]
+        scores: Dict[int, float] = dict(zip(ids, map(query[order[0]].__mul__, weights)))
+        get = scores.get
+        visited = len(ids)
+        for n, f in enumerate(order[1:], 1):
+            ids, weights = self.postings[f]
+            if visited + len(ids) > budget:
+                break
+            qw = query[f]
+            for doc, w in zip(ids, weights):
+                scores[doc] = get(doc, 0.0) + qw * w
+            visited += len(ids)
+        else:
+            n = len(order)
+        # exact cosine for the best candidates: look the skipped features up by bisection
+        candidates = heapq.nlargest(max(RESCORE, k), zip(scores.values(), scores.keys()))
+        unit_key = normalize_unit(unit)
+        rescored = []
+        for score, doc in candidates:
+            for f in order[n:]:
+                ids, weights = self.postings[f]
+                i = bisect_left(ids, doc)
+                if i < len(ids) and ids[i] == doc:
+                    score += query[f] * weights[i]
+            if unit_key and self.doc_unit[doc] and self.doc_unit[doc] != unit_key:
+                score *= UNIT_MISMATCH
+            rescored.append((doc, min(1.0, score)))
+        rescored.sort(key=lambda kv: kv[1], reverse=True)
+        return rescored[:k]
+
+    def rate(self, doc: int) -> float:
+        return self.doc_rate[doc]
+
+    def suggestion(self, doc: int, score: float) -> RateSuggestion:
+        entry = self.doc_entry[doc]
+        return RateSuggestion.model_construct(code=self.codes[entry], description=self.descriptions[entry],
+                                              unit=self.units[entry] or None, rate=self.doc_rate[doc], score=round(score, 4))
+
+
+def _read_csv(path: str) -> Tuple[list, list, list, list]:
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        reader = csv.reader(fh)
+        headers = next(reader, [])
+        roles = resolve_columns(headers)
+        if DESCRIPTION not in roles or RATE not in roles:
+            raise ValueError(f'{path}: the rate library needs description and rate columns')
+        rows = list(reader)
+
+    def column(role):
+        idx = roles.get(role)
+        return [r[idx].strip() if idx is not None and idx < len(r) else '' for r in rows]
+
+    return column(ITEM_CODE), column(DESCRIPTION), column(UNIT), column(RATE)
+
+
+def _read_sqlite(path: str) -> Tuple[list, list, list, list]:
+    with sqlite3.connect(f'file:{path}?mode=ro', uri=True) as db:
+        rows = db.execute('SELECT code, description, unit, rate FROM rates').fetchall()
+    return ([r[0] for r in rows], [r[1] or '' for r in rows], [r[2] or '' for r in rows], [r[3] for r in rows])
+
+
+def read_library(path: str) -> Tuple[list, list, list, list]:
+    """(codes, descriptions, units, rates) of the library entries with a usable rate."""
+    with open(path, 'rb') as fh:
+        sqlite = fh.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    codes, descriptions, units, raw_rates = (_read_sqlite if sqlite else _read_csv)(path)
+    kept = ([], [], [], [])
+    for code, description, unit, rate in zip(codes, descriptions, units, raw_rates):
+        rate = rate if isinstance(rate, (int, float)) else parse_number(rate)
+        if rate is None or not description:
+            continue
+        for out, value in zip(kept, (code or None, description, unit, float(rate))):
+            out.append(value)
+    return kept
+
+
+def library_tag() -> str:
+    """Identifies the current library file, '' without one (part of the result cache key)."""
+    path = os.getenv('PY_RATE_LIBRARY')
+    if not path:
+        return ''
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ''
+    return f'{st.st_size}-{st.st_mtime_ns}'
+
+
+@lru_cache(maxsize=1)
+def _load_index(path: str, tag: str) -> RateIndex:
+    index_path = os.getenv('PY_RATE_INDEX') or path + '.idx'
+    # arrays are stored in native byte order
+    signature = [INDEX_VERSION, os.path.abspath(path), tag, sys.byteorder]
+    try:
+        with open(index_path, encoding='utf-8') as fh:
+            stored = json.load(fh)
+        if stored['signature'] == signature:
+            return RateIndex.from_json(stored['index'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    index = RateIndex(*read_library(path))
+    tmp = f'{index_path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump({'signature': signature, 'index': index.to_json()}, fh, separators=(',', ':'))
+        os.replace(tmp, index_path)
+    except OSError:
+        # a read-only library directory only costs a rebuild per process
+        pass
+    return index
+
+
+def rate_index() -> Optional[RateIndex]:
+    """The index of `PY_RATE_LIBRARY` (loaded once per process), or None without a library."""
+    tag = library_tag()
+    if not tag:
+        return None
+    return _load_index(os.getenv('PY_RATE_LIBRARY'), tag)
+
+
+def fill_rates(boqs: list, index: Optional[RateIndex] = None) -> int:
+    """Price the unpriced items of `BOQ` models in place; returns how many got a rate."""
+    index = index if index is not None else rate_index()
+    if index is None or not len(index):
+        return 0
+    k = max(1, int(os.getenv('PY_RATE_TOP_K', '3')))
+    min_score = float(os.getenv('PY_RATE_MIN_SCORE', '0.35'))
+    seen: Dict[Tuple[str, str], list] = {}
+    filled = 0
+    for boq in boqs:
+        for item in boq.items:
+            if item.rate or item.description == '-':
+                continue
+            key = (item.description, item.unit)
+            if key not in seen:
+                seen[key] = index.search(item.description, item.unit, k)
+            hits = seen[key]
+            if not hits or hits[0][1] < min_score:
+                continue
+            doc = hits[0][0]
+            item.rate = index.rate(doc)
+            if not item.amount and item.quantity:
+                item.amount = round(item.quantity * item.rate, 3)
+            item.suggestions = [index.suggestion(d, s) for d, s in hits]
+            filled += 1
+    return filled
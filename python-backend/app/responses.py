@@ -0,0 +1,205 @@
+"""
+Encoding of `ExtractedData` responses.
+
+- JSON is encoded with orjson when it is installed (stdlib `json` otherwise).
+- `?format=columnar` returns each BOQ as `columns` + `rows` arrays instead of
+  one object per item, which is about half the size for long bills.
+- The body is compressed with brotli (when the `brotli` package is installed)
+  or gzip, depending on the request's `Accept-Encoding`.
+- Results with more than `PY_JSON_STREAM_ROWS` rows (default 20000) are
+  streamed: tables and BOQ items are encoded a batch of rows at a time and
+  compressed as they go, so no full-size body is built before the first byte.
+
+Environment variables:
+- `PY_JSON_STREAM_ROWS` — row count above which responses are streamed.
+- `PY_COMPRESS_MIN_BYTES` — smaller bodies are sent uncompressed (default 1024).
+- `PY_COMPRESS_LEVEL` — gzip level (default 5; brotli uses level 4).
+"""
+import gzip
+import json
+import os
+import zlib
+from typing import Callable, Iterable, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COLUMNAR = 'columnar'
+ITEM_COLUMNS = ('itemCode', 'description', 'quantity', 'unit', 'rate', 'amount', 'confidence', 'suggestions')
+# encode this many rows per streamed chunk
+BATCH_ROWS = 1000
+# coalesce streamed pieces into chunks of about this size
+CHUNK_BYTES = 64 * 1024
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def loads(body: bytes):
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+def to_columnar(content: dict) -> dict:
+    """BOQ items as `columns` + `rows` arrays; tables are already header + rows."""
+    boqs = content.get('boqs')
+    if not boqs:
+        return content
+    converted = []
+    for boq in boqs:
+        boq = dict(boq)
+        items = boq.pop('items', None) or []
+        boq['columns'] = list(ITEM_COLUMNS)
+        boq['rows'] = [[item.get(c) for c in ITEM_COLUMNS] for item in items]
+        converted.append(boq)
+    return dict(content, boqs=converted)
+
+
+def row_count(content: dict) -> int:
+    tables = content.get('tables') or []
+    boqs = content.get('boqs') or []
+    return sum(len(t.get('rows') or []) for t in tables) + sum(len(b.get('items') or b.get('rows') or []) for b in boqs)
+
+
+def _iter_with_rows(obj: dict, key: str) -> Iterator[bytes]:
+    """`obj` as JSON with the list under `key` encoded a batch at a time (and moved last)."""
+    rows = obj.get(key)
+    if not isinstance(rows, list) or len(rows) <= BATCH_ROWS:
+        yield dumps(obj)
+        return
+    head = dumps({k: v for k, v in obj.items() if k != key})
+    yield head[:-1] + (b',' if len(head) > 2 else b'') + dumps(key) + b':['
+    for start in range(0, len(rows), BATCH_ROWS):
+        yield (b',' if start else b'') + dumps(rows[start:start + BATCH_ROWS])[1:-1]
+    yield b']}'
+
+
+def iter_json(content: dict) -> Iterator[bytes]:
+    """The same JSON as `dumps(content)` (key order aside), in pieces."""
+    yield b'{'
+    for n, (key, value) in enumerate(content.items()):
+        yield (b',' if n else b'') + dumps(key) + b':'
+        if key in ('tables', 'boqs') and isinstance(value, list):
+            yield b'['
+            for i, obj in enumerate(value):
+                rows_key = 'items' if key == 'boqs' and 'items' in obj else 'rows'
+                if i:
+                    yield b','
+                yield from _iter_with_rows(obj, rows_key)
+            yield b']'
+        else:
+            yield dumps(value)
+    yield b'}'
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """'br' or 'gzip' from an Accept-Encoding header (q=0 excludes), or None."""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    for name in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if accepted.get(name, accepted.get('*', 0.0)) > 0:
+            return name
+    return None
+
+
+def _level() -> int:
+    return int(os.getenv('PY_COMPRESS_LEVEL', '5'))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=_level())
+
+
+def iter_compressed(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """Coalesce small pieces into ~64 KB chunks and compress them incrementally."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=4)
+        feed, finish = compressor.process, compressor.finish
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(_level(), zlib.DEFLATED, 31)
+        feed, finish = compressor.compress, compressor.flush
+    else:
+        feed, finish = (lambda b: b), (lambda: b'')
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= CHUNK_BYTES:
+            out = feed(b''.join(buffer))
+            buffer, size = [], 0
+            if out:
+                yield out
+    out = feed(b''.join(buffer)) + finish()
+    if out:
+        yield out
+
+
+def _tee(chunks: Iterable[bytes], done: Callable[[bytes], None]) -> Iterator[bytes]:
+    """Pass chunks through and hand the whole body to `done` once they were all sent."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    done(b''.join(parts))
+
+
+def json_response(request: Request, content: Optional[dict] = None, body: Optional[bytes] = None,
+                  headers: Optional[dict] = None, fmt: Optional[str] = None,
+                  on_body: Optional[Callable[[bytes], None]] = None) -> Response:
+    """
+    Result response from `content` or an already encoded `body`, in the
+    requested format and encoding. `on_body` receives the plain JSON body
+    (e.g. to cache it) — after streaming, only if it completed.
+    """
+    headers = dict(headers or {})
+    headers['Vary'] = 'Accept-Encoding'
+    if fmt == COLUMNAR:
+        if content is None:
+            content = loads(body)
+        elif on_body is not None:
+            on_body(dumps(content))
+            on_body = None
+        content, body = to_columnar(content), None
+        headers['X-Format'] = COLUMNAR
+    encoding = choose_encoding(request.headers.get('accept-encoding', ''))
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    if body is None and row_count(content) > int(os.getenv('PY_JSON_STREAM_ROWS', '20000')):
+        chunks = iter_json(content)
+        if on_body is not None:
+            chunks = _tee(chunks, on_body)
+        return StreamingResponse(iter_compressed(chunks, encoding), media_type='application/json', headers=headers)
+
+    if body is None:
+        body = dumps(content)
+    if on_body is not None:
+        on_body(body)
+    if encoding and len(body) >= int(os.getenv('PY_COMPRESS_MIN_BYTES', '1024')):
+        body = compress(body, encoding)
+    else:
+        headers.pop('Content-Encoding', None)
+    return Response(content=body, media_type='application/json', headers=headers)
@@ -0,0 +1,169 @@
+"""
+Page-level reuse for revised tender documents.
+
+Addenda usually re-issue the whole PDF with a few pages changed. Every page
+gets a fingerprint: a hash of its decoded content streams, of the images and
+forms it draws, of its fonts and of its size and rotation — the text and
+drawing operators themselves, so a re-saved file (new /ID, new object
+numbers, new creation date) keeps the fingerprints of its pages.
+
+Per-page tables are stored in `result_cache` under (fingerprint, plan,
+extractor version). When a revision comes in, only pages with a new
+fingerprint are extracted; the others reuse their stored tables, and
+continuation tables and BOQs are rebuilt over the whole document as usual.
+
+`metadata.reusedPages` lists the pages that were not extracted again. The
+page fingerprints stay on the server, stored next to the result (see
+`keep_fingerprints`), so responses do not grow with the page count. With
+`?baseline=<X-Result-Id of the earlier version>`, `metadata.diff` lists the
+pages added, changed and removed since that version (see `page_diff`), and
+`metadata.pageFingerprints` the current ones.
+
+`PY_PAGE_CACHE=0` turns page reuse off.
+"""
+import hashlib
+import io
+import os
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import HTTPException
+
+from .backends import lazy_module
+from .cache import result_cache
+from .responses import dumps, loads
+from .router import _resolve, _stream_data
+
+pdfplumber = lazy_module('pdfplumber')
+
+Source = Union[bytes, str]
+
+
+def page_cache_enabled() -> bool:
+    return os.getenv('PY_PAGE_CACHE', '1') != '0'
+
+
+def _raw_data(obj) -> bytes:
+    # images are hashed as stored; decoding them would cost more than extracting the page
+    raw = getattr(obj, 'rawdata', None)
+    return raw if raw is not None else _stream_data(obj)
+
+
+def page_fingerprint(page) -> str:
+    """Hash of what a pdfplumber page draws, independent of the file it sits in."""
+    page_obj = page.page_obj
+    sha = hashlib.sha256(repr((list(page_obj.mediabox), page_obj.rotate)).encode())
+    for stream in page_obj.contents or []:
+        sha.update(_stream_data(_resolve(stream)))
+    resources = _resolve(page_obj.resources) or {}
+    xobjects = _resolve(resources.get('XObject')) or {}
+    for name in sorted(xobjects, key=str):
+        sha.update(f'/X{name}'.encode())
+        sha.update(_raw_data(_resolve(xobjects[name])))
+    fonts = _resolve(resources.get('Font')) or {}
+    for name in sorted(fonts, key=str):
+        font = _resolve(fonts[name])
+        font = font if isinstance(font, dict) else {}
+        sha.update(f'/F{name}={font.get("BaseFont")}'.encode())
+        # the same glyph codes map to other text under another ToUnicode CMap
+        to_unicode = _resolve(font.get('ToUnicode'))
+        if to_unicode is not None:
+            sha.update(_stream_data(to_unicode))
+    return sha.hexdigest()[:32]
+
+
+def pdf_page_fingerprints(source: Source, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Fingerprints of pages [start, end)."""
+    with pdfplumber.open(io.BytesIO(source) if not isinstance(source, str) else source) as pdf:
+        return [page_fingerprint(page) for page in pdf.pages[start:end]]
+
+
+def page_key(fingerprint: str, plan_name: str) -> str:
+    return result_cache.key(fingerprint, f'page:{plan_name}')
+
+
+def cached_pages(fingerprints: List[str], plan_name: str) -> Dict[int, list]:
+    """page index -> stored tables, for the pages already extracted in some document."""
+    pages = {}
+    for page_no, fingerprint in enumerate(fingerprints):
+        body = result_cache.get(page_key(fingerprint, plan_name))
+        if body is not None:
+            pages[page_no] = loads(body)
+    return pages
+
+
+def store_pages(pages: Iterable[tuple], fingerprints: List[str], plan_name: str):
+    """Store (page index, tables) pairs under their page's fingerprint; failed pages (tables None) are skipped."""
+    for page_no, tables in pages:
+        if tables is not None and page_no < len(fingerprints):
+            result_cache.put(page_key(fingerprints[page_no], plan_name), dumps(tables))
+
+
+def page_runs(pages: List[int]) -> List[Tuple[int, int]]:
+    """Sorted page indexes as contiguous [start, end) runs."""
+    runs: List[Tuple[int, int]] = []
+    for page_no in pages:
+        if runs and runs[-1][1] == page_no:
+            runs[-1] = (runs[-1][0], page_no + 1)
+        else:
+            runs.append((page_no, page_no + 1))
+    return runs
+
+
+def page_diff(previous: List[str], current: List[str]) -> dict:
+    """
+    Page changes between two fingerprint lists, aligned like a text diff so an
+    inserted page does not mark every later page as changed. `changed` and
+    `added` are page indexes in the current document, `removed` in the previous one.
+    """
+    diff = {'pages': len(current), 'previousPages': len(previous), 'unchanged': 0,
+            'changed': [], 'added': [], 'removed': []}
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, previous, current, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            diff['unchanged'] += i2 - i1
+            continue
+        common = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        diff['changed'].extend(range(j1, j1 + common))
+        diff['added'].extend(range(j1 + common, j2))
+        diff['removed'].extend(range(i1 + common, i2))
+    return diff
+
+
+def fingerprints_key(result_id: str) -> str:
+    return result_cache.key(result_id, 'fingerprints')
+
+
+def store_fingerprints(result_id: str, fingerprints: Optional[List[str]]):
+    if fingerprints:
+        result_cache.put(fingerprints_key(result_id), dumps(fingerprints))
+
+
+def keep_fingerprints(result_id: str, content: dict) -> Optional[List[str]]:
+    """Move `metadata.pageFingerprints` out of `content` into the cache, next to the result; returns them."""
+    metadata = content.get('metadata')
+    fingerprints = metadata.pop('pageFingerprints', None) if isinstance(metadata, dict) else None
+    store_fingerprints(result_id, fingerprints)
+    return fingerprints
+
+
+def stored_fingerprints(result_id: str) -> Optional[List[str]]:
+    body = result_cache.get(fingerprints_key(result_id))
+    return loads(body) if body is not None else None
+
+
+def baseline_fingerprints(result_id: str) -> List[str]:
+    """Page fingerprints of a stored result, by its X-Result-Id."""
+    if result_cache.get(result_id) is None:
+        raise HTTPException(status_code=404, detail=f'Baseline result {result_id} not found (it may have expired from the cache)')
+    fingerprints = stored_fingerprints(result_id)
+    if fingerprints is None:
+        raise HTTPException(status_code=400, detail=f'Baseline result {result_id} has no page fingerprints')
+    return fingerprints
+
+
+def with_diff(content: dict, previous: List[str], current: Optional[List[str]]) -> dict:
+    """`content` with its page fingerprints and `metadata.diff` against the baseline's."""
+    metadata = dict(content.get('metadata') or {})
+    metadata['pageFingerprints'] = current
+    metadata['diff'] = page_diff(previous, current or [])
+    return dict(content, metadata=metadata)
@@ -0,0 +1,153 @@
+"""
+Pick an extraction plan per document before doing any heavy parsing.
+
+The type is sniffed from magic bytes (the MIME type sent by the client is
+only a hint). For PDFs, a few sampled pages' content streams are scanned for
+text-showing operators. That check decompresses the streams but skips
+layout analysis, and it tells a PDF with a text layer apart from a scan.
+
+Plans:
+- `vector_tables` — PDF with a text layer: pdfplumber tables, falling back to
+  a text grid on the same parsed page.
+- `raster_ocr` — scanned PDF: page images are OCRed and rebuilt into tables.
+- `image_ocr` — PNG/JPEG/TIFF/... input.
+- `text_grid` — plain text / CSV input.
+- `llm` — `mode=tgi|llama`; the document text comes from one of the above.
+- `none` — nothing we can read.
+
+`PY_ROUTER_SAMPLE_PAGES` (default 3) sets how many pages are sampled.
+"""
+import io
+import os
+import re
+from typing import Optional, Tuple, Union
+
+from .backends import lazy_module
+
+pdfplumber = lazy_module('pdfplumber')
+pdftypes = lazy_module('pdfminer.pdftypes')
+
+Source = Union[bytes, str]
+
+PDF, IMAGE, TEXT, UNKNOWN = 'pdf', 'image', 'text', 'unknown'
+VECTOR_TABLES, RASTER_OCR, IMAGE_OCR, TEXT_GRID, LLM, NONE = 'vector_tables', 'raster_ocr', 'image_ocr', 'text_grid', 'llm', 'none'
+
+IMAGE_MAGIC = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+)
+# Tj, TJ, ' and " show text; they follow an operand and precede whitespace or EOF
+TEXT_OPERATOR_RE = re.compile(rb"(?:\)|\]|>)\s*(?:Tj|TJ|'|\")(?:\s|$)")
+
+
+def read_head(source: Source, size: int = 8192) -> bytes:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source[:size])
+    with open(source, 'rb') as fh:
+        return fh.read(size)
+
+
+def _is_utf8(head: bytes) -> bool:
+    try:
+        head.decode('utf-8')
+        return True
+    except UnicodeDecodeError as e:
+        # a multi-byte character cut off at the end of the sample is fine
+        return e.start >= len(head) - 3 and e.reason == 'unexpected end of data'
+
+
+def sniff(head: bytes, content_type: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """(kind, mime) from the first bytes of a document; `content_type` only breaks ties."""
+    # the PDF header may be preceded by some junk; readers accept it within the first 1 KB
+    if b'%PDF-' in head[:1024]:
+        return PDF, 'application/pdf'
+    for magic, mime in IMAGE_MAGIC:
+        if head.startswith(magic):
+            return IMAGE, mime
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return IMAGE, 'image/webp'
+    if head and b'\x00' not in head and _is_utf8(head):
+        return TEXT, content_type if content_type and content_type.startswith('text/') else 'text/plain'
+    if content_type:
+        if content_type.startswith('image/'):
+            return IMAGE, content_type
+        if content_type == 'application/pdf':
+            return PDF, content_type
+    return UNKNOWN, content_type
+
+
+def _stream_data(obj) -> bytes:
+    try:
+        return obj.get_data() or b''
+    except Exception:
+        return b''
+
+
+def _resolve(obj):
+    return pdftypes.resolve1(obj)
+
+
+def page_content_flags(page) -> Tuple[bool, bool]:
+    """(has_text, has_images) of a pdfplumber page, from its content streams and XObjects."""
+    page_obj = page.page_obj
+    has_text = any(TEXT_OPERATOR_RE.search(_stream_data(s)) for s in (page_obj.contents or []))
+    has_images = False
+    xobjects = _resolve((page_obj.resources or {}).get('XObject')) or {}
+    for ref in xobjects.values():
+        xobj = _resolve(ref)
+        subtype = getattr(xobj, 'attrs', {}).get('Subtype')
+        name = getattr(subtype, 'name', subtype)
+        if name == 'Image':
+            has_images = True
+        elif name == 'Form' and not has_text:
+            # text drawn through a form XObject (one level deep is enough in practice)
+            has_text = bool(TEXT_OPERATOR_RE.search(_stream_data(xobj)))
+    return has_text, has_images
+
+
+def sample_indexes(page_count: int, sample: int) -> list:
+    if page_count <= sample:
+        return list(range(page_count))
+    step = (page_count - 1) / (sample - 1) if sample > 1 else 0
+    return sorted({round(i * step) for i in range(sample)})
+
+
+def empty_plan(kind: str = UNKNOWN, mime: Optional[str] = None) -> dict:
+    return {'kind': kind, 'mime': mime, 'pages': None, 'textLayer': None, 'images': None, 'plan': NONE}
+
+
+def plan_document(source: Source, content_type: Optional[str] = None, mode: str = 'mock') -> dict:
+    """
+    Decide how to extract `source`. The returned dict is reported as the
+    response `metadata`: kind, mime, pages, textLayer, images and plan.
+    """
+    kind, mime = sniff(read_head(source), content_type)
+    plan = empty_plan(kind, mime)
+    if kind == PDF:
+        sample = max(1, int(os.getenv('PY_ROUTER_SAMPLE_PAGES', '3')))
+        try:
+            with pdfplumber.open(io.BytesIO(source) if not isinstance(source, str) else source) as pdf:
+                pages = pdf.pages
+                plan['pages'] = len(pages)
+                flags = [page_content_flags(pages[i]) for i in sample_indexes(len(pages), sample)]
+        except Exception:
+            plan['kind'] = UNKNOWN
+            return plan
+        plan['textLayer'] = any(t for t, _ in flags)
+        plan['images'] = any(i for _, i in flags)
+        # no text and no images (vector drawing, unusual encoding): let pdfplumber try
+        plan['plan'] = RASTER_OCR if plan['images'] and not plan['textLayer'] else VECTOR_TABLES
+    elif kind == IMAGE:
+        plan['pages'] = 1
+        plan['plan'] = IMAGE_OCR
+    elif kind == TEXT:
+        plan['plan'] = TEXT_GRID
+    if mode in ('tgi', 'llama') and plan['plan'] != NONE:
+        plan['source'] = plan['plan']
+        plan['plan'] = LLM
+    return plan
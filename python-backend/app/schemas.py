@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import re
 
 DATA_URI_RE = re.compile(r'^data:([a-zA-Z0-9/+.-]+\/[a-zA-Z0-9.+-]+);base64,([A-Za-z0-9+/=\r\n]+)$')
@@ -13,6 +13,13 @@ class ListSchema(BaseModel):
     title: Optional[str]
     items: List[str]
 
+class RateSuggestion(BaseModel):
+    code: Optional[str]
+    description: str
+    unit: Optional[str]
+    rate: float
+    score: float
+
 class BOQItem(BaseModel):
     itemCode: Optional[str]
     description: str
@@ -21,6 +28,8 @@ class BOQItem(BaseModel):
     rate: float = 0.0
     amount: float = 0.0
     confidence: Optional[float] = None
+    # rate library matches for items the document left unpriced (see app.rates)
+    suggestions: Optional[List[RateSuggestion]] = None
 
 class BOQ(BaseModel):
     title: Optional[str]
@@ -32,6 +41,8 @@ class ExtractedData(BaseModel):
     lists: Optional[List[ListSchema]] = None
     prices: Optional[List[str]] = None
     boqs: Optional[List[BOQ]] = None
+    # how the document was read (see app.router.plan_document)
+    metadata: Optional[Dict[str, Any]] = None
 
 class ExtractDataInput(BaseModel):
     fileDataUri: str
@@ -0,0 +1,207 @@
+"""
+Spool request bodies to disk for `/extract/upload`.
+
+The JSON `/extract` endpoint receives a base64 data URI, which keeps several
+copies of the document in memory. Here the body is streamed chunk by chunk
+into a temporary file and hashed on the way, so peak memory does not grow
+with the file size and the worker processes open the file by path. Multipart
+bodies are parsed as they arrive, each file part going to its own temp file,
+so an oversized upload is refused once it crosses the limit.
+
+Environment variables:
+- `PY_UPLOAD_MAX_BYTES` — largest accepted upload (default 512 MB).
+- `PY_UPLOAD_DIR` — where uploads are spooled (default: system temp dir).
+"""
+import hashlib
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional
+
+import multipart
+from fastapi import HTTPException, Request
+from multipart.multipart import parse_options_header
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    digest: str
+    size: int
+    content_type: Optional[str] = None
+    filename: Optional[str] = None
+
+
+def max_upload_bytes() -> int:
+    return int(os.getenv('PY_UPLOAD_MAX_BYTES', str(512 * 1024 * 1024)))
+
+
+async def _write_chunks(chunks: AsyncIterator[bytes], fh, limit: int) -> tuple:
+    sha = hashlib.sha256()
+    size = 0
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f'File too large: more than {limit} bytes')
+        sha.update(chunk)
+        fh.write(chunk)
+    return sha.hexdigest(), size
+
+
+class _MultipartSpool:
+    """
+    `multipart.MultipartParser` callbacks that write each file part straight
+    to its own temp file as the body arrives. Unlike `request.form()` nothing
+    is buffered first, so the size limit is enforced while reading: the
+    request is cut off with a 413 as soon as it is crossed.
+    """
+
+    def __init__(self, limit: int, upload_dir: Optional[str], max_parts: int):
+        self.limit, self.upload_dir, self.max_parts = limit, upload_dir, max_parts
+        self.parts: List[tuple] = []  # (field name, SpooledUpload)
+        self.size = 0
+        self._field, self._value, self._headers = b'', b'', {}
+        self._fh = self._sha = None
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b'', b''
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        if b'filename' not in options:
+            return  # a plain form field: not needed, and not kept
+        if len(self.parts) >= self.max_parts:
+            raise HTTPException(status_code=400, detail=f'Too many files: more than {self.max_parts}')
+        fd, path = tempfile.mkstemp(suffix='.upload', dir=self.upload_dir)
+        part_type = self._headers.get(b'content-type', b'').decode('latin-1') or None
+        upload = SpooledUpload(path=path, digest='', size=0, content_type=part_type,
+                               filename=options[b'filename'].decode('utf-8', 'replace'))
+        self.parts.append((options.get(b'name', b'').decode('utf-8', 'replace'), upload))
+        self._fh, self._sha = os.fdopen(fd, 'wb'), hashlib.sha256()
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self.size += end - start
+        if self.size > self.limit:
+            raise HTTPException(status_code=413, detail=f'Upload too large: more than {self.limit} bytes')
+        if self._fh is not None:
+            chunk = data[start:end]
+            self._sha.update(chunk)
+            self._fh.write(chunk)
+            self.parts[-1][1].size += len(chunk)
+
+    def on_part_end(self):
+        if self._fh is not None:
+            self._fh.close()
+            self.parts[-1][1].digest = self._sha.hexdigest()
+            self._fh = None
+
+    async def read(self, request: Request, content_type: str):
+        _, options = parse_options_header(content_type)
+        if b'boundary' not in options:
+            raise HTTPException(status_code=400, detail='multipart body has no boundary')
+        callbacks = {name: getattr(self, name) for name in (
+            'on_part_begin', 'on_header_field', 'on_header_value', 'on_header_end',
+            'on_headers_finished', 'on_part_data', 'on_part_end')}
+        parser = multipart.MultipartParser(options[b'boundary'], callbacks)
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+            parser.finalize()
+        finally:
+            if self._fh is not None:
+                self._fh.close()
+
+
+@asynccontextmanager
+async def _multipart_parts(request: Request, content_type: str, limit: int, max_parts: int = 1000):
+    """Spool the file parts of a multipart body; yields (field name, `SpooledUpload`) pairs."""
+    spool = _MultipartSpool(limit, os.getenv('PY_UPLOAD_DIR') or None, max_parts)
+    try:
+        await spool.read(request, content_type)
+        yield spool.parts
+    finally:
+        for _, upload in spool.parts:
+            try:
+                os.remove(upload.path)
+            except OSError:
+                pass
+
+
+@asynccontextmanager
+async def spooled_upload(request: Request):
+    """
+    Stream the request body into a temp file and yield a `SpooledUpload`.
+
+    Accepts a raw body (`application/pdf`, `image/*`, `application/octet-stream`)
+    or `multipart/form-data` with the document in a `file` field (or the first
+    file part). The temp file is removed when the context exits.
+    """
+    limit = max_upload_bytes()
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f'File too large: {declared} bytes')
+
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('multipart/form-data'):
+        async with _multipart_parts(request, content_type, limit) as parts:
+            upload = next((u for name, u in parts if name == 'file'), parts[0][1] if parts else None)
+            if upload is None:
+                raise HTTPException(status_code=400, detail='multipart body has no file part')
+            if upload.size == 0:
+                raise HTTPException(status_code=400, detail='Empty upload')
+            yield upload
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.upload', dir=os.getenv('PY_UPLOAD_DIR') or None)
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            digest, size = await _write_chunks(request.stream(), fh, limit)
+        if size == 0:
+            raise HTTPException(status_code=400, detail='Empty upload')
+        yield SpooledUpload(path=path, digest=digest, size=size, content_type=content_type.split(';')[0].strip() or None,
+                            filename=request.headers.get('x-filename'))
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@asynccontextmanager
+async def spooled_uploads(request: Request, max_parts: int = 1000):
+    """
+    `spooled_upload` for several files: every file part of a multipart body,
+    or the raw body as one file. `PY_UPLOAD_MAX_BYTES` applies to the total.
+    Yields a list of `SpooledUpload`; the temp files are removed on exit.
+    """
+    limit = max_upload_bytes()
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f'Upload too large: {declared} bytes')
+
+    content_type = request.headers.get('content-type', '')
+    if content_type.startswith('multipart/form-data'):
+        async with _multipart_parts(request, content_type, limit, max_parts) as parts:
+            files = [u for _, u in parts if u.size]
+            if not files:
+                raise HTTPException(status_code=400, detail='Empty upload')
+            yield files
+        return
+
+    async with spooled_upload(request) as upload:
+        yield [upload]
@@ -0,0 +1,242 @@
+"""
+Shared HTTP clients for the TGI and GenAI upstreams.
+
+Each upstream gets one application-lifetime `httpx.AsyncClient`, so calls
+reuse keep-alive connections (and HTTP/2 when the `h2` package is installed)
+instead of paying a TCP/TLS handshake per request. Transient failures are
+retried a bounded number of times with jittered backoff, and a circuit
+breaker stops calling an upstream that keeps failing so requests go straight
+to the local pdfplumber/OCR fallback until it recovers. `stream()` is the
+single-attempt variant for token streaming.
+
+Environment variables (defaults in brackets):
+- `PY_UPSTREAM_MAX_CONNECTIONS` [20] / `PY_UPSTREAM_MAX_KEEPALIVE` [10]
+- `PY_UPSTREAM_RETRIES` [2] — retries after the first attempt
+- `PY_UPSTREAM_BACKOFF_SECONDS` [0.2] — base for exponential backoff with full jitter
+- `PY_UPSTREAM_BREAKER_FAILURES` [3] — consecutive failures that open the breaker
+- `PY_UPSTREAM_BREAKER_RESET_SECONDS` [30] — how long it stays open before a trial request
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from .backends import lazy_module
+
+httpx = lazy_module('httpx')
+
+TRANSIENT_STATUS = {429, 502, 503, 504}
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; in half-open state only one trial at a time."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release(self):
+        """Give back a half-open trial that ended without an answer (e.g. the caller was cancelled)."""
+        self._trial_in_flight = False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._trial_in_flight = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opens += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class Upstream:
+    def __init__(self, name: str, timeout: float, retries: Optional[int] = None, backoff: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries if retries is not None else int(os.getenv('PY_UPSTREAM_RETRIES', '2'))
+        self.backoff = backoff if backoff is not None else float(os.getenv('PY_UPSTREAM_BACKOFF_SECONDS', '0.2'))
+        self.breaker = breaker or CircuitBreaker(
+            int(os.getenv('PY_UPSTREAM_BREAKER_FAILURES', '3')),
+            float(os.getenv('PY_UPSTREAM_BREAKER_RESET_SECONDS', '30')),
+        )
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2: Optional[bool] = None
+        # metrics
+        self.requests = 0
+        self.failures = 0
+        self.retried = 0
+        self.short_circuited = 0
+        self._latencies: deque = deque(maxlen=512)
+
+    @property
+    def http2(self) -> bool:
+        # checked on first use so importing this module does not import h2
+        if self._http2 is None:
+            self._http2 = self._transport is None and _http2_available()
+        return self._http2
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=int(os.getenv('PY_UPSTREAM_MAX_CONNECTIONS', '20')),
+                max_keepalive_connections=int(os.getenv('PY_UPSTREAM_MAX_KEEPALIVE', '10')),
+            )
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits, http2=self.http2, transport=self._transport)
+        return self._client
+
+    def available(self) -> bool:
+        """Cheap check callers can use to skip work (e.g. OCR for a prompt) while the breaker is open."""
+        if self.breaker.state == OPEN and time.monotonic() - self.breaker.opened_at < self.breaker.reset_seconds:
+            return False
+        return True
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """
+        POST with bounded retries on connection errors, timeouts and 429/502/503/504.
+        Raises CircuitOpenError without sending anything while the breaker is open.
+        """
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise CircuitOpenError(f'{self.name} upstream unavailable (circuit open)')
+        try:
+            return await self._post(url, **kwargs)
+        except BaseException:
+            # cancelled mid-call (job DELETE, chunk cancellation): failures were already
+            # recorded, but a half-open trial must be given back or the breaker stays wedged
+            self.breaker.release()
+            raise
+
+    async def _post(self, url: str, **kwargs) -> httpx.Response:
+        attempt = 0
+        while True:
+            self.requests += 1
+            started = time.perf_counter()
+            try:
+                resp = await self.client().post(url, **kwargs)
+                error: Optional[Exception] = None
+                transient = resp.status_code in TRANSIENT_STATUS
+            except httpx.TransportError as e:
+                resp, error, transient = None, e, True
+            except Exception:
+                self.failures += 1
+                self.breaker.record_failure()
+                raise
+            self._latencies.append(time.perf_counter() - started)
+            if not transient:
+                self.breaker.record_success()
+                return resp
+            if attempt >= self.retries:
+                self.failures += 1
+                self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return resp
+            attempt += 1
+            self.retried += 1
+            # exponential backoff with full jitter
+            await asyncio.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+
+    @asynccontextmanager
+    async def stream(self, url: str, **kwargs):
+        """
+        POST and yield the response before its body is read, for token streaming.
+        One attempt only: a stream cannot be replayed once tokens were consumed,
+        so the caller retries (see `run_chunks`). Leaving the block closes the connection.
+        """
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            raise CircuitOpenError(f'{self.name} upstream unavailable (circuit open)')
+        self.requests += 1
+        started, responded = time.perf_counter(), False
+        try:
+            async with self.client().stream('POST', url, **kwargs) as resp:
+                responded = True
+                # time to the response headers, i.e. until generation started
+                self._latencies.append(time.perf_counter() - started)
+                if resp.status_code in TRANSIENT_STATUS:
+                    self.failures += 1
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                yield resp
+        except httpx.TransportError:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # errors in the caller's block are not the upstream's fault; before a response they are
+            if not responded:
+                self.failures += 1
+                self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release()  # cancelled: give back a half-open trial
+            raise
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else None
+
+        return {
+            'http2': self.http2,
+            'breaker': self.breaker.state,
+            'breakerOpens': self.breaker.opens,
+            'consecutiveFailures': self.breaker.failures,
+            'requests': self.requests,
+            'failures': self.failures,
+            'retries': self.retried,
+            'shortCircuited': self.short_circuited,
+            'latencyP50Ms': pct(0.5),
+            'latencyP95Ms': pct(0.95),
+        }
+
+
+tgi_upstream = Upstream('tgi', timeout=float(os.getenv('PY_TGI_TIMEOUT', '15')))
+genai_upstream = Upstream('genai', timeout=float(os.getenv('PY_GENAI_TIMEOUT', '60')))
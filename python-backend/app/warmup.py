@@ -0,0 +1,101 @@
+"""
+Warm-up before the service reports ready (`GET /ready`).
+
+At startup a background task:
+1. imports the configured backends (`app.backends.configured_backends`),
+2. starts every worker process and has it import the same backends, load the
+   rate index and extract a tiny built-in PDF,
+3. runs that PDF through the whole local pipeline once, and
+4. loads the llama model when `PY_LLAMA_PRELOAD=1`.
+
+`/health` answers as soon as the process is up (liveness). `/ready` answers
+503 until the warm-up is done, then 200 (readiness), so an autoscaler only
+routes traffic to warm instances. A backend that fails to load is reported
+in `/ready` but does not keep the service from becoming ready.
+
+`PY_WARMUP=0` skips the warm-up; `/ready` then answers 200 right away.
+"""
+import os
+import time
+from typing import Optional
+
+READY, WARMING, PENDING = 'ready', 'warming', 'pending'
+
+# (x, text) per line of the built-in document: a header row and two items
+TINY_ROWS = (
+    ('Item', 'Description', 'Qty', 'Unit', 'Rate', 'Amount'),
+    ('1', 'Concrete', '2', 'm3', '10.00', '20.00'),
+    ('2', 'Blockwork', '5', 'm2', '4.00', '20.00'),
+)
+TINY_COLUMNS = (20, 60, 160, 200, 240, 290)
+
+
+def warmup_enabled() -> bool:
+    return os.getenv('PY_WARMUP', '1') != '0'
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def tiny_pdf() -> bytes:
+    """A one-page PDF with a small BOQ in its text layer, written without any PDF library."""
+    shows = []
+    for r, row in enumerate(TINY_ROWS):
+        y = 80 - 14 * r
+        shows.extend(f'1 0 0 1 {x} {y} Tm ({_pdf_string(cell)}) Tj' for x, cell in zip(TINY_COLUMNS, row))
+    content = 'BT /F1 8 Tf ' + ' '.join(shows) + ' ET'
+    objects = [
+        '<< /Type /Catalog /Pages 2 0 R >>',
+        '<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        '<< /Type /Page /Parent 2 0 R /MediaBox [0 0 340 100] /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>',
+        '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+        f'<< /Length {len(content)} >>\nstream\n{content}\nendstream',
+    ]
+    out = b'%PDF-1.4\n'
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f'{number} 0 obj\n{body}\nendobj\n'.encode('latin-1')
+    xref = len(out)
+    out += f'xref\n0 {len(objects) + 1}\n0000000000 65535 f \n'.encode()
+    out += ''.join(f'{offset:010d} 00000 n \n' for offset in offsets).encode()
+    out += f'trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode()
+    return out
+
+
+class WarmUp:
+    """Progress of the warm-up, as reported by `/ready`."""
+
+    def __init__(self):
+        self.status = PENDING
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.backends: dict = {}
+        self.workers: list = []
+        self.extraction: Optional[dict] = None
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def start(self):
+        self.status, self.started, self.finished, self.error = WARMING, time.time(), None, None
+
+    def finish(self, error: Optional[str] = None):
+        self.status, self.finished, self.error = READY, time.time(), error
+
+    def to_dict(self) -> dict:
+        took = self.finished - self.started if self.started and self.finished else None
+        return {
+            'status': self.status,
+            'warmupMs': round(took * 1000, 1) if took is not None else None,
+            'backends': self.backends,
+            'workers': self.workers,
+            'extraction': self.extraction,
+            'error': self.error,
+        }
+
+
+warm_state = WarmUp()
@@ -0,0 +1,158 @@
+"""
+Bounded worker pool for the blocking parts of the extraction pipeline.
+
+pdfplumber, pdfminer and pytesseract are CPU bound and synchronous; calling
+them from an `async def` handler stalls every other request on the uvicorn
+worker (including `/health`). Everything blocking goes through `pool.run()`,
+which dispatches to a process pool and reports queue depth and wait times.
+
+Environment variables:
+- `PY_EXTRACT_WORKERS` — number of worker processes (default: CPU count).
+  `0` runs jobs on a small thread pool instead, which is handy for debugging.
+- `PY_EXTRACT_QUEUE_MAX` — how many requests may wait for a worker on top of
+  the ones being served (default: 4 per worker). Beyond that `/extract`
+  answers 503 with a `Retry-After` header.
+- `PY_EXTRACT_START_METHOD` — multiprocessing start method (default: spawn).
+"""
+import asyncio
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+
+from .metrics import collect_stages, record_stages
+
+
+def _timed_call(fn: Callable, submitted_at: float, args: tuple, kwargs: dict):
+    # Runs inside the worker: measure how long the job sat in the queue and
+    # hand the stage timings recorded by `fn` back to the parent.
+    wait = max(0.0, time.time() - submitted_at)
+    try:
+        with collect_stages() as stages:
+            result = fn(*args, **kwargs)
+        return wait, result, stages
+    except Exception as e:
+        # An exception that cannot be unpickled in the parent breaks the whole
+        # pool (e.g. pytesseract.TesseractNotFoundError), so flatten those.
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            raise RuntimeError(f'{type(e).__name__}: {e}') from None
+        raise
+
+
+class WorkerPool:
+    def __init__(self, workers: Optional[int] = None, queue_max: Optional[int] = None, start_method: Optional[str] = None):
+        if workers is None:
+            workers = int(os.getenv('PY_EXTRACT_WORKERS', str(os.cpu_count() or 1)))
+        self.workers = max(0, workers)
+        if queue_max is None:
+            queue_max = int(os.getenv('PY_EXTRACT_QUEUE_MAX', str(4 * max(1, self.workers))))
+        self.queue_max = max(0, queue_max)
+        self.start_method = start_method or os.getenv('PY_EXTRACT_START_METHOD', 'spawn')
+        self._executor: Optional[Executor] = None
+        # counters
+        self.admitted = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Number of requests allowed in the system at once (served + waiting)."""
+        return max(1, self.workers) + self.queue_max
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.workers == 0:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='extract')
+            else:
+                ctx = multiprocessing.get_context(self.start_method)
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        return self._executor
+
+    @asynccontextmanager
+    async def admit(self):
+        """Admission control for one request; raises 503 once the queue is full."""
+        if self.admitted >= self.capacity:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail=f'Extraction queue is full ({self.admitted} requests pending), retry later',
+                headers={'Retry-After': str(max(1, int(self.avg_wait()) + 1))},
+            )
+        self.admitted += 1
+        try:
+            yield self
+        finally:
+            self.admitted -= 1
+
+    async def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run `fn(*args, **kwargs)` in the pool. `fn` must be a picklable module-level function."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        self.submitted += 1
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            wait, result, stages = await loop.run_in_executor(executor, _timed_call, fn, time.time(), args, kwargs)
+        except BrokenProcessPool:
+            # a worker died (OOM, segfault in a native lib); start a fresh pool next time
+            self.failed += 1
+            if self._executor is executor:
+                self._executor = None
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        self.completed += 1
+        record_stages([('pool_wait', wait)] + stages)
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.run_total += max(0.0, time.perf_counter() - started - wait)
+        return result
+
+    def avg_wait(self) -> float:
+        return self.wait_total / self.completed if self.completed else 0.0
+
+    def queue_depth(self) -> int:
+        """Jobs submitted to the pool that no worker has picked up yet (approximate)."""
+        return max(0, self.in_flight - max(1, self.workers))
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'kind': 'thread' if self.workers == 0 else 'process',
+            'capacity': self.capacity,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'inFlight': self.in_flight,
+            'queueDepth': self.queue_depth(),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avgWaitMs': round(self.avg_wait() * 1000, 2),
+            'maxWaitMs': round(self.wait_max * 1000, 2),
+            'avgRunMs': round((self.run_total / self.completed) * 1000, 2) if self.completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pool = WorkerPool()
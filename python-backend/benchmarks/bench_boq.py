@@ -0,0 +1,122 @@
+"""
+Rows/second of the BOQ builder: the previous per-cell builder vs app.boq.
+
+    python -m benchmarks.bench_boq [--rows 20000] [--repeat 3]
+"""
+import argparse
+import json
+import random
+import time
+
+from app.boq import build_mock_boq_from_tables
+from app.schemas import BOQ, BOQItem
+from benchmarks.bench_numbers import legacy_parse_number
+
+
+# The builder as it was before app.boq, kept here as the baseline (with the parser it used then).
+def legacy_build_mock_boq_from_tables(tables) -> list:
+    # Heuristic: if a table has headers like 'Item' 'Description' 'Quantity' include as a BOQ
+    boqs = []
+    for t in tables:
+        headers = [h.lower() for h in t.get('headers', [])]
+        if any(x in ' '.join(headers) for x in ['description', 'qty', 'quantity', 'rate', 'amount']):
+            # Convert rows into BOQ items with best-effort parsing
+            items = []
+            for r in t.get('rows', []):
+                # Map columns heuristically
+                desc = ''
+                qty = 0.0
+                unit = ''
+                rate = 0.0
+                amount = 0.0
+                itemCode = ''
+                confidence = 0.0
+                for i, cell in enumerate(r):
+                    h = headers[i] if i < len(headers) else ''
+                    cell_str = str(cell).strip()
+                    if 'item' in h or 'code' in h:
+                        itemCode = cell_str
+                    elif 'desc' in h:
+                        desc = cell_str
+                    elif 'qty' in h or 'quantity' in h:
+                        parsed = legacy_parse_number(cell_str)
+                        if parsed is not None:
+                            qty = parsed
+                            confidence += 0.3
+                        else:
+                            qty = 0.0
+                    elif 'unit' in h:
+                        unit = cell_str
+                    elif 'rate' in h:
+                        parsed = legacy_parse_number(cell_str)
+                        if parsed is not None:
+                            rate = parsed
+                            confidence += 0.3
+                        else:
+                            rate = 0.0
+                    elif 'amount' in h or 'total' in h:
+                        parsed = legacy_parse_number(cell_str)
+                        if parsed is not None:
+                            amount = parsed
+                            confidence += 0.3
+                        else:
+                            amount = 0.0
+                    else:
+                        # fallback: append to description
+                        desc = (desc + ' ' + cell_str).strip()
+
+                # normalize confidence to 0..1
+                conf = min(1.0, confidence) if confidence > 0 else None
+                items.append(BOQItem(itemCode=itemCode or None, description=desc or '-', quantity=qty, unit=unit or '-', rate=rate, amount=amount, confidence=conf))
+
+            boqs.append(BOQ(title=None, description=None, items=items))
+    return boqs
+
+
+
+def make_table(rows: int, seed: int = 0) -> dict:
+    rnd = random.Random(seed)
+    units = ['m2', 'm3', 'nos', 'lm', 'kg', 'item']
+    body = []
+    for i in range(rows):
+        qty = rnd.randint(1, 5000)
+        rate = rnd.randint(100, 99999) / 1000
+        body.append([
+            str(i + 1),
+            f'Supply and install item {i + 1} as per specification',
+            f'{qty:,}',
+            rnd.choice(units),
+            f'{rate:,.3f}',
+            f'{qty * rate:,.3f}',
+        ])
+    return {'headers': ['Item', 'Description', 'Qty', 'Unit', 'Rate', 'Amount'], 'rows': body, 'description': None}
+
+
+def rows_per_second(builder, table: dict, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        builder([table])
+        best = min(best, time.perf_counter() - started)
+    return len(table['rows']) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    table = make_table(args.rows)
+    before = rows_per_second(legacy_build_mock_boq_from_tables, table, args.repeat)
+    after = rows_per_second(build_mock_boq_from_tables, table, args.repeat)
+    print(json.dumps({
+        'rows': args.rows,
+        'beforeRowsPerSec': round(before),
+        'afterRowsPerSec': round(after),
+        'speedup': round(after / before, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
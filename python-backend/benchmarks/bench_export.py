@@ -0,0 +1,63 @@
+"""
+Spreadsheet export: time to first byte, total time, output size and the
+extra memory the export needs on top of the result itself.
+
+    python -m benchmarks.bench_export [--rows 10000 --rows 100000]
+
+Rows count both sheets of the result: the table and the BOQ built from it.
+Peak memory is traced in a second pass, consuming the stream and discarding
+the chunks as StreamingResponse does. It should stay flat as rows grow.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from app.export import iter_csv, iter_xlsx, sheets_for
+from app.main import build_extracted_data
+from app.responses import row_count
+from benchmarks.bench_boq import make_table
+
+
+def run(fmt: str, content: dict) -> dict:
+    iterate = iter_xlsx if fmt == 'xlsx' else iter_csv
+    started = time.perf_counter()
+    first, size, chunks = None, 0, 0
+    for chunk in iterate(sheets_for(content)):
+        if first is None and chunk:
+            first = time.perf_counter() - started
+        size += len(chunk)
+        chunks += 1
+    elapsed = time.perf_counter() - started
+    # a second pass for memory: tracing slows allocation down too much to time it
+    tracemalloc.start()
+    for _ in iterate(sheets_for(content)):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'firstByteMs': round(first * 1000, 2),
+        'totalSeconds': round(elapsed, 3),
+        'rowsPerSecond': round(row_count(content) / elapsed),
+        'bytes': size,
+        'chunks': chunks,
+        'peakExtraBytes': peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, action='append')
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows or [10000, 100000]:
+        table = make_table(rows)
+        content = build_extracted_data([table])
+        for fmt in ('xlsx', 'csv'):
+            results.append(dict(rows=rows, format=fmt, **run(fmt, content)))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
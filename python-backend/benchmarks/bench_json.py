@@ -0,0 +1,70 @@
+"""
+Latency and peak memory of encoding a large result: the previous path
+(ExtractedData validation, model_dump, JSONResponse) vs app.responses.
+
+    python -m benchmarks.bench_json [--rows 100000] [--repeat 3]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from app.main import build_extracted_data
+from app.responses import iter_compressed, iter_json, json_response
+from app.schemas import ExtractedData
+from benchmarks.bench_boq import make_table
+
+
+def legacy_body(tables: list, boqs: list) -> bytes:
+    extracted = ExtractedData(tables=tables or None, lists=None, prices=None, boqs=boqs or None)
+    return JSONResponse(content=extracted.model_dump()).body
+
+
+def request(accept_encoding: str = '') -> Request:
+    headers = [(b'accept-encoding', accept_encoding.encode())] if accept_encoding else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers})
+
+
+def new_body(content: dict, accept_encoding: str = '') -> int:
+    resp = json_response(request(accept_encoding), content)
+    if hasattr(resp, 'body_iterator'):
+        # drain the stream the way the server would
+        return sum(len(c) for c in iter_compressed(iter_json(content), resp.headers.get('content-encoding')))
+    return len(resp.body)
+
+
+def measure(fn, repeat: int) -> dict:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'ms': round(best * 1000, 1), 'peakBytes': peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    table = make_table(args.rows)
+    content = build_extracted_data([table])
+    boqs = content['boqs']
+    print(json.dumps({
+        'rows': args.rows,
+        'legacy': measure(lambda: legacy_body([table], boqs), args.repeat),
+        'json': measure(lambda: new_body(content), args.repeat),
+        'gzip': measure(lambda: new_body(content, 'gzip'), args.repeat),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Parsing LLM answers: the previous `try_parse_json_from_text` (whole-text
+json.loads, first-to-last brace slice, then a non-greedy regex over every
+`{...}`) vs `app.jsonstream.ExtractionStream` fed token by token.
+
+    python -m benchmarks.bench_llm_json [--items 2000] [--repeat 3]
+
+Cases: a complete answer followed by chatter, and the same answer cut off
+at 90% (the `max_new_tokens` case). `whole` parses the finished text with
+`parse_extracted`, `stream` feeds 4-character tokens one at a time. Besides
+parse time it reports the BOQ items recovered, the token at which the first
+item was available, and how many tokens generation could stop early.
+"""
+import argparse
+import json
+import re
+import time
+
+from app.jsonstream import ExtractionStream, parse_extracted
+from app.schemas import ExtractedData
+
+TOKEN_CHARS = 4
+CHATTER = '\nI hope this helps! Let me know if you need the rates broken down {per item} or anything else.' * 20
+
+
+def legacy_parse(text: str):
+    try:
+        return json.loads(text)
+    except Exception:
+        pass
+    first, last = text.find('{'), text.rfind('}')
+    if first != -1 and last > first:
+        try:
+            return json.loads(text[first:last + 1])
+        except Exception:
+            pass
+    for m in re.findall(r'(\{.*?\})', text, re.DOTALL):
+        try:
+            return json.loads(m)
+        except Exception:
+            continue
+    raise ValueError('No JSON object found in text')
+
+
+def answer(items: int) -> str:
+    boq = {'title': 'Bill 1', 'items': [
+        {'itemCode': f'{i}', 'description': f'Reinforced concrete grade {i % 40} in slabs', 'quantity': i % 97 + 1,
+         'unit': 'm3', 'rate': 85.5, 'amount': round(85.5 * (i % 97 + 1), 2)} for i in range(items)]}
+    return 'Here is the extracted data:\n```json\n' + json.dumps({'boqs': [boq]}) + '\n```'
+
+
+def items_of(data: ExtractedData) -> int:
+    return sum(len(b.items) for b in data.boqs or [])
+
+
+def legacy(text: str) -> dict:
+    try:
+        return {'items': items_of(ExtractedData.model_validate(legacy_parse(text)))}
+    except Exception as e:
+        return {'items': 0, 'error': type(e).__name__}
+
+
+def streamed(text: str) -> dict:
+    stream, first = ExtractionStream(), None
+    tokens = (len(text) + TOKEN_CHARS - 1) // TOKEN_CHARS
+    used = tokens
+    for t in range(tokens):
+        events = stream.feed(text[t * TOKEN_CHARS:(t + 1) * TOKEN_CHARS])
+        if first is None and events:
+            first = t + 1
+        if stream.done:
+            used = t + 1
+            break
+    return {'items': items_of(stream.result()), 'firstItemToken': first, 'tokens': tokens,
+            'tokensSkipped': tokens - used}
+
+
+def whole(text: str) -> dict:
+    return {'items': items_of(parse_extracted(text))}
+
+
+def timed(fn, text: str, repeat: int):
+    best, out = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn(text)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return dict(out, ms=round(best * 1000, 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    full = answer(args.items)
+    cases = {'complete': full + CHATTER, 'truncated': full[:int(len(full) * 0.9)]}
+    print(json.dumps({
+        'items': args.items,
+        'chars': len(full),
+        **{name: {'legacy': timed(legacy, text, args.repeat), 'whole': timed(whole, text, args.repeat),
+                  'stream': timed(streamed, text, args.repeat)}
+           for name, text in cases.items()},
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Cells/second of the numeric parser: the previous str.replace chain vs app.numbers.
+
+    python -m benchmarks.bench_numbers [--cells 200000] [--distinct 2000] [--repeat 3]
+
+Runs twice: on all-distinct cells (the cost of the tokenizer itself) and on
+cells drawn from `--distinct` values, closer to real BOQ columns where units,
+rates and round quantities repeat.
+"""
+import argparse
+import json
+import random
+import time
+from typing import List, Optional
+
+from app.numbers import parse_number, parse_number_column
+
+
+# parse_number as it was before the tokenizer, kept here as the baseline
+def legacy_parse_number(s: str) -> Optional[float]:
+    if s is None:
+        return None
+    s = str(s).strip()
+    if s == '':
+        return None
+    s = s.replace(' ', '').replace(' ', '').strip()
+    s = s.replace('$', '').replace('€', '').replace('£', '').replace('AED', '').replace('OMR', '')
+    negative = False
+    if s.startswith('(') and s.endswith(')'):
+        negative = True
+        s = s[1:-1]
+    s = s.replace(',', '')
+    is_percent = False
+    if s.endswith('%'):
+        is_percent = True
+        s = s[:-1]
+    try:
+        val = float(s)
+        if is_percent:
+            val = val / 100.0
+        if negative:
+            val = -val
+        return val
+    except Exception:
+        return None
+
+
+def make_cells(count: int, seed: int = 0) -> List[str]:
+    """Quantity/rate/amount-like cells in the mix seen in tenders."""
+    rnd = random.Random(seed)
+    cells = []
+    for _ in range(count):
+        value = rnd.randint(1, 5_000_000) / 1000
+        style = rnd.random()
+        if style < 0.4:
+            cells.append(f'{value:,.3f}')
+        elif style < 0.6:
+            cells.append(str(rnd.randint(1, 500)))
+        elif style < 0.75:
+            cells.append(f'OMR {value:,.3f}')
+        elif style < 0.85:
+            cells.append(f'({value:,.2f})')
+        elif style < 0.95:
+            cells.append(f'{rnd.randint(1, 900)} {rnd.choice(["m2", "m3", "nos", "lm"])}')
+        else:
+            cells.append(rnd.choice(['', '-', 'incl.', 'rate only']))
+    return cells
+
+
+def cells_per_second(fn, cells: List[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(cells)
+        best = min(best, time.perf_counter() - started)
+    return len(cells) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cells', type=int, default=200000)
+    parser.add_argument('--distinct', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    unique = make_cells(args.cells)
+    pool = make_cells(args.distinct, seed=1)
+    rnd = random.Random(2)
+    repeated = [rnd.choice(pool) for _ in range(args.cells)]
+    report = {'cells': args.cells, 'distinct': args.distinct}
+    for name, cells in (('unique', unique), ('repeated', repeated)):
+        before = cells_per_second(lambda cs: [legacy_parse_number(c) for c in cs], cells, args.repeat)
+        per_cell = cells_per_second(lambda cs: [parse_number(c) for c in cs], cells, args.repeat)
+        column = cells_per_second(parse_number_column, cells, args.repeat)
+        report[name] = {
+            'legacyCellsPerSec': round(before),
+            'parseNumberCellsPerSec': round(per_cell),
+            'columnCellsPerSec': round(column),
+            'columnSpeedup': round(column / before, 2),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
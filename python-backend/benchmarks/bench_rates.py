@@ -0,0 +1,101 @@
+"""
+Rate library lookups: index build and load time, and microseconds per item.
+
+    python -m benchmarks.bench_rates [--entries 100000] [--items 5000]
+
+The library is synthetic: work descriptions from the corpus combined with
+sizes, finishes, locations and notes, so entries share most of their tokens
+the way a real rate library does. Each kind of work keeps one unit. Queries
+are library descriptions with one word dropped.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+
+from app import rates
+from app.rates import RateIndex, read_library
+from benchmarks.corpus import UNITS, WORKS
+
+SIZES = [f'{n}mm' for n in range(50, 610, 10)] + ['1:2:4', '1:3:6', '1:4:8', 'grade 20', 'grade 25', 'grade 30', 'grade 40']
+FINISHES = ['white', 'grey', 'black', 'galvanised', 'stainless', 'fire rated', 'moisture resistant', 'anti slip',
+            'polished', 'matt', 'textured', 'epoxy coated', 'sulphate resisting', 'heavy duty', 'light duty']
+PLACES = ['in foundations', 'in walls', 'to soffits', 'to columns', 'in roof slab', 'external', 'internal',
+          'below ground', 'to staircases', 'in plant rooms', 'to corridors', 'in wet areas']
+EXTRAS = ['including formwork', 'including curing', 'as per specification', 'with two coats', 'fixed to concrete',
+          'on site', 'complete with accessories', 'including testing', 'to approval', 'including wastage']
+
+
+def entry(rnd: random.Random) -> tuple:
+    """(description, unit); each kind of work keeps one unit."""
+    work = rnd.randrange(len(WORKS))
+    parts = [WORKS[work], rnd.choice(SIZES), rnd.choice(FINISHES), rnd.choice(PLACES), rnd.choice(EXTRAS)]
+    return ' '.join(parts), UNITS[work % len(UNITS)]
+
+
+def drop_word(text: str, rnd: random.Random) -> str:
+    words = text.split()
+    del words[rnd.randrange(len(words))]
+    return ' '.join(words)
+
+
+def write_library(path: str, entries: int, seed: int = 0) -> list:
+    """Writes the CSV and returns its (description, unit) pairs."""
+    rnd = random.Random(seed)
+    pairs = []
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(['Code', 'Description', 'Unit', 'Rate'])
+        for i in range(entries):
+            desc, unit = entry(rnd)
+            pairs.append((desc, unit))
+            writer.writerow([f'R{i:06d}', desc, unit, f'{rnd.uniform(0.5, 900):.3f}'])
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--items', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rates.csv')
+        library = write_library(path, args.entries)
+        os.environ['PY_RATE_LIBRARY'] = path
+
+        started = time.perf_counter()
+        index = RateIndex(*read_library(path))
+        build_s = time.perf_counter() - started
+        # first call writes the index file, the second process-like call loads it
+        rates.rate_index()
+        rates._load_index.cache_clear()
+        started = time.perf_counter()
+        rates.rate_index()
+        load_s = time.perf_counter() - started
+
+        rnd = random.Random(1)
+        sources = [rnd.randrange(len(library)) for _ in range(args.items)]
+        results = {}
+        for name, edit in (('exact', lambda text: text), ('oneWordDropped', lambda text: drop_word(text, rnd))):
+            queries = [(edit(library[i][0]), library[i][1]) for i in sources]
+            started = time.perf_counter()
+            hits = [index.search(desc, unit, 3) for desc, unit in queries]
+            elapsed = time.perf_counter() - started
+            found = sum(bool(h) and index.descriptions[index.doc_entry[h[0][0]]] == library[i][0] for h, i in zip(hits, sources))
+            results[name] = {'lookupMicroseconds': round(elapsed / len(queries) * 1e6, 1),
+                             'top1': round(found / len(queries), 3)}
+
+    print(json.dumps({
+        'entries': args.entries,
+        'buildSeconds': round(build_s, 2),
+        'loadSeconds': round(load_s, 3),
+        **results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Synthetic BOQ documents for the benchmarks.
+
+Every generator is deterministic for a given seed and returns the document
+bytes, so the same corpus can be rebuilt on any commit:
+
+- `ruled_boq_pdf` — multi-page BOQ with drawn cell borders (pdfplumber tables)
+- `text_boq_pdf` — CSV-like text lines without rules (text fallback path)
+- `scanned_boq_pdf` — pages that are only an embedded image (OCR path)
+- `noisy_boq_image` — a rotated PNG photo/scan of a BOQ with speckle noise
+
+    python -m benchmarks.corpus --out /tmp/corpus --size medium
+"""
+import argparse
+import io
+import os
+import random
+from typing import Dict, List, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+HEADERS = ['Item', 'Description', 'Qty', 'Unit', 'Rate', 'Amount']
+UNITS = ['m2', 'm3', 'nos', 'lm', 'kg', 'item', 'set']
+WORKS = [
+    'Excavation in ordinary soil', 'Plain cement concrete 1:4:8', 'Reinforced concrete grade 30',
+    'Blockwork 200mm thick', 'Cement plaster 20mm', 'Ceramic floor tiles', 'Emulsion paint two coats',
+    'uPVC pipe 110mm dia', 'Cable tray 300mm', 'Gypsum board false ceiling', 'Waterproofing membrane',
+]
+
+# pages, rows per page
+SIZES: Dict[str, Tuple[int, int]] = {
+    'small': (2, 20),
+    'medium': (10, 40),
+    'large': (50, 40),
+}
+
+# x positions (points) of the column borders on an A4 page
+COLUMN_EDGES = [40, 80, 300, 350, 400, 470, 555]
+ROW_HEIGHT = 16
+
+
+def boq_rows(count: int, seed: int = 0, start: int = 1) -> List[List[str]]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(start, start + count):
+        qty = rnd.randint(1, 2500)
+        rate = rnd.randint(500, 250000) / 1000
+        rows.append([
+            str(i),
+            f'{rnd.choice(WORKS)} ref {i}',
+            f'{qty:,}',
+            rnd.choice(UNITS),
+            f'{rate:,.3f}',
+            f'{qty * rate:,.3f}',
+        ])
+    return rows
+
+
+def ruled_boq_pdf(pages: int, rows_per_page: int, seed: int = 0) -> bytes:
+    """BOQ drawn as a bordered grid, header row repeated on every page."""
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    _, height = A4
+    c.setFont('Helvetica', 7)
+    for p in range(pages):
+        rows = [HEADERS] + boq_rows(rows_per_page, seed + p, start=p * rows_per_page + 1)
+        top = height - 50
+        bottom = top - ROW_HEIGHT * len(rows)
+        for r, row in enumerate(rows):
+            y = top - ROW_HEIGHT * (r + 1)
+            for x, cell in zip(COLUMN_EDGES, row):
+                c.drawString(x + 3, y + 5, cell)
+        for r in range(len(rows) + 1):
+            c.line(COLUMN_EDGES[0], top - ROW_HEIGHT * r, COLUMN_EDGES[-1], top - ROW_HEIGHT * r)
+        for x in COLUMN_EDGES:
+            c.line(x, top, x, bottom)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def text_boq_pdf(pages: int, rows_per_page: int, seed: int = 0) -> bytes:
+    """BOQ as comma-separated text lines without any rules."""
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    _, height = A4
+    c.setFont('Helvetica', 8)
+    for p in range(pages):
+        rows = [HEADERS] + boq_rows(rows_per_page, seed + p, start=p * rows_per_page + 1)
+        y = height - 50
+        for row in rows:
+            # quote cells so thousands separators survive the CSV reader
+            c.drawString(40, y, ','.join(f'"{cell}"' for cell in row))
+            y -= 12
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def render_boq_image(rows: List[List[str]], scale: int = 2) -> Image.Image:
+    """A white page with the table drawn in black, roughly like a 150 dpi scan."""
+    font = ImageFont.load_default()
+    edges = [x * scale for x in COLUMN_EDGES]
+    row_h = ROW_HEIGHT * scale
+    im = Image.new('L', (edges[-1] + 40, row_h * (len(rows) + 2)), 255)
+    draw = ImageDraw.Draw(im)
+    for r, row in enumerate(rows):
+        y = row_h * (r + 1)
+        for x, cell in zip(edges, row):
+            draw.text((x + 4, y + 3), cell, fill=0, font=font)
+        draw.line((edges[0], y, edges[-1], y), fill=0)
+    y_end = row_h * (len(rows) + 1)
+    draw.line((edges[0], y_end, edges[-1], y_end), fill=0)
+    for x in edges:
+        draw.line((x, row_h, x, y_end), fill=0)
+    return im
+
+
+def scanned_boq_pdf(pages: int, rows_per_page: int, seed: int = 0) -> bytes:
+    """PDF whose pages are images only; there is no text layer to extract."""
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=A4)
+    width, height = A4
+    for p in range(pages):
+        rows = [HEADERS] + boq_rows(rows_per_page, seed + p, start=p * rows_per_page + 1)
+        im = render_boq_image(rows)
+        w = width - 60
+        h = w * im.height / im.width
+        c.drawImage(ImageReader(im), 30, height - 30 - h, width=w, height=h)
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def noisy_boq_image(rows: int, rotation: float = 2.5, noise: float = 0.02, seed: int = 0) -> bytes:
+    """PNG of a BOQ, slightly rotated and sprinkled with salt-and-pepper noise."""
+    rnd = random.Random(seed)
+    im = render_boq_image([HEADERS] + boq_rows(rows, seed))
+    im = im.rotate(rotation, expand=True, fillcolor=255)
+    px = im.load()
+    for _ in range(int(im.width * im.height * noise)):
+        px[rnd.randrange(im.width), rnd.randrange(im.height)] = rnd.choice((0, 255))
+    buf = io.BytesIO()
+    im.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def build_corpus(size: str = 'small', seed: int = 0) -> Dict[str, bytes]:
+    """name -> document bytes for one preset of `SIZES`."""
+    pages, rows = SIZES[size]
+    return {
+        'ruled.pdf': ruled_boq_pdf(pages, rows, seed),
+        'text.pdf': text_boq_pdf(pages, rows, seed),
+        'scanned.pdf': scanned_boq_pdf(max(1, pages // 5), rows, seed),
+        'noisy.png': noisy_boq_image(rows, seed=seed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic BOQ corpus to a directory.')
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    os.makedirs(args.out, exist_ok=True)
+    for name, data in build_corpus(args.size, args.seed).items():
+        with open(os.path.join(args.out, name), 'wb') as fh:
+            fh.write(data)
+        print(f'{name}: {len(data)} bytes')
+
+
+if __name__ == '__main__':
+    main()
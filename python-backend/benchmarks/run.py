@@ -0,0 +1,240 @@
+"""
+In-process benchmark of the extraction pipeline on a synthetic corpus.
+
+Runs the pipeline stages directly (`extract_tables_from_pdf_bytes`, OCR,
+`build_mock_boq_from_tables`) and the full `/extract` endpoint through
+FastAPI's TestClient, and prints one JSON document with throughput, p50/p95
+latency and peak RSS per case. Save the output per commit and compare:
+
+    python -m benchmarks.run --size medium --out bench-new.json
+    python -m benchmarks.run --size medium --compare bench-old.json
+
+By default the worker pool runs on threads (`PY_EXTRACT_WORKERS=0`) so the
+RSS figures cover all the work; pass `--workers N` to benchmark the process
+pool instead. Cases run in one process, so `peakRssBytes` is the high-water
+mark up to and including that case; use `--case` to measure one in isolation.
+
+`coldStart` is measured in a fresh interpreter: how long `import app.main`
+takes and how long each backend (`app.backends`) then takes to import.
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from .corpus import SIZES, build_corpus
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process in bytes."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        return 0
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+
+def measure(name: str, fn: Callable[[], object], repeat: int, units: int, unit: str,
+            describe: Optional[Callable[[object], dict]] = None) -> dict:
+    """
+    Call `fn` `repeat` times (after one warm-up call) and summarise the latencies.
+    `describe` summarises the warm-up result, so an empty extraction shows up next to its timing.
+    """
+    latencies, errors = [], []
+    output = None
+    try:
+        output = describe(fn()) if describe else None
+    except Exception as e:
+        errors.append(f'{type(e).__name__}: {e}')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            errors.append(f'{type(e).__name__}: {e}')
+            continue
+        latencies.append(time.perf_counter() - started)
+    total = sum(latencies)
+    return {
+        'case': name,
+        'runs': len(latencies),
+        'errors': len(errors),
+        'error': errors[0] if errors else None,
+        'unit': unit,
+        'unitsPerRun': units,
+        'throughput': round(units * len(latencies) / total, 2) if total else None,
+        'meanMs': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+        'p50Ms': round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+        'p95Ms': round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        'peakRssBytes': peak_rss(),
+        'output': output,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+COLD_START = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter() - started
+from app.backends import BACKENDS, load
+report = load(list(BACKENDS))
+print(json.dumps({'importAppMs': round(imported * 1000, 1),
+                  'backendMs': {name: r['ms'] for name, r in report.items() if r['ok']}}))
+"""
+
+
+def cold_start() -> Optional[dict]:
+    """Import times in a fresh interpreter; None if it could not be measured."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        out = subprocess.run([sys.executable, '-c', COLD_START], cwd=root, capture_output=True, text=True, timeout=120)
+        return json.loads(out.stdout.strip().splitlines()[-1])
+    except Exception:
+        return None
+
+
+def data_uri(data: bytes, mime: str) -> str:
+    return f'data:{mime};base64,' + base64.b64encode(data).decode()
+
+
+def describe_tables(tables: list) -> dict:
+    return {'tables': len(tables), 'rows': sum(len(t['rows']) for t in tables)}
+
+
+def describe_response(resp) -> dict:
+    body = resp.json()
+    return {
+        'tables': len(body.get('tables') or []),
+        'rows': sum(len(t['rows']) for t in body.get('tables') or []),
+        'boqItems': sum(len(b['items']) for b in body.get('boqs') or []),
+    }
+
+
+def run_benchmarks(size: str, repeat: int, cases: Optional[List[str]] = None, seed: int = 0) -> dict:
+    # imported here so --workers can configure the pool before app.workers reads the environment
+    from fastapi.testclient import TestClient
+
+    from app.boq import build_mock_boq_from_tables
+    from app.main import app, extract_tables_from_pdf_bytes, extract_text_from_image_bytes
+
+    pages, rows_per_page = SIZES[size]
+    corpus = build_corpus(size, seed)
+    scanned_pages = max(1, pages // 5)
+    ruled_tables = extract_tables_from_pdf_bytes(corpus['ruled.pdf'])
+    boq_rows = sum(len(t['rows']) for t in ruled_tables)
+
+    selected: Dict[str, Callable[[], dict]] = {
+        'pdf_tables_ruled': lambda: measure('pdf_tables_ruled', lambda: extract_tables_from_pdf_bytes(corpus['ruled.pdf']), repeat, pages, 'pages', describe_tables),
+        'pdf_tables_text': lambda: measure('pdf_tables_text', lambda: extract_tables_from_pdf_bytes(corpus['text.pdf']), repeat, pages, 'pages', describe_tables),
+        'ocr_image': lambda: measure('ocr_image', lambda: extract_text_from_image_bytes(corpus['noisy.png']), repeat, 1, 'images',
+                                lambda text: {'lines': len([l for l in text.splitlines() if l.strip()])}),
+        'boq_build': lambda: measure('boq_build', lambda: build_mock_boq_from_tables(ruled_tables), repeat, boq_rows, 'rows'),
+    }
+    endpoint_docs = {
+        'endpoint_ruled_pdf': ('ruled.pdf', 'application/pdf', pages),
+        'endpoint_text_pdf': ('text.pdf', 'application/pdf', pages),
+        'endpoint_scanned_pdf': ('scanned.pdf', 'application/pdf', scanned_pages),
+        'endpoint_noisy_image': ('noisy.png', 'image/png', 1),
+    }
+
+    results = []
+    with TestClient(app) as client:
+        def post(doc: str, mime: str):
+            resp = client.post('/extract', params={'cache': 'false'}, json={'fileDataUri': data_uri(corpus[doc], mime)})
+            resp.raise_for_status()
+            return resp
+
+        for name, (doc, mime, units) in endpoint_docs.items():
+            selected[name] = (lambda name=name, doc=doc, mime=mime, units=units:
+                              measure(name, lambda: post(doc, mime), repeat, units, 'pages', describe_response))
+        for name, case in selected.items():
+            if cases and name not in cases:
+                continue
+            results.append(case())
+
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'workers': os.getenv('PY_EXTRACT_WORKERS'),
+            'size': size,
+            'pages': pages,
+            'rowsPerPage': rows_per_page,
+            'repeat': repeat,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'coldStart': cold_start(),
+        'cases': results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Cases whose throughput dropped by more than `tolerance` (a fraction) against the baseline."""
+    before = {c['case']: c for c in baseline.get('cases', [])}
+    regressions = []
+    for case in current['cases']:
+        old = before.get(case['case'])
+        if not old or not old.get('throughput') or not case.get('throughput'):
+            continue
+        ratio = case['throughput'] / old['throughput']
+        case['baselineThroughput'] = old['throughput']
+        case['throughputRatio'] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append(case['case'])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the extraction pipeline on a synthetic BOQ corpus.')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--case', action='append', help='run only this case (repeatable)')
+    parser.add_argument('--workers', type=int, default=0, help='PY_EXTRACT_WORKERS for the endpoint cases (default 0: threads)')
+    parser.add_argument('--out', help='also write the JSON result to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed throughput drop against --compare (default 0.2)')
+    args = parser.parse_args()
+
+    os.environ['PY_EXTRACT_WORKERS'] = str(args.workers)
+    result = run_benchmarks(args.size, args.repeat, args.case, args.seed)
+    regressions: List[str] = []
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare(result, json.load(fh), args.tolerance)
+        result['regressions'] = regressions
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w') as fh:
+            fh.write(text)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import io
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.batch import estimate_cost, lpt_order
+from benchmarks.corpus import ruled_boq_pdf, text_boq_pdf
+
+
+def make_zip(members: dict) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def test_costs_schedule_scans_first():
+    scan = estimate_cost({'plan': 'raster_ocr', 'pages': 4}, 4_000_000)
+    vector = estimate_cost({'plan': 'vector_tables', 'pages': 40}, 400_000)
+    text = estimate_cost({'plan': 'text_grid', 'pages': None}, 2_000)
+    assert scan > vector > text
+    assert lpt_order([vector, text, scan]) == [2, 0, 1]
+
+
+def test_batch_zip_and_multipart_manifest():
+    package = make_zip({
+        'bill/section-a.pdf': ruled_boq_pdf(2, 5, seed=11),
+        'bill/section-b.pdf': text_boq_pdf(1, 4, seed=12),
+        'drawings/readme.bin': b'\x00\x01\x02',
+        '__MACOSX/bill/._section-a.pdf': b'junk',
+    })
+    with TestClient(main.app) as client:
+        raw = client.post('/extract/batch', content=package, headers={'Content-Type': 'application/zip', 'X-Filename': 'tender.zip'})
+        multi = client.post('/extract/batch', params={'format': 'columnar'}, files=[
+            ('file', ('tender.zip', package, 'application/zip')),
+            ('file', ('extra.csv', b'Item,Description,Qty\n1,Concrete,2\n', 'text/csv')),
+        ])
+    assert raw.status_code == 200
+    body = raw.json()
+    names = [f['name'] for f in body['files']]
+    assert names == ['tender.zip/bill/section-a.pdf', 'tender.zip/bill/section-b.pdf', 'tender.zip/drawings/readme.bin']
+    a, b, junk = body['files']
+    assert a['status'] == 'done' and len(a['result']['boqs'][0]['items']) == 10
+    assert b['status'] == 'done' and a['plan'] == 'vector_tables'
+    assert junk['status'] == 'skipped'
+    assert body['summary']['done'] == 2 and body['summary']['skipped'] == 1 and body['summary']['failed'] == 0
+    assert all('elapsedMs' in f and 'waitMs' in f for f in body['files'])
+
+    files = multi.json()['files']
+    assert [f['name'] for f in files][-1] == 'extra.csv'
+    assert files[0]['cache'] == 'hit'
+    assert 'rows' in files[0]['result']['boqs'][0]
@@ -0,0 +1,29 @@
+import io
+
+from PIL import Image
+
+from app.main import extract_tables_from_pdf_bytes
+from benchmarks.corpus import HEADERS, noisy_boq_image, ruled_boq_pdf, text_boq_pdf
+from benchmarks.run import compare, measure
+
+
+def test_corpus_pdfs_extract_as_one_boq_table():
+    for make in (ruled_boq_pdf, text_boq_pdf):
+        tables = extract_tables_from_pdf_bytes(make(pages=2, rows_per_page=5))
+        assert len(tables) == 1, make.__name__
+        assert tables[0]['headers'] == HEADERS
+        assert len(tables[0]['rows']) == 10
+
+
+def test_corpus_is_deterministic():
+    assert noisy_boq_image(5, seed=3) == noisy_boq_image(5, seed=3)
+    assert Image.open(io.BytesIO(noisy_boq_image(5))).format == 'PNG'
+
+
+def test_measure_and_compare():
+    result = measure('noop', lambda: None, repeat=3, units=10, unit='rows')
+    assert result['runs'] == 3 and result['errors'] == 0 and result['p95Ms'] is not None
+    current = {'cases': [dict(result, throughput=50.0)]}
+    assert compare(current, {'cases': [dict(result, throughput=100.0)]}, tolerance=0.2) == ['noop']
+    assert compare(current, {'cases': [dict(result, throughput=55.0)]}, tolerance=0.2) == []
+    assert current['cases'][0]['throughputRatio'] == 0.909
@@ -0,0 +1,60 @@
+import json
+
+from app.boq import build_mock_boq_from_tables, header_role, synonym_table
+
+
+def test_header_roles_cover_tender_spellings():
+    assert header_role('Qty.') == 'quantity'
+    assert header_role('U/Rate') == 'rate'
+    assert header_role('Unit Rate (OMR)') == 'rate'
+    assert header_role('Total (OMR)') == 'amount'
+    assert header_role('Item Description') == 'description'
+    assert header_role('Sl. No.') == 'itemCode'
+    assert header_role('UOM') == 'unit'
+    assert header_role('Remarks') is None
+
+
+def test_build_boq_from_table():
+    table = {
+        'headers': ['Sl. No.', 'Description', 'Qty.', 'Unit', 'U/Rate', 'Total (OMR)', 'Remarks'],
+        'rows': [
+            ['1', 'Excavation', '1,200', 'm3', '4.500', '5,400.000', 'by machine'],
+            ['2', 'Blockwork', '', 'm2', 'rate only', '(10)'],
+        ],
+        'description': None,
+    }
+    boqs = build_mock_boq_from_tables([table, {'headers': ['A', 'B'], 'rows': [['x', 'y']]}])
+    assert len(boqs) == 1
+    first, second = boqs[0].items
+    assert (first.itemCode, first.quantity, first.unit, first.rate, first.amount) == ('1', 1200.0, 'm3', 4.5, 5400.0)
+    assert first.description == 'Excavation by machine'
+    assert round(first.confidence, 2) == 0.9
+    assert (second.quantity, second.rate, second.amount) == (0.0, 0.0, -10.0)
+    assert round(second.confidence, 2) == 0.3
+    # the result serializes like a validated model
+    assert boqs[0].model_dump()['items'][0]['unit'] == 'm3'
+
+
+def test_custom_synonyms(tmp_path, monkeypatch):
+    path = tmp_path / 'synonyms.json'
+    path.write_text(json.dumps({'quantity': ['Menge']}))
+    monkeypatch.setenv('PY_BOQ_SYNONYMS', str(path))
+    synonym_table.cache_clear()
+    try:
+        assert header_role('Menge') == 'quantity'
+    finally:
+        monkeypatch.delenv('PY_BOQ_SYNONYMS')
+        synonym_table.cache_clear()
+
+
+def test_decimal_comma_document_and_units_in_quantity():
+    table = {
+        'headers': ['Item', 'Description', 'Qty', 'Unit', 'Rate', 'Amount'],
+        'rows': [
+            ['1', 'Plaster', '1.250 m2', '', '4,50', '5.625,00'],
+            ['2', 'Skirting', '300', 'lm', '12,00', '3.600,00'],
+        ],
+    }
+    first, second = build_mock_boq_from_tables([table])[0].items
+    assert (first.quantity, first.unit, first.rate, first.amount) == (1250.0, 'm2', 4.5, 5625.0)
+    assert (second.quantity, second.unit, second.amount) == (300.0, 'lm', 3600.0)
@@ -0,0 +1,40 @@
+from app.cache import ResultCache, digest_bytes
+
+
+def test_key_depends_on_mode_and_content():
+    d1, d2 = digest_bytes(b'a'), digest_bytes(b'b')
+    assert ResultCache.key(d1, 'mock') != ResultCache.key(d1, 'tgi')
+    assert ResultCache.key(d1, 'mock') != ResultCache.key(d2, 'mock')
+    assert ResultCache.key(d1, 'mock') == ResultCache.key(digest_bytes(b'a'), 'mock')
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_bytes=10, path=None)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    assert cache.get('a') == b'12345'  # 'a' is now most recent
+    cache.put('c', b'12345')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'12345'
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['memoryBytes'] == 10
+    assert stats['hits'] == 2 and stats['misses'] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    ResultCache(max_bytes=0, path=path).put('k', b'{"tables":null}')
+    cache = ResultCache(max_bytes=1024, path=path)
+    assert cache.get('k') == b'{"tables":null}'
+    assert cache.stats()['diskHits'] == 1
+    # promoted into the memory tier
+    assert cache.stats()['memoryEntries'] == 1
+
+
+def test_disk_tier_respects_byte_budget(tmp_path):
+    cache = ResultCache(max_bytes=0, path=str(tmp_path / 'c.sqlite3'), disk_max_bytes=8)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    assert cache.get('a') is None
+    assert cache.get('b') == b'12345'
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.chunking import estimate_tokens, merge_extracted, run_chunks, split_text_chunks
+from app.schemas import ExtractedData
+from app.upstream import tgi_upstream
+from tests.test_pages import make_multipage_pdf
+
+
+def table(headers, rows):
+    return {'headers': headers, 'rows': rows, 'description': None}
+
+
+def test_chunks_respect_budget_and_prefer_page_breaks():
+    pages = ['\n'.join(f'line {p}.{i} ' + 'x' * 30 for i in range(20)) for p in range(5)]
+    text = '\f'.join(pages)
+    chunks = split_text_chunks(text, max_tokens=250)
+    assert all(estimate_tokens(c) <= 250 for c in chunks)
+    # nothing is lost
+    assert sum(c.count('line ') for c in chunks) == 100
+    # a whole page fits, so pages are never cut in the middle
+    assert all(c.count('line ') % 20 == 0 for c in chunks)
+
+
+def test_oversized_region_is_split_on_lines():
+    chunks = split_text_chunks('\n'.join('y' * 50 for _ in range(10)), max_tokens=30)
+    assert len(chunks) > 1
+    assert all(len(c) <= 120 for c in chunks)
+
+
+def test_merge_joins_tables_continued_across_chunks():
+    a = ExtractedData(tables=[table(['Item', 'Qty'], [['1', '2']])])
+    b = ExtractedData(tables=[table(['Item', 'Qty'], [['2', '3']])], prices=['10'])
+    merged = merge_extracted([a, None, b])
+    assert len(merged.tables) == 2  # a failed chunk in between breaks the continuation
+    merged = merge_extracted([a, b])
+    assert merged.tables[0].rows == [['1', '2'], ['2', '3']]
+    assert merged.prices == ['10']
+
+
+def test_only_failed_chunks_are_retried():
+    calls = {}
+
+    async def call(chunk):
+        calls[chunk] = calls.get(chunk, 0) + 1
+        if chunk == 'flaky' and calls[chunk] == 1:
+            raise ValueError('truncated JSON')
+        if chunk == 'broken':
+            raise ValueError('never parses')
+        return ExtractedData(prices=[chunk])
+
+    run = asyncio.run(run_chunks(['ok', 'flaky', 'broken'], call, concurrency=2, max_retries=2, backoff=0.001))
+    assert calls == {'ok': 1, 'flaky': 2, 'broken': 3}
+    assert run.failed == 1
+    assert run.merged().prices == ['ok', 'flaky']
+    assert run.report()['retries'] == 3
+
+
+class EchoTGI(BaseHTTPRequestHandler):
+    """Fake TGI: turns every 'Item on page N' line of the prompt into a table row."""
+
+    def do_POST(self):
+        prompt = json.loads(self.rfile.read(int(self.headers['Content-Length'])))['inputs']
+        rows = [[ln.split(',')[1]] for ln in prompt.splitlines() if 'Item on page' in ln]
+        self.server.prompts.append(prompt)
+        body = json.dumps({'generated_text': json.dumps({'tables': [table(['Description'], rows)]})}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_tgi_mode_sends_one_request_per_chunk(tmp_path, monkeypatch):
+    from app.main import extract_with_tgi
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoTGI)
+    server.prompts = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('PY_TGI_ENDPOINT', f'http://127.0.0.1:{server.server_address[1]}/generate')
+    monkeypatch.setenv('PY_LLM_CHUNK_TOKENS', '20')
+    pdf_path = tmp_path / 'tender.pdf'
+    make_multipage_pdf(pdf_path, pages=4)
+
+    async def go():
+        try:
+            return await extract_with_tgi(pdf_path.read_bytes())
+        finally:
+            await tgi_upstream.aclose()
+
+    try:
+        result, cacheable = asyncio.run(go())
+    finally:
+        server.shutdown()
+    assert cacheable
+    assert len(server.prompts) == 4
+    assert result['tables'][0]['rows'] == [[f'Item on page {p}'] for p in range(1, 5)]
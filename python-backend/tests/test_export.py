@@ -0,0 +1,76 @@
+import io
+import re
+import zipfile
+from xml.dom import minidom
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.export import iter_csv, iter_xlsx, sheets_for
+from app.responses import to_columnar
+from benchmarks.corpus import ruled_boq_pdf
+from benchmarks.run import data_uri
+
+CONTENT = {
+    'tables': [{'headers': ['Ref', 'Note'], 'rows': [['1', 'Tiles & <grout>'], ['2', 'bad\x01char']], 'description': 'Page 1/2: notes'}],
+    'boqs': [
+        {'title': 'Bill 1', 'items': [
+            {'itemCode': '1', 'description': 'Concrete', 'quantity': 2.0, 'unit': 'm3', 'rate': 10.0, 'amount': 20.0},
+            {'itemCode': '2', 'description': 'Blockwork', 'quantity': 5, 'unit': 'm2', 'rate': 4, 'amount': 20.5},
+        ]},
+        {'title': 'Bill 1', 'items': []},
+    ],
+}
+
+
+def workbook(data: bytes) -> zipfile.ZipFile:
+    zf = zipfile.ZipFile(io.BytesIO(data))
+    assert zf.testzip() is None
+    for name in zf.namelist():
+        minidom.parseString(zf.read(name))  # every part is well-formed XML
+    return zf
+
+
+def test_xlsx_has_a_sheet_per_table_and_boq_with_typed_cells_and_totals():
+    chunks = list(iter_xlsx(sheets_for(CONTENT), rows_per_batch=1))
+    assert len(chunks) > 3  # streamed, not built in one piece
+    zf = workbook(b''.join(chunks))
+    names = re.findall(r'<sheet name="([^"]*)"', zf.read('xl/workbook.xml').decode())
+    assert names == ['Page 1 2 notes', 'Bill 1', 'Bill 1 (2)']
+    table = zf.read('xl/worksheets/sheet1.xml').decode()
+    assert 'Tiles &amp; &lt;grout&gt;' in table and '\x01' not in table
+    boq = zf.read('xl/worksheets/sheet2.xml').decode()
+    assert '<c r="C2" s="2"><v>2.0</v></c>' in boq and '<c r="F3" s="2"><v>20.5</v></c>' in boq
+    assert '<f>SUM(F2:F3)</f><v>40.5</v>' in boq
+    assert '<f>0</f><v>0.0</v>' in zf.read('xl/worksheets/sheet3.xml').decode()
+    quoted = workbook(b''.join(iter_xlsx(sheets_for({'tables': [dict(CONTENT['tables'][0], description='Schedule "A" rates')]}))))
+    assert re.findall(r'<sheet name="([^"]*)"', quoted.read('xl/workbook.xml').decode()) == ['Schedule &quot;A&quot; rates']
+    # the columnar response format exports the same workbook
+    assert b''.join(iter_xlsx(sheets_for(to_columnar(CONTENT)))) == b''.join(iter_xlsx(sheets_for(CONTENT)))
+
+
+def test_csv_sections():
+    text = b''.join(iter_csv(sheets_for(CONTENT))).decode('utf-8-sig')
+    sections = text.split('\r\n\r\n')
+    assert len(sections) == 3
+    assert sections[1].splitlines() == ['Bill 1', 'Item,Description,Quantity,Unit,Rate,Amount',
+                                        '1,Concrete,2.0,m3,10.0,20.0', '2,Blockwork,5,m2,4,20.5', 'Total,,,,,40.5']
+
+
+def test_export_endpoints():
+    pdf = ruled_boq_pdf(2, 5, seed=24)
+    with TestClient(main.app) as client:
+        result_id = client.post('/extract', json={'fileDataUri': data_uri(pdf, 'application/pdf')}).headers['x-result-id']
+        xlsx = client.get(f'/export/{result_id}')
+        csv_one = client.get(f'/export/{result_id}', params={'format': 'csv', 'sheet': 2})
+        posted = client.post('/export', params={'format': 'csv'}, json=CONTENT)
+        missing = client.get('/export/nope')
+        bad_format = client.get(f'/export/{result_id}', params={'format': 'ods'})
+        bad_sheet = client.get(f'/export/{result_id}', params={'sheet': 9})
+    assert xlsx.status_code == 200 and xlsx.headers['content-type'].startswith('application/vnd.openxmlformats')
+    assert 'attachment' in xlsx.headers['content-disposition']
+    assert len(workbook(xlsx.content).namelist()) == 7  # one table and one BOQ
+    lines = csv_one.content.decode('utf-8-sig').splitlines()
+    assert lines[0] == 'Item,Description,Quantity,Unit,Rate,Amount' and len(lines) == 12 and lines[-1].startswith('Total,')
+    assert 'Tiles & <grout>' in posted.text
+    assert (missing.status_code, bad_format.status_code, bad_sheet.status_code) == (404, 400, 400)
@@ -0,0 +1,64 @@
+import asyncio
+import base64
+import time
+
+import httpx
+
+from app.jobs import JobQueue
+from tests.test_pages import make_multipage_pdf
+
+
+def test_queue_claims_in_order_and_requeues_after_restart(tmp_path):
+    queue = JobQueue(directory=str(tmp_path))
+    queue.submit('a', 'mock', 'd1', 10)
+    queue.submit('b', 'mock', 'd2', 10)
+    assert queue.claim()['id'] == 'a'
+    queue.add_page('a', 0, [{'headers': ['x'], 'rows': [], 'description': None}], [])
+    assert queue.get('a')['pages_done'] == 1
+
+    restarted = JobQueue(directory=str(tmp_path))
+    assert restarted.requeue_running() == 1
+    assert restarted.get('a')['status'] == 'queued'
+    assert restarted.pages('a') == []
+    assert restarted.claim()['id'] == 'a'
+    assert restarted.claim()['id'] == 'b'
+    assert restarted.claim() is None
+
+
+def test_finished_jobs_expire(tmp_path):
+    queue = JobQueue(directory=str(tmp_path), ttl=0.01)
+    queue.submit('a', 'mock', 'd', 1)
+    assert queue.claim()['id'] == 'a'
+    assert queue.finish('a', b'{}')
+    assert not queue.cancel('a')  # already finished
+    time.sleep(0.02)
+    assert queue.get('a') is None
+    assert queue.purge_expired() == 1
+
+
+def test_job_api_roundtrip(tmp_path):
+    pdf_path = tmp_path / 'job.pdf'
+    make_multipage_pdf(pdf_path, pages=3)
+    data_uri = 'data:application/pdf;base64,' + base64.b64encode(pdf_path.read_bytes()).decode('utf-8')
+
+    async def go():
+        async with httpx.AsyncClient(base_url='http://localhost:8000', timeout=30.0) as client:
+            created = await client.post('/jobs', json={'fileDataUri': data_uri})
+            assert created.status_code == 202
+            job_id = created.json()['id']
+            for _ in range(100):
+                job = (await client.get(f'/jobs/{job_id}')).json()
+                if job['status'] not in ('queued', 'running'):
+                    break
+                await asyncio.sleep(0.1)
+            direct = (await client.post('/extract', json={'fileDataUri': data_uri})).json()
+            cancel = await client.delete(f'/jobs/{job_id}')
+            missing = await client.get('/jobs/does-not-exist')
+            return job, direct, cancel, missing
+
+    job, direct, cancel, missing = asyncio.run(go())
+    assert job['status'] == 'done'
+    assert job['progress'] == {'pagesDone': 3, 'pagesTotal': 3}
+    assert job['result'] == direct
+    assert cancel.status_code == 409
+    assert missing.status_code == 404
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.jsonstream import ExtractionStream, parse_extracted
+from app.metrics import metrics
+from app.upstream import tgi_upstream
+
+ANSWER = {
+    'tables': [{'headers': ['Item', 'Description'], 'rows': [['1', 'Concrete {C30}'], ['2', 'Say "hello" \\ bye']]}],
+    'boqs': [{'title': 'Bill 1', 'items': [
+        {'description': 'Concrete', 'quantity': 2, 'unit': 'm3', 'rate': 10, 'amount': 20},
+        {'description': 'Blockwork', 'quantity': 5, 'unit': 'm2', 'rate': 4, 'amount': 20},
+    ]}],
+}
+
+
+def test_objects_are_yielded_as_they_close_and_parsing_stops_at_the_end():
+    text = 'Sure {see below}:\n```json\n' + json.dumps(ANSWER) + '\n```\nAnything else? {"tables": []}'
+    stream, events = ExtractionStream(), []
+    for i in range(0, len(text), 3):
+        events += [(kind, boq, i) for kind, boq, _ in stream.feed(text[i:i + 3])]
+        if stream.done:
+            break
+    assert [(kind, boq) for kind, boq, _ in events] == [('table', None), ('item', 0), ('item', 0), ('boq', 0)]
+    # the table was complete long before the last item
+    assert events[0][2] < events[2][2] < len(text) - 30
+    data = stream.result()
+    assert data.tables[0].rows[1] == ['2', 'Say "hello" \\ bye']
+    assert [i.description for i in data.boqs[0].items] == ['Concrete', 'Blockwork']
+
+
+def test_truncated_answers_keep_only_complete_tables_and_items():
+    full = json.dumps(ANSWER)
+    for cut in range(full.index('"boqs"'), len(full)):
+        data = parse_extracted(full[:cut])
+        assert data.tables[0].rows == ANSWER['tables'][0]['rows']
+        for item in (data.boqs[0].items if data.boqs else []):
+            assert item.amount == 20
+    assert len(parse_extracted(full[:-4]).boqs[0].items) == 2
+    assert len(parse_extracted(full[:-5]).boqs[0].items) == 1
+    assert parse_extracted('{"tables": [{"headers": ["a"], "rows": [["1"],],},]}').tables[0].rows == [['1']]
+    with pytest.raises(ValueError):
+        parse_extracted('{"tables": [{"headers": ["a"], "ro')
+
+
+class StreamingTGI(BaseHTTPRequestHandler):
+    """Fake TGI /generate_stream: the answer token by token, then a long tail of chatter."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.server.paths.append(self.path)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        text = json.dumps(ANSWER)
+        tokens = [text[i:i + 8] for i in range(0, len(text), 8)] + [' more words'] * 200
+        try:
+            for token in tokens:
+                self.wfile.write(f'data:{json.dumps({"token": {"text": token, "special": False}})}\n\n'.encode())
+                self.wfile.flush()
+                self.server.sent += 1
+                time.sleep(0.002)
+        except OSError:
+            pass  # the client hung up
+
+    def log_message(self, *args):
+        pass
+
+
+def test_tgi_stream_is_closed_once_the_answer_is_complete(monkeypatch):
+    from app.main import tgi_extract_chunk
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StreamingTGI)
+    server.paths, server.sent = [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('PY_TGI_ENDPOINT', f'http://127.0.0.1:{server.server_address[1]}/generate')
+
+    async def go():
+        try:
+            return await tgi_extract_chunk('text')
+        finally:
+            await tgi_upstream.aclose()
+
+    try:
+        data = asyncio.run(go())
+        time.sleep(0.05)
+    finally:
+        server.shutdown()
+    assert server.paths == ['/generate_stream']
+    assert len(data.boqs[0].items) == 2
+    assert 'stage="llm_first_object"' in metrics.render()
+    assert server.sent < len(json.dumps(ANSWER)) // 8 + 100
@@ -0,0 +1,96 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.metrics import Metrics, collect_stages, count_extraction, metrics, produced, request_timings, stage
+from app.workers import WorkerPool
+
+
+def staged_work(n: int, found: bool = True) -> int:
+    with stage('pdf_tables'):
+        total = sum(range(n))
+    with stage('text_fallback'):
+        if found:
+            produced('text')
+    return total
+
+
+def extractions(path: str) -> float:
+    return metrics._counters['estim_extractions_total'].get((('mode', 'mock'), ('path', path)), 0.0)
+
+
+def test_render_prometheus_text():
+    m = Metrics()
+    m.describe('demo_seconds', 'histogram', 'Demo.')
+    m.observe('demo_seconds', 0.02, stage='ocr')
+    m.observe('demo_seconds', 3.0, stage='ocr')
+    m.inc('demo_total', path='a"b')
+    text = m.render([('demo_gauge', 'gauge', 'A gauge.', 2)])
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="ocr",le="0.025"} 1' in text
+    assert 'demo_seconds_bucket{stage="ocr",le="+Inf"} 2' in text
+    assert 'demo_seconds_count{stage="ocr"} 2' in text
+    assert 'demo_total{path="a\\"b"} 1' in text
+    assert 'demo_gauge 2' in text
+
+
+def test_stages_from_worker_calls_reach_the_request():
+    pool = WorkerPool(workers=0)
+
+    async def scenario(found):
+        with request_timings('mock') as timings:
+            assert await pool.run(staged_work, 10, found) == 45
+            count_extraction('mock', timings)
+        return timings
+
+    before = extractions('text'), extractions('tables')
+    try:
+        timings = asyncio.run(scenario(True))
+        # the text fallback ran but found nothing: the result did not come from it
+        asyncio.run(scenario(False))
+    finally:
+        pool.shutdown()
+    names = [name for name, _ in timings.stages]
+    assert names == ['pool_wait', 'pdf_tables', 'text_fallback']
+    assert timings.produced == {'text'}
+    assert 'pdf_tables;dur=' in timings.server_timing()
+    assert (extractions('text'), extractions('tables')) == (before[0] + 1, before[1] + 1)
+
+
+def test_collect_stages_buffers_instead_of_recording():
+    with collect_stages() as buffer:
+        with stage('ocr'):
+            pass
+    assert [name for name, _ in buffer] == ['ocr']
+
+
+def test_metrics_endpoint_and_server_timing(monkeypatch, tmp_path):
+    monkeypatch.setenv('PY_SERVER_TIMING', '1')
+    monkeypatch.setenv('PY_PROFILE_THRESHOLD_MS', '0')
+    monkeypatch.setenv('PY_PROFILE_INTERVAL_MS', '1')
+    monkeypatch.setenv('PY_PROFILE_DIR', str(tmp_path))
+    from app.main import app
+    from benchmarks.corpus import text_boq_pdf
+    from benchmarks.run import data_uri
+
+    with TestClient(app) as client:
+        resp = client.post('/extract', params={'cache': 'false'}, json={'fileDataUri': data_uri(text_boq_pdf(1, 3), 'application/pdf')})
+        assert resp.status_code == 200
+        timing = resp.headers['server-timing']
+        assert 'decode;dur=' in timing and 'pdf_tables;dur=' in timing and 'total;dur=' in timing
+        body = client.get('/metrics').text
+    assert 'estim_request_seconds_count{handler="extract",method="POST"' in body
+    assert 'estim_stage_seconds_count{mode="mock",stage="boq"}' in body
+    assert 'estim_pool_in_flight' in body
+    assert any(p.name.endswith('.folded') for p in tmp_path.iterdir())
+
+
+def test_genai_extractions_are_counted(monkeypatch):
+    from app.main import app
+
+    monkeypatch.delenv('PY_GENAI_ENDPOINT', raising=False)
+    before = metrics._counters['estim_extractions_total'].get((('mode', 'genai'), ('path', 'error')), 0.0)
+    with TestClient(app) as client:
+        resp = client.post('/extract', params={'mode': 'genai'}, json={'fileDataUri': 'data:application/pdf;base64,JVBERg=='})
+    assert resp.status_code == 502
+    assert metrics._counters['estim_extractions_total'][(('mode', 'genai'), ('path', 'error'))] == before + 1
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from app.main import llama_json_extract
+from app.models import ModelLoadError, ModelRegistry, load_llama
+
+
+class FakeLlama:
+    """Stand-in for llama_cpp.Llama: answers every prompt with a fixed JSON object."""
+    loads = 0
+
+    def __init__(self, model_path):
+        FakeLlama.loads += 1
+        self.model_path = model_path
+
+    def __call__(self, prompt, stream=False):
+        text = json.dumps({'tables': [{'headers': ['a'], 'rows': [['1']], 'description': None}]})
+        if stream:
+            return ({'choices': [{'text': text[i:i + 4]}]} for i in range(0, len(text), 4))
+        return {'choices': [{'text': text}]}
+
+
+def test_model_is_loaded_once_and_reused(tmp_path):
+    model_path = str(tmp_path / 'stand-in.gguf')
+    FakeLlama.loads = 0
+    registry = ModelRegistry(loader=FakeLlama, instances=1, idle_timeout=0)
+
+    async def go():
+        async def one():
+            async with registry.acquire(model_path) as llm:
+                return await asyncio.to_thread(llama_json_extract, llm, 'text')
+        return await asyncio.gather(*(one() for _ in range(4)))
+
+    results = asyncio.run(go())
+    assert all(r.tables[0].rows == [['1']] for r in results)
+    assert FakeLlama.loads == 1
+    loaded = registry.stats()['loaded'][0]
+    assert loaded['uses'] == 4 and loaded['instances'] == 1 and len(loaded['loadSeconds']) == 1
+
+
+def test_pool_grows_to_configured_instances_under_concurrency(tmp_path):
+    registry = ModelRegistry(loader=FakeLlama, instances=2, idle_timeout=0)
+    model_path = str(tmp_path / 'm.gguf')
+
+    async def go():
+        async with registry.acquire(model_path) as a:
+            async with registry.acquire(model_path) as b:
+                return a is not b
+
+    assert asyncio.run(go())
+    assert registry.stats()['loaded'][0]['instances'] == 2
+
+
+def test_idle_models_are_unloaded(tmp_path):
+    registry = ModelRegistry(loader=FakeLlama, instances=1, idle_timeout=0.01)
+    model_path = str(tmp_path / 'm.gguf')
+
+    async def go():
+        async with registry.acquire(model_path):
+            assert registry.unload_idle() == []  # busy models stay
+        await asyncio.sleep(0.02)
+        return registry.unload_idle()
+
+    assert asyncio.run(go()) == [model_path]
+    assert registry.stats()['loaded'] == []
+
+
+def test_default_loader_reports_missing_model(tmp_path):
+    with pytest.raises(ModelLoadError):
+        load_llama(str(tmp_path / 'missing.gguf'))
+
+
+def test_failed_preload_is_reported_in_stats(tmp_path):
+    registry = ModelRegistry(instances=1, idle_timeout=0)
+    with pytest.raises(ModelLoadError):
+        asyncio.run(registry.preload(str(tmp_path / 'missing.gguf')))
+    assert registry.stats()['preloadError'].startswith('ModelLoadError')
@@ -0,0 +1,127 @@
+import io
+import shutil
+
+import pdfplumber
+import pytest
+import pytesseract
+from PIL import Image
+
+from app import ocr
+from app.boq import build_mock_boq_from_tables
+from app.layout import chars_to_lines, column_boundaries, group_lines, words_to_table
+from app.main import extract_tables_from_page
+from reportlab.pdfgen import canvas
+
+from benchmarks.corpus import HEADERS, noisy_boq_image, ruled_boq_pdf
+
+
+def pdf_words(pages_rows=6):
+    with pdfplumber.open(io.BytesIO(ruled_boq_pdf(1, pages_rows))) as pdf:
+        return pdf.pages[0].extract_words()
+
+
+def test_words_to_table_rebuilds_columns():
+    table = words_to_table(pdf_words(), 'scan')
+    assert table['headers'] == HEADERS
+    assert len(table['rows']) == 6
+    item = build_mock_boq_from_tables([table])[0].items[0]
+    assert item.quantity > 0 and item.rate > 0 and item.unit != '-'
+
+
+def test_lines_tolerate_baseline_jitter_and_titles():
+    words = [
+        {'text': 'Bill', 'x0': 0, 'x1': 20, 'top': 0, 'bottom': 10},
+        {'text': 'No.', 'x0': 24, 'x1': 40, 'top': 0, 'bottom': 10},
+        {'text': 'Description', 'x0': 0, 'x1': 60, 'top': 20, 'bottom': 30},
+        {'text': 'Qty', 'x0': 100, 'x1': 120, 'top': 21, 'bottom': 31},
+        {'text': 'Concrete', 'x0': 0, 'x1': 45, 'top': 40.5, 'bottom': 50},
+        {'text': 'works', 'x0': 49, 'x1': 75, 'top': 40, 'bottom': 50},
+        {'text': '12', 'x0': 105, 'x1': 118, 'top': 39.6, 'bottom': 49.5},
+    ]
+    lines = group_lines(words)
+    assert [len(l) for l in lines] == [2, 2, 3]
+    assert len(column_boundaries(lines)) == 1
+    table = words_to_table(words)
+    assert table['headers'] == ['Description', 'Qty']
+    assert table['rows'] == [['Concrete works', '12']]
+    assert table['description'] == 'Bill No.'
+
+
+def test_chars_merge_into_words_without_space_chars():
+    def char(text, x0, top, size=10):
+        return {'text': text, 'x0': x0, 'x1': x0 + 6, 'top': top, 'bottom': top + size, 'size': size}
+
+    # sub-point baseline jitter, no space characters; words are split by the measured gap
+    chars = [char(c, 6 * i, 100 + (i % 2) * 0.4) for i, c in enumerate('Pile')]
+    chars += [char(c, 40 + 6 * i, 100.3) for i, c in enumerate('caps')]
+    chars += [char(c, 6 * i, 114) for i, c in enumerate('12')]
+    lines = chars_to_lines(chars)
+    assert [[w['text'] for w in line] for line in lines] == [['Pile', 'caps'], ['12']]
+
+
+def test_unruled_pdf_page_keeps_columns():
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    c.drawString(50, 800, 'Bill No. 3 - Substructure')
+    rows = [HEADERS] + [[str(k), f'Concrete grade C{k}0', str(k * 3), 'm3', '1,250.00', f'{k * 3750:,.2f}'] for k in range(1, 8)]
+    for i, row in enumerate(rows):
+        for x, cell in zip((50, 90, 300, 350, 400, 470), row):
+            c.drawString(x, 770 - i * 14, cell)
+    c.save()
+    with pdfplumber.open(io.BytesIO(buf.getvalue())) as pdf:
+        table = extract_tables_from_page(pdf.pages[0])[0]
+    assert table['headers'] == HEADERS
+    assert table['rows'][0] == ['1', 'Concrete grade C10', '3', 'm3', '1,250.00', '3,750.00']
+    assert table['description'].endswith('Bill No. 3 - Substructure')
+
+
+def test_prepare_image_downscales_and_binarizes():
+    im = Image.new('RGB', (3000, 1000), 'white')
+    im.paste((40, 40, 40), (100, 100, 400, 200))
+    im.info['dpi'] = (600, 600)
+    prepared, scale = ocr.prepare_image(im, target_dpi=300)
+    assert scale == 0.5 and prepared.size == (1500, 500)
+    assert set(prepared.getdata()) <= {0, 255}
+
+
+def test_tiles_cover_page_once():
+    boxes = ocr.tile_boxes(5000, 3000, tile=2000, overlap=50)
+    assert len(boxes) == 6
+    area = sum((c[2] - c[0]) * (c[3] - c[1]) for _, c in boxes)
+    assert area == 5000 * 3000
+    assert ocr.tile_boxes(800, 600, tile=2000) == [((0, 0, 800, 600), (0, 0, 800, 600))]
+
+
+def test_tiled_ocr_keeps_each_word_once(monkeypatch):
+    # a fake engine that "sees" one word per 100 px grid cell of whatever crop it gets
+    def fake_image_to_data(crop, lang=None, config=None, output_type=None):
+        data = {k: [] for k in ('text', 'conf', 'left', 'top', 'width', 'height')}
+        x_off, y_off = crop.info['offset']
+        for gx in range(0, 1000, 100):
+            for gy in range(0, 600, 100):
+                left, top = gx - x_off, gy - y_off
+                if 0 <= left and left + 40 <= crop.width and 0 <= top and top + 20 <= crop.height:
+                    for key, value in zip(('text', 'conf', 'left', 'top', 'width', 'height'), (f'{gx}:{gy}', 90, left, top, 40, 20)):
+                        data[key].append(value)
+        return data
+
+    im = Image.new('L', (1000, 600), 255)
+    original_crop = Image.Image.crop
+
+    def crop(self, box=None):
+        out = original_crop(self, box)
+        out.info['offset'] = box[:2]
+        return out
+
+    monkeypatch.setattr(Image.Image, 'crop', crop)
+    monkeypatch.setattr(pytesseract, 'image_to_data', fake_image_to_data)
+    monkeypatch.setenv('PY_OCR_TILE_PX', '300')
+    words = ocr.ocr_words(im, threads=3)
+    assert sorted(w['text'] for w in words) == sorted(f'{x}:{y}' for x in range(0, 1000, 100) for y in range(0, 600, 100))
+
+
+@pytest.mark.skipif(shutil.which('tesseract') is None, reason='tesseract not installed')
+def test_scanned_boq_yields_items():
+    tables = ocr.ocr_tables(Image.open(io.BytesIO(noisy_boq_image(8, rotation=0, noise=0))))
+    boqs = build_mock_boq_from_tables(tables)
+    assert boqs and len(boqs[0].items) >= 6
@@ -44,3 +44,36 @@ def test_pdf_table_extraction(tmp_path):
     data = res.json()
     # We expect at least one table or BOQ produced
     assert data.get('tables') or data.get('boqs')
+
+
+def test_repeat_extraction_is_cached(tmp_path):
+    pdf_path = tmp_path / 'cached.pdf'
+    make_simple_pdf(pdf_path)
+    data_uri = 'data:application/pdf;base64,' + base64.b64encode(pdf_path.read_bytes()).decode('utf-8')
+    first = asyncio.run(post_extract(data_uri, mode='mock'))
+    second = asyncio.run(post_extract(data_uri, mode='mock'))
+    assert first.status_code == 200 and second.status_code == 200
+    assert second.headers.get('x-cache') == 'hit'
+    assert second.json() == first.json()
+
+
+def test_raw_upload_matches_json_endpoint(tmp_path):
+    pdf_path = tmp_path / 'upload.pdf'
+    make_simple_pdf(pdf_path)
+    b = pdf_path.read_bytes()
+
+    async def go():
+        async with httpx.AsyncClient() as client:
+            raw = await client.post('http://localhost:8000/extract/upload?mode=mock&cache=false', content=b,
+                                    headers={'Content-Type': 'application/pdf'}, timeout=30.0)
+            multipart = await client.post('http://localhost:8000/extract/upload?mode=mock', files={'file': ('upload.pdf', b, 'application/pdf')}, timeout=30.0)
+            return raw, multipart
+
+    raw, multipart = asyncio.run(go())
+    assert raw.status_code == 200 and multipart.status_code == 200
+    assert raw.json().get('tables')
+    assert multipart.json() == raw.json()
+    # same bytes hash to the same result id regardless of transport
+    assert raw.headers['x-result-id'] == multipart.headers['x-result-id']
+    data_uri = 'data:application/pdf;base64,' + base64.b64encode(b).decode('utf-8')
+    assert asyncio.run(post_extract(data_uri)).headers['x-result-id'] == raw.headers['x-result-id']
@@ -0,0 +1,66 @@
+import asyncio
+from pathlib import Path
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+from app.main import extract_tables_from_pdf_bytes, extract_tables_parallel
+from app.pages import merge_page_tables, split_page_ranges
+
+HEADERS = ['Item', 'Description', 'Quantity', 'Unit', 'Rate', 'Amount']
+
+
+def make_multipage_pdf(path: Path, pages: int = 3):
+    c = canvas.Canvas(str(path), pagesize=letter)
+    for p in range(pages):
+        c.drawString(100, 700, ','.join(HEADERS))
+        c.drawString(100, 680, f'{p + 1},Item on page {p + 1},2,Nos,10,20')
+        c.showPage()
+    c.save()
+
+
+def test_split_page_ranges_covers_document():
+    ranges = split_page_ranges(25, workers=2, min_pages=4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 25
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    assert split_page_ranges(3, workers=8, min_pages=4) == [(0, 3)]
+    assert split_page_ranges(0, workers=4) == []
+
+
+def test_merge_stitches_repeated_headers_in_page_order():
+    t = lambda rows: {'headers': HEADERS, 'rows': rows, 'description': None}
+    other = {'headers': ['A', 'B'], 'rows': [['x', 'y']], 'description': None}
+    pages = [(2, [t([['3']])]), (0, [t([['1']])]), (1, [t([['2']]), other])]
+    merged = merge_page_tables(pages)
+    # page 1's table continues page 0, but `other` ends page 1 so page 2 starts a new table
+    assert [m['rows'] for m in merged] == [[['1'], ['2']], [['x', 'y']], [['3']]]
+
+
+def test_multipage_pdf_is_stitched(tmp_path):
+    pdf_path = tmp_path / 'boq.pdf'
+    make_multipage_pdf(pdf_path, pages=3)
+    b = pdf_path.read_bytes()
+    tables = extract_tables_from_pdf_bytes(b)
+    assert len(tables) == 1
+    assert [r[0] for r in tables[0]['rows']] == ['1', '2', '3']
+    parallel = asyncio.run(extract_tables_parallel(b))
+    assert parallel == tables
+
+
+def test_merge_drops_repeated_headers_forward_rows_and_duplicates():
+    spelled = ['ITEM', 'Description', 'Quantity.', 'Unit', 'Rate', 'Amount']
+    page0 = {'headers': HEADERS, 'rows': [['1', 'Excavation', '10', 'm3', '5', '50'], ['', 'Carried forward', '', '', '', '50']], 'description': None}
+    page1 = {'headers': spelled, 'rows': [['', 'Brought forward', '', '', '', '50'], ['2', 'Backfill', '4', 'm3', '5', '20']], 'description': None}
+    # no header row on page 2: pdfplumber takes the first item as headers
+    page2 = {'headers': ['3', 'Blinding', '2', 'm3', '7', '14'], 'rows': [HEADERS, ['4', 'Footings', '1', 'm3', '9', '9']], 'description': None}
+    other = {'headers': ['A', 'B'], 'rows': [['x', 'y']], 'description': None}
+    merged = merge_page_tables([(0, [page0]), (1, [page1]), (2, [page2, other, dict(other)])])
+    assert [r[0] for r in merged[0]['rows']] == ['1', '2', '3', '4']
+    assert len(merged) == 2 and merged[1]['rows'] == [['x', 'y']]
+
+
+def test_merge_keeps_identical_tables_on_pages_apart():
+    schedule = {'headers': ['Ref', 'Note'], 'rows': [['a', 'General conditions apply']], 'description': None}
+    filler = {'headers': ['X', 'Y', 'Z'], 'rows': [['1', '2', '3']], 'description': None}
+    merged = merge_page_tables([(0, [schedule]), (1, [dict(schedule)]), (2, [filler]), (3, [dict(schedule)])])
+    assert [t['headers'] for t in merged] == [['Ref', 'Note'], ['X', 'Y', 'Z'], ['Ref', 'Note']]
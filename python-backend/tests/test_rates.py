@@ -0,0 +1,76 @@
+import json
+import sqlite3
+
+from app import rates
+from app.main import build_extracted_data
+from app.rates import RateIndex, normalize_unit, rate_index, read_library
+
+LIBRARY = '''Code,Description,Unit,Rate
+C-101,Reinforced concrete grade 30 in foundations,m3,85.000
+C-102,Reinforced concrete grade 30 in suspended slabs,m3,92.500
+C-103,Reinforced concrete grade 30 in suspended slabs,m3,97.500
+B-201,Blockwork 200mm thick hollow blocks,m2,14.250
+B-202,Blockwork 100mm thick solid blocks,m2,11.000
+P-301,uPVC pipe 110mm dia including fittings,lm,6.750
+X-999,Waterproofing membrane to roof,m2,not priced
+'''
+
+
+def write_library(tmp_path):
+    path = tmp_path / 'rates.csv'
+    path.write_text(LIBRARY, encoding='utf-8')
+    return str(path)
+
+
+def test_search_ranks_by_similarity_and_unit(tmp_path):
+    index = RateIndex(*read_library(write_library(tmp_path)))
+    # the unpriced row is dropped; the two identical slab rows become one document at the median rate
+    assert len(index) == 6
+    (doc, score), *_ = index.search('RC grade 30 to suspended slab', 'cum')
+    assert index.descriptions[index.doc_entry[doc]].endswith('suspended slabs') and index.rate(doc) == 95.0
+    assert score > 0.5
+    hits = index.search('Blockwork 200 mm thick', 'm2', k=2)
+    assert index.suggestion(*hits[0]).code == 'B-201'
+    assert index.search('Landscaping and irrigation', 'm2') == []
+    assert normalize_unit('Sq.M') == normalize_unit('m²') == 'm2'
+
+
+def test_fill_rates_prices_unpriced_items(tmp_path, monkeypatch):
+    monkeypatch.setenv('PY_RATE_LIBRARY', write_library(tmp_path))
+    table = {
+        'headers': ['Item', 'Description', 'Qty', 'Unit'],
+        'rows': [['1', 'Reinforced concrete grade 30 in foundations', '10', 'm3'],
+                 ['2', 'Site clearance and grubbing', '1', 'sum']],
+        'description': None,
+    }
+    concrete, clearance = build_extracted_data([table])['boqs'][0]['items']
+    assert concrete['rate'] == 85.0 and concrete['amount'] == 850.0
+    assert concrete['suggestions'][0]['code'] == 'C-101' and concrete['suggestions'][0]['score'] > 0.5
+    monkeypatch.delenv('PY_RATE_LIBRARY')
+    # the similarity is in the suggestions; the extraction confidence is untouched
+    assert concrete['confidence'] == build_extracted_data([table])['boqs'][0]['items'][0]['confidence']
+    assert clearance['rate'] == 0.0 and clearance['suggestions'] is None
+
+
+def test_index_is_persisted_and_sqlite_libraries(tmp_path, monkeypatch):
+    path = write_library(tmp_path)
+    monkeypatch.setenv('PY_RATE_LIBRARY', path)
+    assert len(rate_index()) == 6
+    built = rate_index().search('Blockwork 200 mm thick', 'm2')
+    rates._load_index.cache_clear()
+
+    def no_rebuild(*args):
+        raise AssertionError('index rebuilt')
+
+    monkeypatch.setattr(rates, 'read_library', no_rebuild)
+    assert len(rate_index()) == 6
+    assert rate_index().search('Blockwork 200 mm thick', 'm2') == built
+    with open(path + '.idx', encoding='utf-8') as fh:
+        assert json.load(fh)['signature'][0] == rates.INDEX_VERSION  # plain JSON, not a pickle
+
+    db = tmp_path / 'rates.sqlite3'
+    with sqlite3.connect(db) as conn:
+        conn.execute('CREATE TABLE rates (code TEXT, description TEXT, unit TEXT, rate REAL)')
+        conn.execute("INSERT INTO rates VALUES ('S-1', 'Steel reinforcement bars', 'kg', 1.2)")
+    codes, descriptions, units, values = read_library(str(db))
+    assert codes == ['S-1'] and values == [1.2]
@@ -0,0 +1,46 @@
+import gzip
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.responses import choose_encoding, iter_compressed, iter_json, to_columnar
+from benchmarks.corpus import ruled_boq_pdf
+from benchmarks.run import data_uri
+
+
+def big_result(rows: int = 2500) -> dict:
+    table = {'headers': ['Item', 'Qty'], 'rows': [[str(i), str(i * 2)] for i in range(rows)], 'description': None}
+    item = {'itemCode': '1', 'description': 'Concrete', 'quantity': 2.0, 'unit': 'm3', 'rate': 5.0, 'amount': 10.0, 'confidence': 0.9}
+    return {'tables': [table], 'lists': None, 'boqs': [{'title': None, 'description': None, 'items': [item] * rows}]}
+
+
+def test_streamed_json_matches_and_compresses():
+    content = big_result()
+    assert json.loads(b''.join(iter_json(content))) == content
+    assert json.loads(gzip.decompress(b''.join(iter_compressed(iter_json(content), 'gzip')))) == content
+    columnar = to_columnar(content)['boqs'][0]
+    assert columnar['columns'][:3] == ['itemCode', 'description', 'quantity']
+    assert columnar['rows'][0][:3] == ['1', 'Concrete', 2.0] and 'items' not in columnar
+
+
+def test_choose_encoding():
+    assert choose_encoding('gzip, deflate') == 'gzip'
+    assert choose_encoding('gzip;q=0, identity') is None
+    assert choose_encoding('') is None
+
+
+def test_extract_negotiates_gzip_streams_and_caches(monkeypatch):
+    monkeypatch.setenv('PY_JSON_STREAM_ROWS', '3')
+    monkeypatch.setenv('PY_COMPRESS_MIN_BYTES', '0')
+    payload = {'fileDataUri': data_uri(ruled_boq_pdf(1, 8, seed=7), 'application/pdf')}
+    with TestClient(main.app) as client:
+        first = client.post('/extract', json=payload, headers={'Accept-Encoding': 'gzip'})
+        assert first.headers['content-encoding'] == 'gzip' and first.headers['x-cache'] == 'miss'
+        # streamed responses carry no Content-Length
+        assert 'content-length' not in first.headers
+        second = client.post('/extract', params={'format': 'columnar'}, json=payload)
+    assert second.headers['x-cache'] == 'hit'
+    assert len(first.json()['boqs'][0]['items']) == 8
+    boq = second.json()['boqs'][0]
+    assert len(boq['rows']) == 8 and boq['columns'][0] == 'itemCode'
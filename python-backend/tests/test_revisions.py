@@ -0,0 +1,81 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.revisions import cached_pages, page_diff, page_runs, pdf_page_fingerprints
+from app.workers import WorkerPool
+from benchmarks.corpus import ruled_boq_pdf
+from benchmarks.run import data_uri
+
+
+def test_page_diff_aligns_inserted_and_changed_pages():
+    diff = page_diff(['a', 'b', 'c', 'd'], ['a', 'x', 'b', 'c', 'e'])
+    assert diff['unchanged'] == 3
+    assert diff['added'] == [1] and diff['changed'] == [4] and diff['removed'] == []
+    assert page_diff(['a', 'b'], ['a'])['removed'] == [1]
+    assert page_runs([0, 1, 2, 5, 7, 8]) == [(0, 3), (5, 6), (7, 9)]
+
+
+def test_revision_reuses_unchanged_pages_and_reports_diff(monkeypatch):
+    original = ruled_boq_pdf(3, 5, seed=21)
+    # the same three pages in a new file, plus an appended page
+    revised = ruled_boq_pdf(4, 5, seed=21)
+    assert pdf_page_fingerprints(revised)[:3] == pdf_page_fingerprints(original)
+
+    with TestClient(main.app) as client:
+        first = client.post('/extract', json={'fileDataUri': data_uri(original, 'application/pdf')})
+        baseline = first.headers['x-result-id']
+        second = client.post('/extract', params={'baseline': baseline},
+                             json={'fileDataUri': data_uri(revised, 'application/pdf')})
+        missing = client.post('/extract', params={'baseline': 'nope'},
+                              json={'fileDataUri': data_uri(revised, 'application/pdf')})
+        monkeypatch.setenv('PY_PAGE_CACHE', '0')
+        fresh = client.post('/extract', params={'cache': 'false'},
+                            json={'fileDataUri': data_uri(revised, 'application/pdf')})
+
+    assert first.json()['metadata']['reusedPages'] == []
+    assert 'pageFingerprints' not in first.json()['metadata']  # kept on the server
+    metadata = second.json()['metadata']
+    assert metadata['reusedPages'] == [0, 1, 2]
+    assert metadata['diff'] == {'pages': 4, 'previousPages': 3, 'unchanged': 3, 'changed': [], 'added': [3], 'removed': []}
+    assert metadata['pageFingerprints'] == pdf_page_fingerprints(revised)
+    assert missing.status_code == 404
+    # reused pages give the same result as extracting every page again
+    assert second.json()['boqs'] == fresh.json()['boqs']
+    assert len(second.json()['boqs'][0]['items']) == 20
+    assert 'reusedPages' not in fresh.json()['metadata']
+
+
+def test_stream_marks_reused_pages():
+    pdf = ruled_boq_pdf(2, 4, seed=31)
+
+    async def events():
+        return [e async for e in main.iter_local_extraction(pdf)]
+
+    asyncio.run(events())
+    second = asyncio.run(events())
+    assert second[0]['plan']['reusedPages'] == [0, 1]
+    pages = [e for e in second if e['event'] == 'page']
+    assert [e['reused'] for e in pages] == [True, True]
+    assert sum(len(b['items']) for e in pages for b in e['boqs']) == 8
+
+
+def test_failed_pages_are_not_stored_for_reuse(monkeypatch):
+    pdf = ruled_boq_pdf(3, 4, seed=41)
+    extract_page = main.extract_tables_from_page
+
+    def flaky(page):
+        if page.page_number == 2:
+            raise MemoryError('page too big')
+        return extract_page(page)
+
+    # threads, so the patched extractor is the one that runs
+    monkeypatch.setattr(main, 'pool', WorkerPool(workers=0))
+    monkeypatch.setattr(main, 'extract_tables_from_page', flaky)
+    try:
+        result = asyncio.run(main.run_local_extraction(pdf))
+    finally:
+        main.pool.shutdown()
+    assert result['metadata']['degraded'] == 'pages: extraction failed on pages [1]'
+    assert sorted(cached_pages(pdf_page_fingerprints(pdf), 'vector_tables')) == [0, 2]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytesseract
+from fastapi.testclient import TestClient
+
+from app import main
+from app.metrics import request_timings
+from app.router import plan_document, sniff
+from app.workers import WorkerPool
+from benchmarks.corpus import noisy_boq_image, ruled_boq_pdf, scanned_boq_pdf, text_boq_pdf
+from benchmarks.run import data_uri
+
+
+def test_sniff_ignores_declared_type():
+    assert sniff(b'%PDF-1.4\n...', 'image/png') == ('pdf', 'application/pdf')
+    assert sniff(b'\x89PNG\r\n\x1a\n....', 'application/pdf') == ('image', 'image/png')
+    assert sniff(b'\xff\xd8\xff\xe0') == ('image', 'image/jpeg')
+    assert sniff(b'Item,Description,Qty\n1,Concrete,2\n', 'text/csv') == ('text', 'text/csv')
+    assert sniff(b'\x00\x01\x02garbage') == ('unknown', None)
+
+
+def test_plans_by_document_kind():
+    ruled = plan_document(ruled_boq_pdf(2, 5))
+    assert ruled['plan'] == 'vector_tables' and ruled['pages'] == 2 and ruled['textLayer']
+    scanned = plan_document(scanned_boq_pdf(2, 5))
+    assert scanned['plan'] == 'raster_ocr' and scanned['images'] and not scanned['textLayer']
+    assert plan_document(noisy_boq_image(4))['plan'] == 'image_ocr'
+    assert plan_document(b'Item,Qty\n1,2\n')['plan'] == 'text_grid'
+    llm = plan_document(text_boq_pdf(1, 3), mode='tgi')
+    assert llm['plan'] == 'llm' and llm['source'] == 'vector_tables'
+
+
+def test_scanned_pdf_skips_the_pdf_table_pass(monkeypatch):
+    seen = []
+
+    def fake_image_to_data(im, lang=None, config=None, output_type=None):
+        seen.append(im.size)
+        return {k: [] for k in ('text', 'conf', 'left', 'top', 'width', 'height')}
+
+    monkeypatch.setattr(pytesseract, 'image_to_data', fake_image_to_data)
+    # threads, so the patched tesseract is the one that runs
+    monkeypatch.setattr(main, 'pool', WorkerPool(workers=0))
+
+    async def scenario():
+        with request_timings('mock') as timings:
+            return await main.run_local_extraction(scanned_boq_pdf(3, 5)), timings
+
+    try:
+        result, timings = asyncio.run(scenario())
+    finally:
+        main.pool.shutdown()
+    names = {name for name, _ in timings.stages}
+    assert result['metadata']['plan'] == 'raster_ocr'
+    assert len(seen) == 3
+    assert 'ocr' in names and 'pdf_tables' not in names and 'text_fallback' not in names
+
+
+def test_extract_reports_plan_metadata():
+    with TestClient(main.app) as client:
+        resp = client.post('/extract', params={'cache': 'false'}, json={'fileDataUri': data_uri(ruled_boq_pdf(1, 5), 'application/pdf')})
+        body = client.post('/extract', params={'cache': 'false'}, json={'fileDataUri': data_uri(b'Item,Description,Qty\n1,Concrete,2\n', 'text/csv')}).json()
+    assert resp.status_code == 200
+    assert resp.json()['metadata']['plan'] == 'vector_tables'
+    assert resp.json()['boqs']
+    assert body['metadata'] == {'kind': 'text', 'mime': 'text/csv', 'pages': None, 'textLayer': None, 'images': None, 'plan': 'text_grid'}
+    assert body['tables'][0]['headers'] == ['Item', 'Description', 'Qty']
+
+
+def test_failed_extraction_is_returned_but_not_cached(monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError('worker died')
+
+    monkeypatch.setattr(main, 'extract_pages_parallel', broken)
+    body = {'fileDataUri': data_uri(ruled_boq_pdf(1, 4, seed=31), 'application/pdf')}
+    with TestClient(main.app) as client:
+        first = client.post('/extract', json=body)
+        second = client.post('/extract', json=body)
+    assert first.status_code == 200
+    assert first.json()['metadata']['degraded'] == 'pages: RuntimeError: worker died'
+    assert second.headers['x-cache'] == 'miss'
@@ -0,0 +1,50 @@
+import asyncio
+import base64
+import json
+
+import httpx
+
+from tests.test_pages import make_multipage_pdf
+
+
+async def post_stream(path, body, headers=None):
+    events = []
+    async with httpx.AsyncClient() as client:
+        async with client.stream('POST', f'http://localhost:8000{path}', timeout=30.0, headers=headers, **body) as res:
+            assert res.status_code == 200
+            async for line in res.aiter_lines():
+                if line.strip():
+                    events.append(json.loads(line))
+    return events
+
+
+def test_stream_emits_pages_then_summary(tmp_path):
+    pdf_path = tmp_path / 'stream.pdf'
+    make_multipage_pdf(pdf_path, pages=3)
+    data_uri = 'data:application/pdf;base64,' + base64.b64encode(pdf_path.read_bytes()).decode('utf-8')
+    events = asyncio.run(post_stream('/extract/stream', {'json': {'fileDataUri': data_uri}}))
+    kinds = [e['event'] for e in events]
+    assert kinds[0] == 'start' and events[0]['pages'] == 3
+    assert kinds[-1] == 'summary'
+    progress = [e for e in events if e['event'] == 'progress']
+    assert sorted(e['page'] for e in progress) == [0, 1, 2]
+    assert progress[-1]['done'] == 3
+    tables = [e for e in events if e['event'] == 'table']
+    assert len(tables) == 3 and events[-1]['tables'] == 3
+    assert events[-1]['items'] == sum(len(e['boq']['items']) for e in events if e['event'] == 'boq')
+
+
+def test_upload_stream_as_sse(tmp_path):
+    pdf_path = tmp_path / 'stream.pdf'
+    make_multipage_pdf(pdf_path, pages=2)
+
+    async def go():
+        async with httpx.AsyncClient() as client:
+            res = await client.post('http://localhost:8000/extract/upload/stream', content=pdf_path.read_bytes(),
+                                    headers={'Content-Type': 'application/pdf', 'Accept': 'text/event-stream'}, timeout=30.0)
+            return res
+
+    res = asyncio.run(go())
+    assert res.status_code == 200
+    assert res.headers['content-type'].startswith('text/event-stream')
+    assert 'event: summary' in res.text
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.uploads import spooled_upload, spooled_uploads
+
+BOUNDARY = 'XyZ'
+
+
+def part(name: str, body: bytes, filename: str = None) -> bytes:
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else '')
+    return (f'--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\nContent-Type: application/pdf\r\n\r\n').encode() + body + b'\r\n'
+
+
+def request(chunks, received):
+    async def receive():
+        chunk = chunks.pop(0) if chunks else b''
+        received.append(chunk)
+        return {'type': 'http.request', 'body': chunk, 'more_body': bool(chunks)}
+
+    headers = [(b'content-type', f'multipart/form-data; boundary={BOUNDARY}'.encode())]
+    return Request({'type': 'http', 'method': 'POST', 'headers': headers}, receive)
+
+
+def test_multipart_parts_are_spooled_while_the_body_arrives(tmp_path, monkeypatch):
+    monkeypatch.setenv('PY_UPLOAD_DIR', str(tmp_path))
+    body = part('note', b'ignored') + part('extra', b'a' * 10, 'a.pdf') + part('file', b'%PDF-1.4 x', 'b.pdf') + f'--{BOUNDARY}--\r\n'.encode()
+
+    async def go():
+        async with spooled_upload(request([body[i:i + 7] for i in range(0, len(body), 7)], [])) as one:
+            assert (one.filename, one.size, open(one.path, 'rb').read()) == ('b.pdf', 10, b'%PDF-1.4 x')
+        async with spooled_uploads(request([body], [])) as many:
+            assert [u.filename for u in many] == ['a.pdf', 'b.pdf']
+
+    asyncio.run(go())
+    assert os.listdir(tmp_path) == []
+
+
+def test_oversized_multipart_is_rejected_before_the_rest_is_read(tmp_path, monkeypatch):
+    monkeypatch.setenv('PY_UPLOAD_DIR', str(tmp_path))
+    monkeypatch.setenv('PY_UPLOAD_MAX_BYTES', '1000')
+    chunks = [part('file', b'x' * 400, 'big.pdf')[:-2]] + [b'x' * 400] * 20
+    received = []
+
+    async def go():
+        async with spooled_upload(request(chunks, received)):
+            pass
+
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(go())
+    assert e.value.status_code == 413
+    assert len(received) == 3  # stopped at the chunk that crossed the limit
+    assert os.listdir(tmp_path) == []
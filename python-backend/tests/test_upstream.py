@@ -0,0 +1,161 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.upstream import CircuitBreaker, CircuitOpenError, Upstream
+
+
+class FakeTGI(BaseHTTPRequestHandler):
+    """Answers with the next status from `server.statuses` (200 once exhausted)."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.calls += 1
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        body = json.dumps({'generated_text': '{}'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTGI)
+    server.calls, server.statuses = 0, []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def url(server):
+    return f'http://127.0.0.1:{server.server_address[1]}/generate'
+
+
+def test_transient_errors_are_retried(fake_server):
+    fake_server.statuses = [503, 502]
+    upstream = Upstream('tgi', timeout=5, retries=2, backoff=0.001)
+
+    async def go():
+        try:
+            return await upstream.post(url(fake_server), json={})
+        finally:
+            await upstream.aclose()
+
+    resp = asyncio.run(go())
+    assert resp.status_code == 200
+    assert fake_server.calls == 3
+    stats = upstream.stats()
+    assert stats['retries'] == 2 and stats['breaker'] == 'closed'
+
+
+def test_breaker_opens_and_short_circuits(fake_server):
+    fake_server.statuses = [503] * 10
+    upstream = Upstream('tgi', timeout=5, retries=0, backoff=0.001, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+
+    async def go():
+        try:
+            for _ in range(2):
+                assert (await upstream.post(url(fake_server), json={})).status_code == 503
+            with pytest.raises(CircuitOpenError):
+                await upstream.post(url(fake_server), json={})
+        finally:
+            await upstream.aclose()
+
+    asyncio.run(go())
+    assert fake_server.calls == 2
+    assert not upstream.available()
+    assert upstream.stats()['shortCircuited'] == 1
+
+
+def test_half_open_trial_closes_breaker(fake_server):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    upstream = Upstream('tgi', timeout=5, retries=0, breaker=breaker)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    async def go():
+        try:
+            return await upstream.post(url(fake_server), json={})
+        finally:
+            await upstream.aclose()
+
+    assert asyncio.run(go()).status_code == 200
+    assert breaker.state == 'closed'
+
+
+def test_connection_errors_count_as_failures():
+    upstream = Upstream('tgi', timeout=1, retries=1, backoff=0.001, breaker=CircuitBreaker(failure_threshold=1))
+
+    async def go():
+        try:
+            with pytest.raises(httpx.TransportError):
+                await upstream.post('http://127.0.0.1:9/generate', json={})
+        finally:
+            await upstream.aclose()
+
+    asyncio.run(go())
+    assert upstream.stats()['failures'] == 1
+    assert upstream.breaker.state == 'open'
+
+
+def test_cancelled_half_open_trial_is_released():
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    upstream = Upstream('tgi', timeout=5, retries=0, breaker=breaker, transport=httpx.MockTransport(hang))
+    breaker.record_failure()
+
+    async def go():
+        trial = asyncio.create_task(upstream.post('http://tgi/generate', json={}))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # the next caller gets the trial instead of a CircuitOpenError
+        upstream._transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+        await upstream.aclose()
+        try:
+            return await upstream.post('http://tgi/generate', json={})
+        finally:
+            await upstream.aclose()
+
+    assert asyncio.run(go()).status_code == 200
+    assert breaker.state == 'closed'
+
+
+def test_stream_gives_back_the_half_open_trial_on_cancel_and_counts_errors_before_a_response():
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    upstream = Upstream('tgi', timeout=5, retries=0, breaker=breaker, transport=httpx.MockTransport(hang))
+    breaker.record_failure()
+
+    async def consume(target):
+        async with upstream.stream(target, json={}) as resp:
+            return resp.status_code
+
+    async def go():
+        trial = asyncio.create_task(consume('http://tgi/generate_stream'))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        # the trial was given back; an error before any response (not a transport error) ends it
+        with pytest.raises(httpx.InvalidURL):
+            await consume('http://tgi:bad/generate_stream')
+        await upstream.aclose()
+
+    asyncio.run(go())
+    assert breaker.state == 'open' and upstream.failures == 1
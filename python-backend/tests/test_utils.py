@@ -1,4 +1,4 @@
-from app.main import parse_number
+from app.numbers import parse_number
 
 
 def test_parse_number_simple():
@@ -8,5 +8,27 @@ def test_parse_number_simple():
     assert parse_number('12.34') == 12.34
     assert parse_number('50%') == 0.5
     assert parse_number('$1,234.56') == 1234.56
+    assert parse_number('12.') == 12.0 and parse_number('1,200.') == 1200.0 and parse_number('$ 1,200. ') == 1200.0
     assert parse_number('') is None
     assert parse_number(None) is None
+
+
+def test_parse_number_locales_currencies_and_units():
+    from app.numbers import detect_decimal, parse_cell, parse_cell_column
+
+    assert parse_number('1.234,56') == 1234.56
+    assert parse_number('1 234,56') == 1234.56
+    assert parse_number('12,5') == 12.5
+    assert parse_number('1.250', decimal=',') == 1250.0
+    assert parse_number('1.250') == 1.25
+    assert parse_number('12,', decimal=',') == 12.0 and parse_number('1.200,', decimal=',') == 1200.0
+    for cell in ('SAR 1,250.500', 'KWD1,250.500', '1,250.500 QAR', 'BHD 1,250.500', 'R.O. 1,250.500'):
+        assert parse_number(cell) == 1250.5, cell
+    assert parse_number('AED (1,200.00)') == -1200.0
+    assert parse_number('1.2.3') is None and parse_number('rate only') is None and parse_number('(12') is None
+    assert parse_cell('12.5 m2') == (12.5, 'm2')
+    assert parse_cell('4 Nos') == (4.0, 'Nos')
+    assert parse_cell('12 mx') == (None, None)
+    assert detect_decimal(['1.250', '3.400,00', '12,5']) == ','
+    assert detect_decimal(['1,250', '1.250']) == '.'
+    assert parse_cell_column(['1.250', '1.250', '2 m3'], ',') == ([1250.0, 1250.0, 2.0], [None, None, 'm3'])
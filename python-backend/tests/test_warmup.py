@@ -0,0 +1,52 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app import backends, main
+from app.backends import import_ms, lazy_module, load
+from app.main import extract_tables_from_pdf_pages
+from app.warmup import WarmUp, tiny_pdf
+from app.workers import WorkerPool
+
+
+def test_tiny_pdf_extracts_a_boq_table():
+    [(page, [table])] = extract_tables_from_pdf_pages(tiny_pdf())
+    assert page == 0 and table['headers'][:4] == ['Item', 'Description', 'Qty', 'Unit']
+    assert [row[1] for row in table['rows']] == ['Concrete', 'Blockwork']
+
+
+def test_lazy_modules_import_on_first_use(monkeypatch):
+    proxy = lazy_module('no_such_backend_module')  # nothing is imported yet
+    assert 'no_such_backend_module' not in import_ms
+    try:
+        proxy.anything
+    except ModuleNotFoundError:
+        pass
+    else:
+        raise AssertionError('missing module imported')
+    monkeypatch.setitem(backends.BACKENDS, 'missing', ('no_such_backend_module',))
+    report = load(['pdf', 'missing'])
+    assert report['pdf']['ok'] and 'pdfplumber' in import_ms
+    assert not report['missing']['ok'] and 'ModuleNotFoundError' in report['missing']['error']
+
+
+def test_ready_after_warm_up(monkeypatch):
+    monkeypatch.setattr(main, 'pool', WorkerPool(workers=0))
+    monkeypatch.setattr(main, 'warm_state', WarmUp())
+    monkeypatch.setenv('PY_WARMUP_BACKENDS', 'pdf')
+    with TestClient(main.app) as client:
+        assert client.get('/health').status_code == 200
+        for _ in range(100):
+            resp = client.get('/ready')
+            if resp.status_code == 200:
+                break
+            assert resp.json()['status'] == 'warming'
+            time.sleep(0.05)
+        body = resp.json()
+        assert resp.status_code == 200 and body['error'] is None
+        assert body['backends']['pdf']['ok'] and body['extraction']['items'] == 2
+
+    monkeypatch.setattr(main, 'warm_state', WarmUp())
+    monkeypatch.setenv('PY_WARMUP', '0')
+    with TestClient(main.app) as client:
+        assert client.get('/ready').json()['status'] == 'ready'
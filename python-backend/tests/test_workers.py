@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.workers import WorkerPool
+
+
+def square(x):
+    return x * x
+
+
+def test_pool_runs_jobs_and_reports_stats():
+    pool = WorkerPool(workers=0, queue_max=1)
+
+    async def go():
+        async with pool.admit():
+            return await asyncio.gather(*(pool.run(square, i) for i in range(5)))
+
+    assert asyncio.run(go()) == [0, 1, 4, 9, 16]
+    stats = pool.stats()
+    assert stats['completed'] == 5
+    assert stats['inFlight'] == 0
+    assert stats['admitted'] == 0
+    pool.shutdown()
+
+
+def test_pool_rejects_when_queue_full():
+    pool = WorkerPool(workers=1, queue_max=0)
+
+    async def go():
+        async with pool.admit():
+            with pytest.raises(HTTPException) as exc:
+                async with pool.admit():
+                    pass
+            return exc.value
+
+    err = asyncio.run(go())
+    assert err.status_code == 503
+    assert 'Retry-After' in err.headers
+    assert pool.stats()['rejected'] == 1
+
+
+class UnpicklableError(Exception):
+    def __init__(self):
+        super().__init__('no args')
+
+
+def raise_unpicklable():
+    raise UnpicklableError()
+
+
+def test_unpicklable_exception_does_not_break_pool():
+    pool = WorkerPool(workers=1, queue_max=1)
+
+    async def go():
+        with pytest.raises(RuntimeError, match='UnpicklableError'):
+            await pool.run(raise_unpicklable)
+        return await pool.run(square, 3)
+
+    assert asyncio.run(go()) == 9
+    pool.shutdown()